@@ -0,0 +1,15 @@
+// Collection endpoints return one page at a time (keyset pagination);
+// the cursor for the next page comes in the X-Next-Cursor header.
+export async function fetchAllPages(url, errorMessage) {
+  const items = [];
+  let cursor = null;
+  do {
+    const params = new URLSearchParams({ limit: '1000' });
+    if (cursor !== null) params.set('cursor', cursor);
+    const response = await fetch(`${url}?${params}`);
+    if (!response.ok) throw new Error(errorMessage);
+    items.push(...(await response.json()));
+    cursor = response.headers.get('X-Next-Cursor');
+  } while (cursor !== null);
+  return items;
+}
@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { useFormik } from 'formik';
 import * as yup from 'yup';
+import { fetchAllPages } from '../api';
 
 const assignmentValidationSchema = yup.object({
   title: yup.string().required('Title is required').min(2, 'Title must be at least 2 characters'),
@@ -22,9 +23,7 @@ function AssignmentList() {
 
   const fetchAssignments = async () => {
     try {
-      const response = await fetch(`${apiUrl}/assignments`);
-      if (!response.ok) throw new Error('Failed to fetch assignments');
-      const data = await response.json();
+      const data = await fetchAllPages(`${apiUrl}/assignments`, 'Failed to fetch assignments');
       setAssignments(data);
     } catch (error) {
       console.error('Error fetching assignments:', error);
@@ -34,9 +33,7 @@ function AssignmentList() {
 
   const fetchCourses = async () => {
     try {
-      const response = await fetch(`${apiUrl}/courses`);
-      if (!response.ok) throw new Error('Failed to fetch courses');
-      const data = await response.json();
+      const data = await fetchAllPages(`${apiUrl}/courses`, 'Failed to fetch courses');
       setCourses(data);
     } catch (error) {
       console.error('Error fetching courses:', error);
@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { useFormik } from 'formik';
 import * as yup from 'yup';
+import { fetchAllPages } from '../api';
 
 const courseValidationSchema = yup.object({
   name: yup.string().required('Course name is required').min(2, 'Course name must be at least 2 characters'),
@@ -21,9 +22,7 @@ function CourseList() {
 
   const fetchCourses = async () => {
     try {
-      const response = await fetch(`${apiUrl}/courses`);
-      if (!response.ok) throw new Error('Failed to fetch courses');
-      const data = await response.json();
+      const data = await fetchAllPages(`${apiUrl}/courses`, 'Failed to fetch courses');
       setCourses(data);
     } catch (error) {
       console.error('Error fetching courses:', error);
@@ -33,9 +32,7 @@ function CourseList() {
 
   const fetchTeachers = async () => {
     try {
-      const response = await fetch(`${apiUrl}/teachers`);
-      if (!response.ok) throw new Error('Failed to fetch teachers');
-      const data = await response.json();
+      const data = await fetchAllPages(`${apiUrl}/teachers`, 'Failed to fetch teachers');
       setTeachers(data);
     } catch (error) {
       console.error('Error fetching teachers:', error);
@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { useFormik } from 'formik';
 import * as yup from 'yup';
+import { fetchAllPages } from '../api';
 
 const enrollmentValidationSchema = yup.object({
   student_id: yup.number().required('Student is required'),
@@ -22,9 +23,7 @@ function EnrollmentForm() {
 
   const fetchStudents = async () => {
     try {
-      const response = await fetch(`${apiUrl}/students`);
-      if (!response.ok) throw new Error('Failed to fetch students');
-      const data = await response.json();
+      const data = await fetchAllPages(`${apiUrl}/students`, 'Failed to fetch students');
       setStudents(data);
     } catch (error) {
       console.error('Error fetching students:', error);
@@ -34,9 +33,7 @@ function EnrollmentForm() {
 
   const fetchCourses = async () => {
     try {
-      const response = await fetch(`${apiUrl}/courses`);
-      if (!response.ok) throw new Error('Failed to fetch courses');
-      const data = await response.json();
+      const data = await fetchAllPages(`${apiUrl}/courses`, 'Failed to fetch courses');
       setCourses(data);
     } catch (error) {
       console.error('Error fetching courses:', error);
@@ -45,9 +42,7 @@ function EnrollmentForm() {
 
   const fetchEnrollments = async () => {
     try {
-      const response = await fetch(`${apiUrl}/enrollments`);
-      if (!response.ok) throw new Error('Failed to fetch enrollments');
-      const data = await response.json();
+      const data = await fetchAllPages(`${apiUrl}/enrollments`, 'Failed to fetch enrollments');
       setEnrollments(data);
     } catch (error) {
       console.error('Error fetching enrollments:', error);
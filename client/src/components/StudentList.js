@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { useFormik } from 'formik';
 import * as yup from 'yup';
+import { fetchAllPages } from '../api';
 
 const studentValidationSchema = yup.object({
   name: yup.string().required('Name is required').min(2, 'Name must be at least 2 characters'),
@@ -19,9 +20,7 @@ function StudentList() {
 
   const fetchStudents = async () => {
     try {
-      const response = await fetch(`${apiUrl}/students`);
-      if (!response.ok) throw new Error('Failed to fetch students');
-      const data = await response.json();
+      const data = await fetchAllPages(`${apiUrl}/students`, 'Failed to fetch students');
       setStudents(data);
     } catch (error) {
       console.error('Error fetching students:', error);
@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { useFormik } from 'formik';
 import * as yup from 'yup';
+import { fetchAllPages } from '../api';
 
 const teacherValidationSchema = yup.object({
   name: yup.string().required('Name is required').min(2, 'Name must be at least 2 characters'),
@@ -18,9 +19,7 @@ function TeacherList() {
 
   const fetchTeachers = async () => {
     try {
-      const response = await fetch(`${apiUrl}/teachers`);
-      if (!response.ok) throw new Error('Failed to fetch teachers');
-      const data = await response.json();
+      const data = await fetchAllPages(`${apiUrl}/teachers`, 'Failed to fetch teachers');
       setTeachers(data);
     } catch (error) {
       console.error('Error fetching teachers:', error);
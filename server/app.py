@@ -3,50 +3,89 @@
 # Standard library imports
 
 # Remote library imports
-from flask import request,make_response, session
-from flask_restful import Resource
+from flask import Blueprint, Flask, Response, current_app, request, make_response, session, stream_with_context
+from flask_restful import Api, Resource
 from sqlalchemy.exc import IntegrityError
 
 # Local imports
-from config import app, db, api
+from config import db, settings, init_db, init_migrate, init_cors
+from listing import ListResource, parse_fields
+from serializers import serialize, serializer_for
+from grades import course_gradebook, student_transcript, grades_cli
+from exports import EXPORTS, csv_chunks, export_query, exports_cli
+from imports import import_response, imports_cli
+from changes import Changes, changes_cli
+from events import Events, hub, init_events
+from jobs import Jobs, JobByID, JobCancel, JobResult, jobs_cli
+from replicas import replicas
+from cache import cache, init_cache
+from conditional import init_conditional, make_etag, not_modified, set_validators
+from instrumentation import init_instrumentation, metrics_snapshot
+from encoding import init_encoding
+from bulk import StudentLoader, EnrollmentLoader, SubmissionLoader, bulk_create_response, batch_grade_response
 # Add your model imports
 
 from models import Student, Teacher, Course, Enrollment, Assignment, AssignmentSubmission
 
 
+bp = Blueprint('api', __name__)
+api = Api(bp)
+
 # Views go here!
 
-@app.route('/')
+@bp.route('/')
 def index():
     return '<h1>School Management System API</h1>'
 
-class Students(Resource):
-    def get(self):
-        students = [student.to_dict() for student in Student.query.all()]
-        return make_response(students, 200)
-    
+class Students(ListResource):
+    model = Student
+    filters = ('grade_level',)
+
+    @staticmethod
+    def build(data):
+        return Student(
+            name=data['name'],
+            email=data['email'],
+            grade_level=data['grade_level']
+        )
+
     def post(self):
         data = request.get_json()
+        if isinstance(data, list):
+            return bulk_create_response(StudentLoader(self.build), data)
         try:
-            student = Student(
-                name=data['name'],
-                email=data['email'],
-                grade_level=data['grade_level']
-            )
+            student = self.build(data)
             db.session.add(student)
             db.session.commit()
-            return make_response(student.to_dict(), 201)
+            return make_response(serialize(student), 201)
         except ValueError as e:
             return make_response({'error': str(e)}, 400)
         except IntegrityError:
             return make_response({'error': 'Email already exists'}, 400)
+
+    def delete(self):
+        """Bulk delete, e.g. ``DELETE /students?grade_level=12`` after graduation."""
+        return self.delete_matching()
         
 class StudentByID(Resource):
     def get(self, id):
-        student = Student.query.get(id)
-        if not student:
+        try:
+            serializer = serializer_for(Student, parse_fields())
+        except ValueError as e:
+            return make_response({'error': str(e)}, 400)
+
+        def load():
+            row = db.session.execute(serializer.select().where(Student.id == id)).first()
+            if not row:
+                return None
+            updated_at = row[serializer.version_indexes[0]]
+            return serializer.row(row), make_etag('students', id, serializer.fields, updated_at), updated_at
+
+        cached = cache.row(Student.__tablename__, id, load, variant=serializer.fields)
+        if not cached:
             return make_response({'error': 'Student not found'}, 404)
-        return make_response(student.to_dict(), 200)
+        student, etag, updated_at = cached
+        return not_modified(etag, updated_at) or set_validators(make_response(student, 200), etag, updated_at)
     
     def patch(self, id):
         student = Student.query.get(id)
@@ -57,7 +96,7 @@ class StudentByID(Resource):
             for attr in data:
                 setattr(student, attr, data[attr])
             db.session.commit()
-            return make_response(student.to_dict(), 200)
+            return make_response(serialize(student), 200)
         except ValueError as e:
             return make_response({'error': str(e)}, 400)
         
@@ -69,11 +108,18 @@ class StudentByID(Resource):
         db.session.commit()
         return make_response({}, 204)
     
-class Teachers(Resource):
-    def get(self):
-        teachers = [teacher.to_dict() for teacher in Teacher.query.all()]
-        return make_response(teachers, 200)
-    
+class StudentTranscript(Resource):
+    def get(self, id):
+        student = Student.query.get(id)
+        if not student:
+            return make_response({'error': 'Student not found'}, 404)
+        return make_response({'student': serialize(student), **student_transcript(id)}, 200)
+
+class Teachers(ListResource):
+    model = Teacher
+    filters = ('department',)
+    cached = True
+
     def post(self):
         data = request.get_json()
         try:
@@ -84,17 +130,17 @@ class Teachers(Resource):
             )
             db.session.add(teacher)
             db.session.commit()
-            return make_response(teacher.to_dict(), 201)
+            return make_response(serialize(teacher), 201)
         except ValueError as e:
             return make_response({'error': str(e)}, 400)
         except IntegrityError:
             return make_response({'error': 'Email already exists'}, 400) 
 
-class Courses(Resource):
-    def get(self):
-        courses = [course.to_dict() for course in Course.query.all()]
-        return make_response(courses, 200)
-    
+class Courses(ListResource):
+    model = Course
+    filters = ('teacher_id', 'course_code')
+    cached = True
+
     def post(self):
         data = request.get_json()
         try:
@@ -106,38 +152,72 @@ class Courses(Resource):
             )
             db.session.add(course)
             db.session.commit()
-            return make_response(course.to_dict(), 201)
+            return make_response(serialize(course), 201)
         except ValueError as e:
             return make_response({'error': str(e)}, 400)
         except IntegrityError:
             return make_response({'error': 'Course code already exists'}, 400)  
 
-class Enrollments(Resource):
-    def get(self):
-        enrollments = [enrollment.to_dict() for enrollment in Enrollment.query.all()]
-        return make_response(enrollments, 200)
-    
+class CourseGradebook(Resource):
+    def get(self, id):
+        course = Course.query.get(id)
+        if not course:
+            return make_response({'error': 'Course not found'}, 404)
+        gradebook = course_gradebook(id, semester=request.args.get('semester'))
+        return make_response({'course': serialize(course), **gradebook}, 200)
+
+class Export(Resource):
+    def get(self, name):
+        if name not in EXPORTS:
+            return make_response({'error': f'Unknown export: {name}'}, 404)
+        course_id = request.args.get('course_id')
+        if course_id is not None:
+            try:
+                course_id = int(course_id)
+            except ValueError:
+                return make_response({'error': 'course_id must be an integer'}, 400)
+        stmt = export_query(name, course_id=course_id, semester=request.args.get('semester'))
+        batch_size = current_app.config['EXPORT_BATCH_SIZE']
+        return Response(stream_with_context(csv_chunks(stmt, batch_size)), mimetype='text/csv',
+                        headers={'Content-Disposition': f'attachment; filename="{name}.csv"'})
+
+class Imports(Resource):
+    def post(self):
+        return import_response()
+
+class Enrollments(ListResource):
+    model = Enrollment
+    filters = ('student_id', 'course_id', 'semester')
+
+    @staticmethod
+    def build(data):
+        return Enrollment(
+            student_id=data['student_id'],
+            course_id=data['course_id'],
+            semester=data['semester']  # FIXED: data['semester'] instead of data('semester')
+        )
+
     def post(self):
         data = request.get_json()
+        if isinstance(data, list):
+            return bulk_create_response(EnrollmentLoader(self.build), data)
         try:
-            enrollment = Enrollment(
-                student_id=data['student_id'],
-                course_id=data['course_id'],
-                semester=data['semester']  # FIXED: data['semester'] instead of data('semester')
-            )
+            enrollment = self.build(data)
             db.session.add(enrollment)
             db.session.commit()
-            return make_response(enrollment.to_dict(), 201)
+            return make_response(serialize(enrollment), 201)
         except ValueError as e:
             return make_response({'error': str(e)}, 400)
         except IntegrityError:
-            return make_response({'error': 'Student already enrolled in this course'}, 400)   
+            return make_response({'error': 'Student already enrolled in this course'}, 400)
+
+    def delete(self):
+        return self.delete_matching()
+
+class Assignments(ListResource):
+    model = Assignment
+    filters = ('course_id',)
 
-class Assignments(Resource):
-    def get(self):
-        assignments = [assignment.to_dict() for assignment in Assignment.query.all()]
-        return make_response(assignments, 200)
-    
     def post(self):
         data = request.get_json()
         try:
@@ -150,36 +230,52 @@ class Assignments(Resource):
             )
             db.session.add(assignment)
             db.session.commit()
-            return make_response(assignment.to_dict(), 201)
+            return make_response(serialize(assignment), 201)
         except ValueError as e:
             return make_response({'error': str(e)}, 400) 
 
-class AssignmentSubmissions(Resource):
-    def get(self):
-        submissions = [submission.to_dict() for submission in AssignmentSubmission.query.all()]
-        return make_response(submissions, 200)
-    
+class AssignmentSubmissions(ListResource):
+    model = AssignmentSubmission
+    filters = ('student_id', 'assignment_id', 'submitted')
+
+    @staticmethod
+    def build(data, max_points=None):
+        return AssignmentSubmission(
+            max_points=max_points,
+            assignment_id=data['assignment_id'],
+            student_id=data['student_id'],
+            points_earned=data.get('points_earned'),  # FIXED: data.get() instead of data.get[]
+            content=data.get('content'),
+            submitted=data.get('submitted', False),
+        )
+
     def post(self):
         data = request.get_json()
+        if isinstance(data, list):
+            return bulk_create_response(SubmissionLoader(self.build), data)
         try:
-            submission = AssignmentSubmission(
-                assignment_id=data['assignment_id'],
-                student_id=data['student_id'],
-                points_earned=data.get('points_earned'),  # FIXED: data.get() instead of data.get[]
-                content=data.get('content'),
-                submitted=data.get('submitted', False),
-            )
+            submission = self.build(data)
             db.session.add(submission)
             db.session.commit()
-            return make_response(submission.to_dict(), 201)
+            return make_response(serialize(submission), 201)
         except ValueError as e:
             return make_response({'error': str(e)}, 400) 
+
+    def patch(self):
+        data = request.get_json()
+        if not isinstance(data, list):
+            return make_response({'error': 'Expected a JSON array of {id, points_earned} objects'}, 400)
+        return batch_grade_response(data)
         
-@app.route('/api/health')
+@bp.route('/api/health')
 def health_check():
     return {'status': 'healthy', 'message': 'API is running'}
 
-@app.route('/api/test')
+@bp.route('/api/metrics', endpoint='metrics')
+def metrics():
+    return {**metrics_snapshot(), 'cache': cache.stats(), 'events': hub.stats(), 'replicas': replicas.stats()}
+
+@bp.route('/api/test')
 def test_endpoint():
     return {'message': 'Backend is working!', 'endpoints': {
         'students': '/students',
@@ -189,12 +285,49 @@ def test_endpoint():
 
 api.add_resource(Students, '/students')
 api.add_resource(StudentByID, '/students/<int:id>')       
+api.add_resource(StudentTranscript, '/students/<int:id>/transcript')
 api.add_resource(Teachers, "/teachers")
 api.add_resource(Courses, "/courses")
+api.add_resource(CourseGradebook, "/courses/<int:id>/gradebook")
 api.add_resource(Enrollments, "/enrollments")
 api.add_resource(Assignments, "/assignments")
 api.add_resource(AssignmentSubmissions, "/assignment_submissions")  # FIXED: AssignmentSubmissions and correct spelling
+api.add_resource(Export, "/exports/<string:name>.csv")
+api.add_resource(Imports, "/imports")
+api.add_resource(Changes, "/changes")
+api.add_resource(Events, "/events")
+api.add_resource(Jobs, "/jobs")
+api.add_resource(JobByID, "/jobs/<int:id>")
+api.add_resource(JobCancel, "/jobs/<int:id>/cancel")
+api.add_resource(JobResult, "/jobs/<int:id>/result")
+
+
+def create_app(config=None):
+    """Build the app: settings from the environment, updated with ``config``.
+
+    The cache, event hub and SQL instrumentation are process-wide, so the
+    last app created configures them.
+    """
+    app = Flask(__name__)
+    app.config.update(settings())
+    app.config.update(config or {})
+    init_db(app)
+    init_migrate(app)
+    init_instrumentation(app)
+    init_encoding(app)
+    init_cache(app)
+    init_cors(app)
+
+    app.register_blueprint(bp)
+    app.cli.add_command(grades_cli)
+    app.cli.add_command(exports_cli)
+    app.cli.add_command(imports_cli)
+    app.cli.add_command(changes_cli)
+    app.cli.add_command(jobs_cli)
+    init_conditional(app)
+    init_events(app)
+    return app
 
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5555, debug=True)
\ No newline at end of file
+    create_app().run(host='0.0.0.0', port=5555, debug=True)
\ No newline at end of file
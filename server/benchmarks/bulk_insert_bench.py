@@ -0,0 +1,74 @@
+"""Rows/sec of single-item POSTs versus one JSON-array POST.
+
+Uses a throwaway SQLite file so commit/fsync costs are included:
+
+    python -m benchmarks.bulk_insert_bench --rows 5000
+"""
+import argparse
+import atexit
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime
+
+_db_dir = tempfile.mkdtemp()
+atexit.register(shutil.rmtree, _db_dir, ignore_errors=True)
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_db_dir, 'bench.db')}"
+
+from sqlalchemy import insert  # noqa: E402
+
+from app import create_app  # noqa: E402
+from config import db  # noqa: E402
+from models import Teacher, Course, Assignment  # noqa: E402
+
+app = create_app()
+
+
+def rate(label, rows, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<12} {rows / elapsed:>10,.0f} rows/sec  ({elapsed:.2f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=2000)
+    args = parser.parse_args()
+    n = args.rows
+
+    with app.app_context():
+        db.create_all()
+        db.session.execute(insert(Teacher), [{'name': 'Bench Teacher', 'email': 'bench@example.org', 'department': 'Math'}])
+        db.session.execute(insert(Course), [{'name': 'Bench', 'course_code': 'BNCH100', 'credits': 3, 'teacher_id': 1}])
+        db.session.execute(insert(Assignment), [{'title': 'Bench', 'due_date': datetime.now(), 'max_points': 100, 'course_id': 1}])
+        db.session.commit()
+
+    client = app.test_client()
+
+    def students(prefix):
+        return [{'name': f'Student {i}', 'email': f'{prefix}{i}@example.org', 'grade_level': 9 + i % 4} for i in range(n)]
+
+    def submissions(first_student):
+        return [{'student_id': first_student + i, 'assignment_id': 1, 'points_earned': i % 100, 'submitted': True}
+                for i in range(n)]
+
+    def post_each(url, items):
+        for item in items:
+            assert client.post(url, json=item).status_code == 201
+
+    def post_all(url, items):
+        response = client.post(url, json=items)
+        assert response.status_code == 201, response.get_json()
+
+    print(f"/students ({n} rows)")
+    rate('single-item', n, lambda: post_each('/students', students('single')))
+    rate('bulk', n, lambda: post_all('/students', students('bulk')))
+    print(f"/assignment_submissions ({n} rows)")
+    rate('single-item', n, lambda: post_each('/assignment_submissions', submissions(1)))
+    rate('bulk', n, lambda: post_all('/assignment_submissions', submissions(n + 1)))
+
+
+if __name__ == '__main__':
+    main()
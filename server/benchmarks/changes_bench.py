@@ -0,0 +1,80 @@
+"""Incremental /changes sync cost against table size.
+
+Seeds databases of increasing size, changes the same number of rows in
+each (updates plus deletes), and times syncing from the token taken
+before the changes, compared with re-downloading every student:
+
+    python -m benchmarks.changes_bench --sizes 2000,8000,32000 --changes 100
+"""
+import argparse
+import contextlib
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+
+def run(students, changes, result):
+    tmp = tempfile.TemporaryDirectory()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp.name, 'changes.db')}"
+    os.environ['METRICS_ENABLED'] = '0'
+    os.environ['CACHE_ENABLED'] = '0'
+    from app import create_app
+    from changes import make_token
+    from config import db
+    from models import ChangeClock
+    from seed import seed_synthetic
+    app = create_app()
+
+    with app.app_context():
+        db.create_all()
+        with contextlib.redirect_stdout(sys.stderr):
+            seed_synthetic(students=students, teachers=max(1, students // 400), courses=max(8, students // 100),
+                           assignments_per_course=10, courses_per_student=6, submission_rate=0.8,
+                           seed=42, chunk_size=5000, workers=1)
+
+    client = app.test_client()
+    with app.app_context():
+        # The token a client holds once it has synced everything seeded
+        token = make_token(db.session.get(ChangeClock, 1).value + 1, 0)
+    for id in range(1, changes // 2 + 1):
+        client.patch(f'/students/{id}', json={'grade_level': 12})
+    for id in range(changes // 2 + 1, changes + 1):
+        client.delete(f'/students/{id}')
+
+    start = time.perf_counter()
+    synced, since = 0, token
+    while True:
+        body = client.get('/changes', query_string={'since': since, 'limit': 1000}).get_json()
+        synced += len(body['changes'])
+        since = body['next']
+        if not body['more']:
+            break
+    incremental = time.perf_counter() - start
+
+    start = time.perf_counter()
+    client.get('/students?stream=1').get_data()
+    full = time.perf_counter() - start
+    result.put((students, synced, incremental, full))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='2000,8000,32000')
+    parser.add_argument('--changes', type=int, default=100)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context('spawn')
+    print(f"{'students':>10}{'changes':>10}{'sync ms':>10}{'full students ms':>18}")
+    for size in (int(size) for size in args.sizes.split(',')):
+        result = context.Queue()
+        process = context.Process(target=run, args=(size, args.changes, result))
+        process.start()
+        students, synced, incremental, full = result.get()
+        process.join()
+        print(f"{students:>10}{synced:>10}{incremental * 1000:>10.1f}{full * 1000:>18.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""Concurrent read/write throughput on SQLite, with and without the connect-time pragmas.
+
+Seeds a fresh database per mode, then runs reader and writer processes
+against it through the Flask test client for a fixed time:
+
+    python -m benchmarks.concurrency_bench --readers 4 --writers 2 --seconds 10
+
+"defaults" sets SQLITE_TUNING=0 (rollback journal, synchronous=FULL);
+"tuned" uses the WAL/synchronous=NORMAL/mmap/cache pragmas from config.py.
+Both keep the same busy timeout. Errors are requests that failed, usually
+with "database is locked".
+"""
+import argparse
+import contextlib
+import logging
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+MODES = {'defaults': {'SQLITE_TUNING': '0'}, 'tuned': {'SQLITE_TUNING': '1'}}
+
+
+def seed(env, students):
+    os.environ.update(env)
+    from app import create_app
+    from config import db
+    from seed import seed_synthetic
+    app = create_app()
+
+    with app.app_context():
+        db.create_all()
+        with contextlib.redirect_stdout(sys.stderr):
+            seed_synthetic(students=students, teachers=max(1, students // 400), courses=max(8, students // 100),
+                           assignments_per_course=10, courses_per_student=6, submission_rate=0.8,
+                           seed=42, chunk_size=5000, workers=1)
+
+
+def work(env, role, seconds, worker_seed, students, results):
+    os.environ.update(env)
+    logging.disable(logging.CRITICAL)
+    from app import create_app
+    from config import db
+    from models import Assignment, AssignmentSubmission
+    app = create_app()
+
+    with app.app_context():
+        assignments = db.session.query(Assignment.id).count()
+        submissions = db.session.query(AssignmentSubmission.id).count()
+    client = app.test_client()
+    rng = random.Random(worker_seed)
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        student = rng.randint(1, students)
+        if role == 'reader':
+            kind = rng.randrange(3)
+            if kind == 0:
+                request = lambda: client.get(f'/students?limit=50&cursor={rng.randint(0, students)}')
+            elif kind == 1:
+                request = lambda: client.get(f'/students/{student}/transcript')
+            else:
+                request = lambda: client.get(f'/assignment_submissions?student_id={student}')
+        elif rng.randrange(2):
+            body = {'student_id': student, 'assignment_id': rng.randint(1, assignments), 'content': 'bench'}
+            request = lambda: client.post('/assignment_submissions', json=body)
+        else:
+            body = [{'id': rng.randint(1, submissions), 'points_earned': 0} for _ in range(10)]
+            request = lambda: client.patch('/assignment_submissions', json=body)
+
+        start = time.perf_counter()
+        status = request().status_code
+        elapsed = time.perf_counter() - start
+        if status >= 500:
+            errors += 1
+        else:
+            latencies.append(elapsed)
+    results.put((role, latencies, errors))
+
+
+def run_mode(mode, args):
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(MODES[mode], DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+                   METRICS_ENABLED='0')
+        seeder = context.Process(target=seed, args=(env, args.students))
+        seeder.start()
+        seeder.join()
+        if seeder.exitcode:
+            raise SystemExit(f'{mode}: seeding failed')
+
+        results = context.Queue()
+        roles = ['reader'] * args.readers + ['writer'] * args.writers
+        workers = [context.Process(target=work, args=(env, role, args.seconds, n, args.students, results))
+                   for n, role in enumerate(roles)]
+        for worker in workers:
+            worker.start()
+        collected = [results.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+
+    summary = {}
+    for role in ('reader', 'writer'):
+        if role not in roles:
+            continue
+        latencies = [value for r, values, _ in collected if r == role for value in values]
+        errors = sum(e for r, _, e in collected if r == role)
+        summary[role] = {
+            'per_sec': len(latencies) / args.seconds,
+            'p50_ms': statistics.median(latencies) * 1000 if latencies else None,
+            'p95_ms': sorted(latencies)[int(0.95 * (len(latencies) - 1))] * 1000 if latencies else None,
+            'errors': errors,
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--students', type=int, default=5000)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--modes', default='defaults,tuned')
+    args = parser.parse_args()
+
+    print(f"{args.students} students, {args.readers} readers, {args.writers} writers, {args.seconds:g}s per mode")
+    print(f"{'mode':<10}{'role':<8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'errors':>8}")
+    for mode in args.modes.split(','):
+        for role, stats in run_mode(mode, args).items():
+            p50 = '-' if stats['p50_ms'] is None else f"{stats['p50_ms']:.2f}"
+            p95 = '-' if stats['p95_ms'] is None else f"{stats['p95_ms']:.2f}"
+            print(f"{mode:<10}{role:<8}{stats['per_sec']:>10.1f}{p50:>10}{p95:>10}{stats['errors']:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+"""Endpoint latency and scaling benchmark.
+
+Seeds a fresh database at each size with the synthetic generator from
+seed.py, drives every resource through the Flask test client and records
+p50/p95 latency, rows/sec, peak RSS and SQL statements per request.
+
+    python -m benchmarks.endpoints --sizes 1000,10000,50000 --output bench.json
+    python -m benchmarks.endpoints --sizes 1000,10000 --baseline bench.json
+
+Each size runs in its own subprocess against a throwaway SQLite file. Set
+BENCH_POSTGRES_URL to an empty scratch database to also run on Postgres;
+its tables are dropped and recreated for every size.
+"""
+import argparse
+import contextlib
+import json
+import math
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def endpoints(size, courses):
+    """(name, method, url, body factory, repeats) for a dataset with ``size`` students."""
+    student = size // 2
+    course = courses // 2
+    return [
+        ('GET /students', 'get', '/students', None, 30),
+        ('GET /students?grade_level', 'get', '/students?grade_level=10', None, 30),
+        ('GET /students?cursor', 'get', f'/students?cursor={student}', None, 30),
+        ('GET /students/<id>', 'get', f'/students/{student}', None, 50),
+        ('GET /students/<id>/transcript', 'get', f'/students/{student}/transcript', None, 50),
+        ('GET /teachers', 'get', '/teachers', None, 30),
+        ('GET /courses', 'get', '/courses', None, 30),
+        ('GET /courses/<id>/gradebook', 'get', f'/courses/{course}/gradebook', None, 10),
+        ('GET /enrollments?course_id', 'get', f'/enrollments?course_id={course}', None, 30),
+        ('GET /assignments', 'get', '/assignments', None, 30),
+        ('GET /assignment_submissions', 'get', '/assignment_submissions', None, 30),
+        ('GET /assignment_submissions?student_id', 'get', f'/assignment_submissions?student_id={student}', None, 30),
+        ('GET /enrollments?stream=1', 'get', '/enrollments?stream=1', None, 3),
+        ('POST /students', 'post', '/students',
+         lambda i: {'name': 'Bench Student', 'email': f'bench.{i}@example.org', 'grade_level': 10}, 30),
+        ('POST /students (bulk 100)', 'post', '/students',
+         lambda i: [{'name': 'Bench Student', 'email': f'bulk.{i}.{n}@example.org', 'grade_level': 10}
+                    for n in range(100)], 10),
+        ('PATCH /assignment_submissions (30 grades)', 'patch', '/assignment_submissions',
+         lambda i: [{'id': id, 'points_earned': 1} for id in range(1 + i * 30, 31 + i * 30)], 10),
+    ]
+
+
+def count_rows(response):
+    if response.mimetype == 'application/x-ndjson':
+        return response.get_data().count(b'\n')
+    payload = response.get_json(silent=True)
+    return len(payload) if isinstance(payload, list) else 1
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run_size(url, size):
+    """Seed ``url`` with ``size`` students and measure every endpoint (runs in a subprocess)."""
+    os.environ['DATABASE_URL'] = url
+    from sqlalchemy import event
+
+    from app import create_app
+    from config import db
+    from seed import seed_synthetic
+    app = create_app()
+
+    courses = max(8, size // 100)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(sys.stderr):
+            seed_synthetic(students=size, teachers=max(1, courses // 4), courses=courses,
+                           assignments_per_course=10, courses_per_student=6, submission_rate=0.8,
+                           seed=42, chunk_size=5000, workers=1)
+        seed_seconds = time.perf_counter() - started
+        engine = db.engine
+
+    statements = [0]
+
+    def count(*args):
+        statements[0] += 1
+
+    event.listen(engine, 'before_cursor_execute', count)
+    client = app.test_client()
+    results = {}
+    for name, method, path, body, repeats in endpoints(size, courses):
+        latencies, rows, sql = [], 0, []
+        for i in range(repeats):
+            statements[0] = 0
+            kwargs = {'json': body(i)} if body else {}
+            start = time.perf_counter()
+            response = getattr(client, method)(path, **kwargs)
+            rows += count_rows(response)
+            latencies.append(time.perf_counter() - start)
+            sql.append(statements[0])
+            if response.status_code >= 400:
+                raise RuntimeError(f"{name}: HTTP {response.status_code} {response.get_data(as_text=True)[:200]}")
+        results[name] = {
+            'p50_ms': round(statistics.median(latencies) * 1000, 3),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+            'rows_per_sec': round(rows / sum(latencies), 1),
+            'sql_statements': max(sql),
+            'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        }
+    return {'seed_seconds': round(seed_seconds, 2), 'endpoints': results}
+
+
+def scaling_exponent(small, large, size_small, size_large):
+    """Slope of log(latency) against log(size): ~0 for O(page) endpoints, ~1 for O(n)."""
+    if small <= 0 or large <= 0 or size_small == size_large:
+        return None
+    return round(math.log(large / small) / math.log(size_large / size_small), 2)
+
+
+def report(results, baseline, threshold):
+    regressions = 0
+    for backend, sizes in results['backends'].items():
+        ordered = sorted(sizes, key=int)
+        print(f"\n== {backend} ==")
+        print(f"{'endpoint':<44}" + ''.join(f"{'p50@' + s:>12}" for s in ordered) + f"{'exp':>7}{'sql':>5}")
+        for name in sizes[ordered[0]]['endpoints']:
+            p50s = [sizes[s]['endpoints'][name]['p50_ms'] for s in ordered]
+            exponent = scaling_exponent(p50s[0], p50s[-1], int(ordered[0]), int(ordered[-1]))
+            sql = sizes[ordered[-1]]['endpoints'][name]['sql_statements']
+            line = f"{name:<44}" + ''.join(f"{p:>12.2f}" for p in p50s) + f"{'' if exponent is None else exponent:>7}{sql:>5}"
+            old = baseline.get('backends', {}).get(backend, {}).get(ordered[-1], {}).get('endpoints', {}).get(name)
+            if old:
+                ratio = p50s[-1] / old['p50_ms'] if old['p50_ms'] else 1
+                if ratio > threshold:
+                    regressions += 1
+                    line += f"  REGRESSION x{ratio:.2f}"
+                if sql > old['sql_statements']:
+                    regressions += 1
+                    line += f"  SQL {old['sql_statements']}->{sql}"
+            print(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='1000,5000,20000', help='comma-separated student counts')
+    parser.add_argument('--output', default='bench_output.json')
+    parser.add_argument('--baseline', help='earlier --output file to compare against')
+    parser.add_argument('--threshold', type=float, default=1.25, help='p50 ratio reported as a regression')
+    parser.add_argument('--run-size', nargs=2, metavar=('URL', 'SIZE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_size:
+        url, size = args.run_size
+        json.dump(run_size(url, int(size)), sys.stdout)
+        return 0
+
+    backends = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        targets = [('sqlite', lambda size: f"sqlite:///{os.path.join(tmp, f'bench_{size}.db')}")]
+        if os.environ.get('BENCH_POSTGRES_URL'):
+            targets.append(('postgresql', lambda size: os.environ['BENCH_POSTGRES_URL']))
+        for backend, url_for_size in targets:
+            for size in args.sizes.split(','):
+                print(f"{backend}: {size} students...", file=sys.stderr)
+                output = subprocess.run(
+                    [sys.executable, '-m', 'benchmarks.endpoints', '--run-size', url_for_size(size), size],
+                    check=True, stdout=subprocess.PIPE, text=True,
+                ).stdout
+                backends.setdefault(backend, {})[size] = json.loads(output.strip().splitlines()[-1])
+
+    results = {'python': sys.version.split()[0], 'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'backends': backends}
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    print(f"Wrote {args.output}", file=sys.stderr)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    return 1 if report(results, baseline, args.threshold) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,211 @@
+"""/events under the shipped gunicorn configs: API latency, idle CPU and fan-out.
+
+Starts ``gunicorn wsgi:app`` (gunicorn.conf.py, gthread) and ``gunicorn -c
+gunicorn.events.conf.py wsgi:app`` (gevent) against a temporary SQLite
+database, then:
+
+* opens ``--subscribers`` streams on the gevent server, measures its
+  worker's CPU time while they sit idle, times API requests to the
+  gthread server, and times until every stream has the event of a PATCH
+  made through the gthread server;
+* opens ``--subscribers`` streams on the gthread server and times API
+  requests to it while they are open; by default streams beyond half the
+  threads get 503, ``--uncapped`` sets EVENTS_MAX_SUBSCRIBERS=0 there to
+  show what they do to the API otherwise:
+
+    python -m benchmarks.events_bench --subscribers 3000 --idle 10
+"""
+import argparse
+import http.client
+import os
+import selectors
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_gunicorn(config, env):
+    command = [sys.executable, '-m', 'gunicorn'] + (['-c', config] if config else []) + ['wsgi:app']
+    return subprocess.Popen(command, cwd=SERVER_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_until_up(port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if get(port, '/students/1') is not None:
+            return
+        time.sleep(0.1)
+    raise RuntimeError(f'server on port {port} did not start')
+
+
+def stop(process):
+    process.terminate()
+    process.wait(30)
+
+
+def worker_cpu(master):
+    """CPU seconds used so far by the worker processes of a gunicorn master."""
+    total = 0
+    for pid in os.listdir('/proc'):
+        if not pid.isdigit():
+            continue
+        try:
+            with open(f'/proc/{pid}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == master:
+            total += int(fields[11]) + int(fields[12])
+    return total / os.sysconf('SC_CLK_TCK')
+
+
+def get(port, path, timeout=5):
+    """Seconds one request takes on a new connection, or ``None`` if it fails or times out."""
+    start = time.perf_counter()
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+    try:
+        connection.request('GET', path)
+        response = connection.getresponse()
+        response.read()
+        return time.perf_counter() - start if response.status == 200 else None
+    except OSError:
+        return None
+    finally:
+        connection.close()
+
+
+def api_latency(port, requests):
+    timings = [get(port, '/students/1') for _ in range(requests)]
+    served = sorted(timing for timing in timings if timing is not None)
+    if not served:
+        return f"{'-':>9}{'-':>9}{len(timings):>9}"
+    p99 = served[min(len(served) - 1, int(len(served) * 0.99))]
+    return (f"{statistics.median(served) * 1000:>9.1f}{p99 * 1000:>9.1f}"
+            f"{len(timings) - len(served):>9}")
+
+
+def connect(port, count):
+    selector = selectors.DefaultSelector()
+    sockets = []
+    for _ in range(count):
+        sock = socket.create_connection(('127.0.0.1', port))
+        sock.sendall(b'GET /events HTTP/1.1\r\nHost: localhost\r\nAccept: text/event-stream\r\n\r\n')
+        sock.setblocking(False)
+        selector.register(sock, selectors.EVENT_READ)
+        sockets.append(sock)
+    return selector, sockets
+
+
+def read_until(selector, sockets, markers, timeout=60):
+    """Read from every socket until it has received one of ``markers``; ``{marker: count}``."""
+    pending = {sock: b'' for sock in sockets}
+    found = dict.fromkeys(markers, 0)
+    deadline = time.monotonic() + timeout
+    while pending and time.monotonic() < deadline:
+        for key, _ in selector.select(timeout=1):
+            sock = key.fileobj
+            try:
+                data = sock.recv(65536)
+            except OSError:
+                data = b''
+            if sock not in pending:
+                continue
+            pending[sock] += data
+            marker = next((marker for marker in markers if marker in pending[sock]), None)
+            if marker is not None:
+                found[marker] += 1
+                del pending[sock]
+            elif not data:
+                selector.unregister(sock)
+                del pending[sock]
+    return found
+
+
+def close(selector, sockets):
+    for sock in sockets:
+        sock.close()
+    selector.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--subscribers', type=int, default=3000)
+    parser.add_argument('--idle', type=float, default=10.0, help='Seconds to measure idle CPU over.')
+    parser.add_argument('--requests', type=int, default=200, help='API requests per latency sample.')
+    parser.add_argument('--uncapped', action='store_true',
+                        help='Run the gthread server with EVENTS_MAX_SUBSCRIBERS=0.')
+    parser.add_argument('--port', type=int, default=5601)
+    parser.add_argument('--events-port', type=int, default=5611)
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp.name, 'events.db')}"
+    os.environ['METRICS_ENABLED'] = '0'
+    from app import create_app
+    from config import db
+    from models import Student
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        db.session.add(Student(name='Student One', email='one@example.org', grade_level=9))
+        db.session.commit()
+
+    env = dict(os.environ, PORT=str(args.port), EVENTS_PORT=str(args.events_port))
+    if args.uncapped:
+        env['EVENTS_MAX_SUBSCRIBERS'] = '0'
+    api = start_gunicorn(None, env)
+    events = start_gunicorn('gunicorn.events.conf.py', env)
+    try:
+        wait_until_up(args.port)
+        wait_until_up(args.events_port)
+
+        rows = [('no streams open', api_latency(args.port, args.requests))]
+
+        start = time.perf_counter()
+        selector, sockets = connect(args.events_port, args.subscribers)
+        connected = read_until(selector, sockets, (b'retry:',))[b'retry:']
+        print(f"gevent server: {connected} streams connected in {time.perf_counter() - start:.1f}s")
+        rows.append((f"{connected} streams on the gevent server", api_latency(args.port, args.requests)))
+
+        before = worker_cpu(events.pid)
+        time.sleep(args.idle)
+        idle = worker_cpu(events.pid) - before
+        print(f"idle worker CPU: {idle * 1000:.0f} ms over {args.idle:.0f}s ({idle / args.idle * 100:.2f}% of a core)")
+
+        before = worker_cpu(events.pid)
+        start = time.perf_counter()
+        connection = http.client.HTTPConnection('127.0.0.1', args.port, timeout=10)
+        connection.request('PATCH', '/students/1', body='{"grade_level": 10}',
+                           headers={'Content-Type': 'application/json'})
+        connection.getresponse().read()
+        connection.close()
+        delivered = read_until(selector, sockets, (b'event: change',))[b'event: change']
+        elapsed = time.perf_counter() - start
+        print(f"fan-out: {delivered}/{len(sockets)} streams had the event after {elapsed * 1000:.0f} ms "
+              f"(worker CPU {(worker_cpu(events.pid) - before) * 1000:.0f} ms)")
+        close(selector, sockets)
+
+        # Last: a gthread worker only frees a closed stream's thread at its next keep-alive
+        selector, sockets = connect(args.port, args.subscribers)
+        found = read_until(selector, sockets, (b'retry:', b' 503 '), timeout=10)
+        rows.append((f"{found[b'retry:']} streams on it, {found[b' 503 ']} refused (503)",
+                     api_latency(args.port, args.requests)))
+        close(selector, sockets)
+
+        print()
+        print(f"{'GET /students/1 on gthread server':<46}{'p50 ms':>9}{'p99 ms':>9}{'failed':>9}")
+        for label, latency in rows:
+            print(f"{label:<46}{latency}")
+    finally:
+        stop(api)
+        stop(events)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Payload size and latency of /assignment_submissions with and without ?fields=.
+
+Seeds a temporary SQLite database, gives every submission a 2-10k
+character ``content`` (the model allows up to 10k), and times full pages
+against a projection of the grading columns.
+
+    python -m benchmarks.fields_bench --students 2000 --limit 1000
+"""
+import argparse
+import contextlib
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--students', type=int, default=2000)
+    parser.add_argument('--limit', type=int, default=1000)
+    parser.add_argument('--repeats', type=int, default=20)
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp.name, 'fields.db')}"
+    os.environ['METRICS_ENABLED'] = '0'
+    from sqlalchemy import bindparam, update
+
+    from app import create_app
+    from config import db
+    from models import AssignmentSubmission
+    from seed import seed_synthetic
+    app = create_app()
+
+    rng = random.Random(42)
+    with app.app_context():
+        db.create_all()
+        with contextlib.redirect_stdout(sys.stderr):
+            seed_synthetic(students=args.students, teachers=max(1, args.students // 400),
+                           courses=max(8, args.students // 100), assignments_per_course=10,
+                           courses_per_student=6, submission_rate=0.8, seed=42, chunk_size=5000, workers=1)
+        ids = db.session.execute(db.select(AssignmentSubmission.id).order_by(AssignmentSubmission.id).limit(args.limit)).scalars().all()
+        words = ['lorem', 'ipsum', 'dolor', 'sit', 'amet', 'essay', 'answer', 'because']
+        table = AssignmentSubmission.__table__
+        db.session.execute(
+            update(table).where(table.c.id == bindparam('b_id')).values(content=bindparam('b_content')),
+            [{'b_id': id, 'b_content': ' '.join(rng.choices(words, k=rng.randint(350, 1700)))[:10000]}
+             for id in ids],
+        )
+        db.session.commit()
+
+    client = app.test_client()
+    fields = 'id,student_id,assignment_id,points_earned,submitted'
+    print(f"{'request':<60}{'bytes':>12}{'p50 ms':>10}")
+    for query in (f'limit={args.limit}', f'limit={args.limit}&fields={fields}'):
+        url = f'/assignment_submissions?{query}'
+        client.get(url)
+        latencies = []
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            response = client.get(url)
+            latencies.append(time.perf_counter() - start)
+        print(f"{url:<60}{len(response.data):>12,}{statistics.median(latencies) * 1000:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
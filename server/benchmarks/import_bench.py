@@ -0,0 +1,86 @@
+"""Roster import throughput (rows/sec) for generated student, course and enrollment CSVs.
+
+Imports into a fresh temporary SQLite database (or DATABASE_URL, to
+measure COPY on Postgres), with 1% invalid rows mixed in:
+
+    python -m benchmarks.import_bench --students 50000 --enrollments 200000
+"""
+import argparse
+import io
+import os
+import random
+import tempfile
+import time
+
+
+def student_csv(count, rng):
+    out = io.StringIO()
+    out.write('name,email,grade_level\n')
+    for n in range(count):
+        email = 'not-an-email' if rng.random() < 0.01 else f'student{n}@example.org'
+        out.write(f'Student {n},{email},{rng.randint(1, 12)}\n')
+    return out.getvalue()
+
+
+def course_csv(count):
+    out = io.StringIO()
+    out.write('name,course_code,credits,teacher_email\n')
+    for n in range(count):
+        out.write(f'Course {n},CRS{1000 + n},{1 + n % 5},teacher{n % 20}@example.org\n')
+    return out.getvalue()
+
+
+def enrollment_csv(count, students, courses, rng):
+    out = io.StringIO()
+    out.write('student_email,course_code,semester\n')
+    seen = set()
+    while len(seen) < count:
+        key = (rng.randrange(students), rng.randrange(courses), rng.choice(('Fall', 'Spring', 'Summer')))
+        if key in seen:
+            continue
+        seen.add(key)
+        out.write(f'student{key[0]}@example.org,CRS{1000 + key[1]},{key[2]}\n')
+    return out.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--students', type=int, default=50000)
+    parser.add_argument('--courses', type=int, default=500)
+    parser.add_argument('--enrollments', type=int, default=200000)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tmp.name, 'imports.db')}")
+    os.environ['METRICS_ENABLED'] = '0'
+    from app import create_app
+    from config import db
+    from imports import import_csv
+    from models import Teacher
+    app = create_app()
+
+    rng = random.Random(42)
+    files = [
+        ('students', student_csv(args.students, rng)),
+        ('courses', course_csv(args.courses)),
+        ('enrollments', enrollment_csv(args.enrollments, args.students, args.courses, rng)),
+    ]
+    with app.app_context():
+        db.create_all()
+        db.session.add_all(Teacher(name=f'Teacher {n}', email=f'teacher{n}@example.org', department='Math')
+                           for n in range(20))
+        db.session.commit()
+
+        print(f"{'kind':<14}{'rows':>10}{'imported':>10}{'failed':>8}{'seconds':>10}{'rows/s':>10}")
+        for kind, text in files:
+            rows = text.count('\n') - 1
+            start = time.perf_counter()
+            imported, errors = import_csv(kind, io.StringIO(text), args.batch_size)
+            db.session.commit()
+            elapsed = time.perf_counter() - start
+            print(f"{kind:<14}{rows:>10}{imported:>10}{len(errors):>8}{elapsed:>10.2f}{rows / elapsed:>10,.0f}")
+
+
+if __name__ == '__main__':
+    main()
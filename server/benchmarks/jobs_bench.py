@@ -0,0 +1,70 @@
+"""Time to queue heavy work with POST /jobs, and to drain the queue with more worker processes.
+
+Queues ``--jobs`` submission exports against a seeded SQLite database,
+then times ``flask jobs work --burst`` running them with 1 up to
+``--max-processes`` processes. Extra processes only help with as many
+CPU cores:
+
+    python -m benchmarks.jobs_bench --jobs 8 --max-processes 4
+"""
+import argparse
+import contextlib
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--students', type=int, default=5000)
+    parser.add_argument('--jobs', type=int, default=8)
+    parser.add_argument('--max-processes', type=int, default=4)
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp.name, 'jobs.db')}"
+    os.environ['JOBS_OUTPUT_DIR'] = os.path.join(tmp.name, 'files')
+    os.environ['METRICS_ENABLED'] = '0'
+    os.environ['EVENTS_ENABLED'] = '0'
+    from app import create_app
+    from config import db
+    from seed import seed_synthetic
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        with contextlib.redirect_stdout(sys.stderr):
+            seed_synthetic(students=args.students, teachers=10, courses=40, assignments_per_course=5,
+                           courses_per_student=4, submission_rate=0.8, seed=42, chunk_size=5000, workers=1)
+    client = app.test_client()
+
+    export = client.get('/exports/submissions.csv')
+    start = time.perf_counter()
+    rows = export.get_data().count(b'\n') - 1
+    print(f"synchronous GET /exports/submissions.csv: {(time.perf_counter() - start) * 1000:.0f} ms ({rows} rows)")
+
+    print()
+    print(f"{'processes':>9}{'enqueue ms':>12}{'drain s':>9}{'jobs/s':>8}")
+    processes = 1
+    while processes <= args.max_processes:
+        latencies = []
+        for _ in range(args.jobs):
+            start = time.perf_counter()
+            response = client.post('/jobs', json={'kind': 'export', 'params': {'name': 'submissions'}})
+            latencies.append(time.perf_counter() - start)
+            assert response.status_code == 202, response.data
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-m', 'flask', 'jobs', 'work', '--burst', '--processes', str(processes)],
+                       cwd=SERVER_DIR, env={**os.environ, 'FLASK_APP': 'app.py'}, check=True,
+                       stdout=subprocess.DEVNULL)
+        drain = time.perf_counter() - start
+        print(f"{processes:>9}{statistics.median(latencies) * 1000:>12.1f}{drain:>9.1f}{args.jobs / drain:>8.2f}")
+        processes *= 2
+
+
+if __name__ == '__main__':
+    main()
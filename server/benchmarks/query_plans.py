@@ -0,0 +1,68 @@
+"""Check that relationship loads and collection filters use indexes.
+
+Runs EXPLAIN QUERY PLAN (SQLite) or EXPLAIN (PostgreSQL) for the queries
+the ORM emits for lazy relationship loads and exits non-zero if any of
+them scans a whole table. Uses DATABASE_URL when set (run ``flask db
+upgrade`` first); otherwise builds the schema in an in-memory database.
+
+    python -m benchmarks.query_plans
+"""
+import os
+import sys
+
+from sqlalchemy import select, text
+
+creating = 'DATABASE_URL' not in os.environ
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from app import create_app  # noqa: E402
+from config import db  # noqa: E402
+from models import Student, Course, Enrollment, Assignment, AssignmentSubmission  # noqa: E402
+
+app = create_app()
+
+
+QUERIES = {
+    'Student.enrollments': select(Enrollment).where(Enrollment.student_id == 1),
+    'Course.enrollments': select(Enrollment).where(Enrollment.course_id == 1),
+    'Course.assignments': select(Assignment).where(Assignment.course_id == 1),
+    'Teacher.courses': select(Course).where(Course.teacher_id == 1),
+    'Student.assignment_submissions': select(AssignmentSubmission).where(AssignmentSubmission.student_id == 1),
+    'Assignment.submissions': select(AssignmentSubmission).where(AssignmentSubmission.assignment_id == 1),
+    'students?grade_level': select(Student).where(Student.grade_level == 9, Student.id > 0).order_by(Student.id),
+    'enrollment uniqueness': select(Enrollment).where(
+        Enrollment.student_id == 1, Enrollment.course_id == 1, Enrollment.semester == 'Fall'),
+}
+
+
+def explain(connection, stmt):
+    dialect = connection.dialect
+    sql = str(stmt.compile(dialect=dialect, compile_kwargs={'literal_binds': True}))
+    if dialect.name == 'sqlite':
+        plan = [row.detail for row in connection.execute(text(f'EXPLAIN QUERY PLAN {sql}'))]
+        uses_index = all('USING' in line for line in plan if line.startswith(('SCAN', 'SEARCH')))
+    else:
+        # Tiny tables make the planner prefer sequential scans; ask whether an index *can* be used
+        connection.execute(text('SET LOCAL enable_seqscan = off'))
+        plan = [row[0] for row in connection.execute(text(f'EXPLAIN {sql}'))]
+        uses_index = not any('Seq Scan' in line for line in plan)
+    return uses_index, plan
+
+
+def main():
+    failures = 0
+    with app.app_context():
+        if creating:
+            db.create_all()
+        with db.engine.connect() as connection:
+            for name, stmt in QUERIES.items():
+                uses_index, plan = explain(connection, stmt)
+                print(f"{'ok  ' if uses_index else 'SCAN'} {name}")
+                for line in plan:
+                    print(f"       {line}")
+                failures += not uses_index
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
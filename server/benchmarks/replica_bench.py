@@ -0,0 +1,125 @@
+"""GET throughput as read replicas are added.
+
+By default the primary is a seeded SQLite file and the replicas are
+copies of it. A local SQLite file is never the bottleneck, so each
+database is modelled as a server: at most ``--capacity`` statements run
+on it at once and each takes ``--latency-ms``. Pass real databases
+(e.g. two local Postgres instances) with ``--primary`` and ``--replicas``,
+and ``--latency-ms 0`` to turn the model off:
+
+    python -m benchmarks.replica_bench --max-replicas 3
+    python -m benchmarks.replica_bench --primary postgresql://localhost:5432/school \\
+        --replicas postgresql://localhost:5433/school --latency-ms 0
+"""
+import argparse
+import contextlib
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+
+def throttle(engine, capacity, latency):
+    """Make ``engine`` behave like a server running ``capacity`` statements at a time."""
+    from sqlalchemy import event
+
+    slots = threading.BoundedSemaphore(capacity)
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def acquire(conn, cursor, statement, parameters, context, executemany):
+        slots.acquire()
+        time.sleep(latency)
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def release(conn, cursor, statement, parameters, context, executemany):
+        slots.release()
+
+    @event.listens_for(engine, 'handle_error')
+    def release_on_error(context):
+        slots.release()
+
+
+def run(app, clients, duration):
+    counts = [0] * clients
+    errors = [0] * clients
+    stop = time.perf_counter() + duration
+
+    def client(n):
+        http = app.test_client()
+        page = 0
+        while time.perf_counter() < stop:
+            response = http.get('/students', query_string={'limit': 20, 'offset': (page % 50) * 20})
+            if response.status_code == 200:
+                counts[n] += 1
+            else:
+                errors[n] += 1
+            page += 1
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / duration, sum(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--primary', help='Primary database URL (default: a seeded SQLite file)')
+    parser.add_argument('--replicas', help='Comma-separated replica URLs (default: copies of the SQLite primary)')
+    parser.add_argument('--max-replicas', type=int, default=3)
+    parser.add_argument('--students', type=int, default=2000)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--latency-ms', type=float, default=10.0, help='Modelled time per statement; 0 to disable.')
+    parser.add_argument('--capacity', type=int, default=2, help='Modelled concurrent statements per database.')
+    args = parser.parse_args()
+
+    os.environ['METRICS_ENABLED'] = '0'
+    os.environ['CACHE_ENABLED'] = '0'
+    os.environ['EVENTS_ENABLED'] = '0'
+    from app import create_app
+    from config import db
+    from seed import seed_synthetic
+
+    tmp = tempfile.TemporaryDirectory()
+    primary = args.primary
+    if primary is None:
+        path = os.path.join(tmp.name, 'primary.db')
+        primary = f'sqlite:///{path}'
+        with create_app({'SQLALCHEMY_DATABASE_URI': primary}).app_context():
+            db.create_all()
+            with contextlib.redirect_stdout(sys.stderr):
+                seed_synthetic(students=args.students, teachers=5, courses=20, assignments_per_course=2,
+                               courses_per_student=2, submission_rate=0.5, seed=42, chunk_size=1000, workers=1)
+        source = sqlite3.connect(path)
+        replica_urls = []
+        for n in range(args.max_replicas):
+            copy = os.path.join(tmp.name, f'replica{n}.db')
+            with sqlite3.connect(copy) as target:
+                source.backup(target)
+            replica_urls.append(f'sqlite:///file:{copy}?mode=ro&uri=true')
+        source.close()
+    else:
+        replica_urls = [url.strip() for url in (args.replicas or '').split(',') if url.strip()]
+
+    print(f"{'replicas':>8}{'req/s':>10}{'errors':>8}{'speedup':>9}")
+    baseline = None
+    for count in range(min(args.max_replicas, len(replica_urls)) + 1):
+        app = create_app({'SQLALCHEMY_DATABASE_URI': primary, 'DATABASE_REPLICA_URLS': replica_urls[:count]})
+        if args.latency_ms:
+            with app.app_context():
+                for engine in db.engines.values():
+                    throttle(engine, args.capacity, args.latency_ms / 1000)
+        rate, errors = run(app, args.clients, args.duration)
+        baseline = baseline or rate
+        print(f"{count:>8}{rate:>10.0f}{errors:>8}{rate / baseline:>8.2f}x")
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Compare SerializerMixin.to_dict() with the compiled serializers.
+
+Run from the server directory:
+
+    python -m benchmarks.serializer_bench --rows 50000
+"""
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from sqlalchemy import insert  # noqa: E402
+
+from app import create_app  # noqa: E402
+from config import db  # noqa: E402
+from models import Student, Teacher, Course, Assignment, AssignmentSubmission  # noqa: E402
+from serializers import serializer_for  # noqa: E402
+
+app = create_app()
+
+
+def populate(rows):
+    now = datetime.now()
+    db.session.execute(insert(Teacher), [{'name': 'Bench Teacher', 'email': 'bench@example.org', 'department': 'Math'}])
+    db.session.execute(insert(Course), [{'name': 'Bench', 'course_code': 'BNCH100', 'credits': 3, 'teacher_id': 1}])
+    db.session.execute(insert(Assignment), [
+        {'title': f'Bench {i}', 'description': 'x' * 200, 'due_date': now, 'max_points': 100, 'course_id': 1}
+        for i in range(rows)
+    ])
+    db.session.execute(insert(Student), [
+        {'name': f'Student {i}', 'email': f'student{i}@example.org', 'grade_level': 9 + i % 4}
+        for i in range(rows)
+    ])
+    db.session.execute(insert(AssignmentSubmission), [
+        {'student_id': i + 1, 'assignment_id': 1, 'content': 'x' * 200, 'points_earned': i % 100,
+         'submitted': bool(i % 2), 'submission_date': now}
+        for i in range(rows)
+    ])
+    db.session.commit()
+
+
+def timed(label, rows, fn):
+    db.session.expunge_all()
+    start = time.perf_counter()
+    payload = fn()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<28} {rows / elapsed:>12,.0f} rows/sec")
+    return payload
+
+
+def bench(model, rows):
+    serializer = serializer_for(model)
+    print(f"{model.__name__} ({rows} rows)")
+    mixin = timed('SerializerMixin.to_dict', rows, lambda: [obj.to_dict() for obj in model.query.all()])
+    compiled_obj = timed('compiled serializer (ORM)', rows, lambda: [serializer.obj(obj) for obj in model.query.all()])
+    compiled_row = timed('compiled serializer (rows)', rows, lambda: [
+        serializer.row(row) for row in db.session.execute(serializer.select().order_by(model.id))
+    ])
+    expected = json.dumps(mixin, sort_keys=True)
+    assert json.dumps(compiled_obj, sort_keys=True) == expected, 'ORM path output differs from to_dict()'
+    assert json.dumps(compiled_row, sort_keys=True) == expected, 'row path output differs from to_dict()'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20000)
+    args = parser.parse_args()
+
+    with app.app_context():
+        db.create_all()
+        populate(args.rows)
+        bench(Student, args.rows)
+        bench(Assignment, args.rows)
+        bench(AssignmentSubmission, args.rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Import time, create_app() time and gunicorn worker boot, with and without --preload.
+
+Each measurement runs in fresh interpreters. Worker boot is the time from
+starting gunicorn until every worker has finished initializing (reported
+by a ``post_worker_init`` hook), plus the workers' proportional set size
+(memory shared with the master counts only once):
+
+    python -m benchmarks.startup_bench --runs 5 --workers 4
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFERRED = ('flask_migrate', 'faker', 'pyarrow')
+
+
+def timed_python(code, runs):
+    """Median wall time of ``python -c code``, less the interpreter's own startup."""
+    def run(source):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', source], cwd=SERVER_DIR, check=True)
+        return time.perf_counter() - start
+    baseline = statistics.median(run('pass') for _ in range(runs))
+    return statistics.median(run(code) for _ in range(runs)) - baseline
+
+
+def pss_kb(pid):
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                if line.startswith('Pss:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def boot_gunicorn(workers, preload, port):
+    tmp = tempfile.TemporaryDirectory()
+    marks = os.path.join(tmp.name, 'booted')
+    config = os.path.join(tmp.name, 'gunicorn_bench.conf.py')
+    with open(config, 'w') as f:
+        f.write(f"exec(open({os.path.join(SERVER_DIR, 'gunicorn.conf.py')!r}).read())\n"
+                f"bind = '127.0.0.1:{port}'\n"
+                f"workers = {workers}\n"
+                f"preload_app = {preload}\n"
+                "import os\n"
+                "def post_worker_init(worker):\n"
+                f"    with open({marks!r}, 'a') as f:\n"
+                "        f.write(f'{time.time()} {os.getpid()}\\n')\n"
+                "import time\n")
+    start = time.time()
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', config, 'wsgi:app'], cwd=SERVER_DIR,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        booted = []
+        while len(booted) < workers and time.time() - start < 60:
+            time.sleep(0.01)
+            if os.path.exists(marks):
+                with open(marks) as f:
+                    booted = [line.split() for line in f if line.strip()]
+        ready = max(float(stamp) for stamp, _ in booted) - start
+        memory = sum(pss_kb(int(pid)) for _, pid in booted) + pss_kb(process.pid)
+        return ready, memory
+    finally:
+        process.terminate()
+        process.wait(10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--port', type=int, default=5602)
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp.name, 'startup.db')}"
+
+    print(f"{'':<34}{'ms':>8}")
+    print(f"{'import app':<34}{timed_python('import app', args.runs) * 1000:>8.0f}")
+    print(f"{'import app; create_app()':<34}"
+          f"{timed_python('import app; app.create_app()', args.runs) * 1000:>8.0f}")
+    for module in DEFERRED:
+        try:
+            cost = timed_python(f'import app, {module}', args.runs) - timed_python('import app', args.runs)
+        except subprocess.CalledProcessError:
+            continue
+        print(f"{'deferred: ' + module:<34}{cost * 1000:>8.0f}")
+
+    print()
+    print(f"{'gunicorn workers':<20}{'preload':>8}{'ready ms':>10}{'PSS MB':>8}")
+    for preload in (False, True):
+        results = [boot_gunicorn(args.workers, preload, args.port) for _ in range(args.runs)]
+        ready = statistics.median(ready for ready, _ in results)
+        memory = statistics.median(memory for _, memory in results)
+        print(f"{args.workers:<20}{'on' if preload else 'off':>8}{ready * 1000:>10.0f}{memory / 1024:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,283 @@
+from flask import current_app, request, make_response
+from sqlalchemy import inspect, insert, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+
+from config import db
+from listing import parse_bool
+from models import (Student, Course, Enrollment, Assignment, AssignmentSubmission,
+                    check_points_earned, refresh_grade_summaries, summary_pairs_select)
+
+
+def column_values(instance):
+    """Column values set on a transient instance (after its validators ran)."""
+    state = inspect(instance)
+    return {attr.key: state.dict[attr.key] for attr in state.mapper.column_attrs if attr.key in state.dict}
+
+
+def item_error(index, message):
+    return {'index': index, 'error': message}
+
+
+class BulkLoader:
+    """Validate a JSON array of new rows and insert it in multi-row chunks.
+
+    Each item goes through the resource's ``build`` function, so the model's
+    ``@validates`` rules apply exactly as on the single-item path. Checks
+    that need the database (uniqueness, referenced rows) run once per chunk
+    in ``check``; rows that pass are inserted with one executemany
+    ``INSERT ... RETURNING id`` per chunk. Everything runs in one
+    transaction.
+    """
+
+    model = None
+
+    def __init__(self, build):
+        self.build = build
+
+    def prepare(self, items):
+        """Load what ``build_item`` needs for one chunk of raw items."""
+
+    def build_item(self, item):
+        return self.build(item)
+
+    def check(self, chunk):
+        """Return ``{index: message}`` for rows of ``chunk`` that cannot be inserted."""
+        return {}
+
+    def after_insert(self, connection, ids):
+        pass
+
+    def run(self, items, chunk_size):
+        results = [None] * len(items)
+        for start in range(0, len(items), chunk_size):
+            chunk = []
+            end = min(start + chunk_size, len(items))
+            self.prepare([item for item in items[start:end] if isinstance(item, dict)])
+            for index in range(start, end):
+                item = items[index]
+                try:
+                    if not isinstance(item, dict):
+                        raise ValueError("Each item must be a JSON object")
+                    chunk.append((index, column_values(self.build_item(item))))
+                except KeyError as e:
+                    results[index] = item_error(index, f"Missing field: {e.args[0]}")
+                except (ValueError, TypeError, AttributeError) as e:
+                    results[index] = item_error(index, str(e))
+
+            for index, message in self.check(chunk).items():
+                results[index] = item_error(index, message)
+            chunk = [(index, values) for index, values in chunk if results[index] is None]
+            if not chunk:
+                continue
+
+            ids = []
+            for index, id in self.insert(chunk):
+                results[index] = {'index': index, 'id': id}
+                ids.append(id)
+            self.after_insert(db.session.connection(), ids)
+        return results
+
+    def insert(self, chunk):
+        """Insert ``(index, values)`` pairs and yield ``(index, id)``.
+
+        ``sort_by_parameter_order`` would make SQLite fall back to one
+        INSERT per row (it has no insert sentinel), so the returned rows are
+        matched back to the items by their inserted values instead. Items
+        with identical values are interchangeable.
+        """
+        groups = {}
+        for index, values in chunk:
+            groups.setdefault(tuple(values), []).append((index, values))
+        for keys, group in groups.items():
+            pending = {}
+            for index, values in group:
+                pending.setdefault(tuple(values[key] for key in keys), []).insert(0, index)
+            columns = [getattr(self.model, key) for key in keys]
+            returned = db.session.execute(
+                insert(self.model).returning(self.model.id, *columns), [values for _, values in group])
+            for id, *values in returned:
+                yield pending[tuple(values)].pop(), id
+
+
+def existing(column, values):
+    values = {value for value in values if value is not None}
+    if not values:
+        return set()
+    return set(db.session.execute(select(column).where(column.in_(values))).scalars())
+
+
+class StudentLoader(BulkLoader):
+    model = Student
+
+    def __init__(self, build):
+        super().__init__(build)
+        self.emails = set()
+
+    def check(self, chunk):
+        errors = {}
+        taken = existing(Student.email, (values['email'] for _, values in chunk))
+        for index, values in chunk:
+            if values['email'] in taken or values['email'] in self.emails:
+                errors[index] = 'Email already exists'
+            else:
+                self.emails.add(values['email'])
+        return errors
+
+
+class EnrollmentLoader(BulkLoader):
+    model = Enrollment
+
+    def __init__(self, build):
+        super().__init__(build)
+        self.keys = set()
+
+    def check(self, chunk):
+        errors = {}
+        students = existing(Student.id, (values['student_id'] for _, values in chunk))
+        courses = existing(Course.id, (values['course_id'] for _, values in chunk))
+        keys = {(values['student_id'], values['course_id'], values['semester']) for _, values in chunk}
+        enrolled = set(db.session.execute(
+            select(Enrollment.student_id, Enrollment.course_id, Enrollment.semester)
+            .where(tuple_(Enrollment.student_id, Enrollment.course_id, Enrollment.semester).in_(keys))
+        ).all()) if keys else set()
+        for index, values in chunk:
+            key = (values['student_id'], values['course_id'], values['semester'])
+            if values['student_id'] not in students:
+                errors[index] = 'Student not found'
+            elif values['course_id'] not in courses:
+                errors[index] = 'Course not found'
+            elif key in enrolled or key in self.keys:
+                errors[index] = 'Student already enrolled in this course'
+            else:
+                self.keys.add(key)
+        return errors
+
+
+class SubmissionLoader(BulkLoader):
+    model = AssignmentSubmission
+
+    def __init__(self, build):
+        super().__init__(build)
+        self.max_points = {}
+
+    def prepare(self, items):
+        # One query per chunk; build() validates points_earned against it instead of querying per item
+        assignment_ids = {item.get('assignment_id') for item in items if isinstance(item.get('assignment_id'), int)}
+        self.max_points = dict(db.session.execute(
+            select(Assignment.id, Assignment.max_points).where(Assignment.id.in_(assignment_ids))
+        ).all()) if assignment_ids else {}
+
+    def build_item(self, item):
+        assignment_id = item.get('assignment_id')
+        return self.build(item, self.max_points.get(assignment_id) if isinstance(assignment_id, int) else None)
+
+    def check(self, chunk):
+        errors = {}
+        students = existing(Student.id, (values['student_id'] for _, values in chunk))
+        for index, values in chunk:
+            if values['student_id'] not in students:
+                errors[index] = 'Student not found'
+            elif values['assignment_id'] not in self.max_points:
+                errors[index] = 'Assignment not found'
+        return errors
+
+    def after_insert(self, connection, ids):
+        refresh_grade_summaries(connection, summary_pairs_select(ids))
+
+
+def grade_submissions(items):
+    """Apply ``[{id, points_earned}, ...]`` with a fixed number of statements.
+
+    One SELECT preloads every submission's ``max_points``, the points are
+    validated against that map in memory, and the valid rows are written
+    with one executemany UPDATE. Grade summaries for the affected (student,
+    course) pairs are refreshed in the same transaction, set-based: four
+    statements in all, whatever the number of items.
+    """
+    results = [None] * len(items)
+    grades = {}
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not isinstance(item.get('id'), int) or 'points_earned' not in item:
+            results[index] = item_error(index, "Each item must be an object with an integer id and points_earned")
+        elif item['id'] in grades:
+            results[index] = item_error(index, "Duplicate submission id")
+        else:
+            grades[item['id']] = index
+
+    submissions = {
+        row.id: row for row in db.session.execute(
+            select(AssignmentSubmission.id, Assignment.max_points)
+            .join(Assignment, Assignment.id == AssignmentSubmission.assignment_id)
+            .where(AssignmentSubmission.id.in_(grades))
+        )
+    } if grades else {}
+
+    updates = []
+    for id, index in grades.items():
+        submission = submissions.get(id)
+        if submission is None:
+            results[index] = item_error(index, 'Submission not found')
+            continue
+        try:
+            points = check_points_earned(items[index]['points_earned'], submission.max_points)
+        except ValueError as e:
+            results[index] = item_error(index, str(e))
+            continue
+        updates.append({'id': id, 'points_earned': points})
+        results[index] = {'index': index, 'id': id}
+
+    if updates:
+        db.session.execute(update(AssignmentSubmission), updates)
+        refresh_grade_summaries(db.session.connection(), summary_pairs_select([values['id'] for values in updates]))
+    return results
+
+
+def parse_bulk_options():
+    atomic = parse_bool(request.args.get('atomic', '0'))
+    try:
+        chunk_size = int(request.args.get('chunk_size', current_app.config['BULK_CHUNK_SIZE']))
+    except ValueError:
+        raise ValueError('chunk_size must be an integer')
+    if chunk_size < 1:
+        raise ValueError('chunk_size must be at least 1')
+    return atomic, chunk_size
+
+
+def bulk_response(run, items, verb):
+    """Run a batch write and build the per-item response.
+
+    ``?atomic=1`` rolls everything back if any item fails; otherwise valid
+    items are committed and failures reported alongside them (207).
+    """
+    try:
+        atomic, chunk_size = parse_bulk_options()
+    except ValueError as e:
+        return make_response({'error': str(e)}, 400)
+    if len(items) > current_app.config['BULK_MAX_ITEMS']:
+        return make_response({'error': f"At most {current_app.config['BULK_MAX_ITEMS']} items per request"}, 400)
+
+    try:
+        results = run(items, chunk_size)
+    except IntegrityError:
+        db.session.rollback()
+        return make_response({'error': 'Conflicting rows were written concurrently; nothing was saved'}, 409)
+
+    failed = sum(1 for result in results if 'error' in result)
+    succeeded = len(results) - failed
+    if failed and (atomic or not succeeded):
+        db.session.rollback()
+        for result in results:
+            result.pop('id', None)
+        return make_response({verb: 0, 'failed': failed, 'results': results}, 400)
+
+    db.session.commit()
+    return make_response({verb: succeeded, 'failed': failed, 'results': results},
+                         207 if failed else (201 if verb == 'created' else 200))
+
+
+def bulk_create_response(loader, items):
+    return bulk_response(loader.run, items, 'created')
+
+
+def batch_grade_response(items):
+    return bulk_response(lambda items, chunk_size: grade_submissions(items), items, 'updated')
@@ -0,0 +1,344 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from werkzeug.utils import import_string
+
+from config import node_file
+from replicas import primary_reads
+
+# Table changed by a bulk statement, so any of its rows may have changed
+ALL_ROWS = None
+
+
+class CacheBackend:
+    """Storage behind ``Cache``.
+
+    Entries are keyed by strings and may be evicted at any time. Counters
+    (``incr``/``counter``) hold the version numbers that make invalidation
+    safe and must never be evicted. A backend shared between workers (e.g.
+    Redis) has to pickle values; everything the API caches is plain
+    lists, dicts and scalars.
+    """
+
+    def get(self, key):
+        """Return the stored value, or ``None`` when missing or expired."""
+        raise NotImplementedError
+
+    def set(self, key, value, ttl):
+        raise NotImplementedError
+
+    def incr(self, key):
+        raise NotImplementedError
+
+    def counter(self, key):
+        raise NotImplementedError
+
+    def incr_many(self, keys):
+        for key in keys:
+            self.incr(key)
+
+    def counter_many(self, keys):
+        return [self.counter(key) for key in keys]
+
+    def stats(self):
+        return {}
+
+
+class LRUBackend(CacheBackend):
+    """In-process LRU with per-entry TTL (one copy per worker)."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.counters = {}
+        self.evictions = 0
+        self.expirations = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                self.expirations += 1
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def incr(self, key):
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + 1
+            return self.counters[key]
+
+    def counter(self, key):
+        return self.counters.get(key, 0)
+
+    def stats(self):
+        return {
+            'entries': len(self.entries),
+            'max_entries': self.max_entries,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+
+class NodeBackend(LRUBackend):
+    """LRU entries in process, version counters in a SQLite file shared by the node's workers.
+
+    Each worker keeps its own entries, but a commit on any of them (or in a
+    job runner or CLI command) bumps the versions every worker reads, so
+    none of them goes on serving an entry the commit made stale.
+    """
+
+    def __init__(self, path, max_entries=1024):
+        super().__init__(max_entries)
+        self.path = path
+        self.local = threading.local()
+
+    def connection(self):
+        # One connection per thread, opened again in a forked worker
+        if getattr(self.local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=OFF')
+            connection.execute('CREATE TABLE IF NOT EXISTS versions '
+                               '(key TEXT PRIMARY KEY, value INTEGER NOT NULL) WITHOUT ROWID')
+            self.local.connection, self.local.pid = connection, os.getpid()
+        return self.local.connection
+
+    def incr(self, key):
+        return self.connection().execute(
+            'INSERT INTO versions (key, value) VALUES (?, 1) '
+            'ON CONFLICT (key) DO UPDATE SET value = value + 1 RETURNING value', (key,)).fetchone()[0]
+
+    def incr_many(self, keys):
+        connection = self.connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.executemany('INSERT INTO versions (key, value) VALUES (?, 1) '
+                                   'ON CONFLICT (key) DO UPDATE SET value = value + 1', [(key,) for key in keys])
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def counter(self, key):
+        return self.counter_many([key])[0]
+
+    def counter_many(self, keys):
+        found = dict(self.connection().execute(
+            f"SELECT key, value FROM versions WHERE key IN ({', '.join('?' * len(keys))})", keys).fetchall())
+        return [found.get(key, 0) for key in keys]
+
+    def stats(self):
+        return {**super().stats(), 'versions': self.path}
+
+
+class Cache:
+    """Read-through cache for API responses, invalidated on commit.
+
+    A key embeds the version of every table the cached value was read
+    from (for example, a course page is read from ``courses`` and
+    ``teachers``). Single rows are keyed by their own row version instead,
+    so changing one student does not drop every cached student. A commit
+    bumps the versions of the tables and rows it changed. Later reads then
+    use new keys, and stale entries simply age out. A read that raced the
+    commit may store old data, but it stores it under the old version,
+    where nothing will look it up again.
+    """
+
+    def __init__(self):
+        self.backend = None
+        self.ttl = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def configure(self, backend, ttl):
+        self.backend = backend
+        self.ttl = ttl
+
+    @property
+    def enabled(self):
+        return self.backend is not None
+
+    def _versions(self, tables, *keys):
+        """Version string of ``tables`` (plus the counters ``keys``), read in one call."""
+        tables = sorted(tables)
+        counters = self.backend.counter_many([*keys, *tables])
+        versions = ','.join(f'{table}.{counter}' for table, counter in zip(tables, counters[len(keys):]))
+        return counters[:len(keys)], versions
+
+    def _fetch(self, key, load):
+        value = self.backend.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        # A replica behind the commit that bumped the version would store stale data under the new key
+        with primary_reads():
+            value = load()
+        if value is not None:
+            self.backend.set(key, value, self.ttl)
+        return value
+
+    def collection(self, tables, key, load):
+        """Cached ``load()`` for a result read from ``tables``."""
+        if not self.enabled:
+            return load()
+        _, versions = self._versions(tables)
+        return self._fetch(f'list:{versions}:{key}', load)
+
+    def row(self, table, id, load, tables=(), variant=None):
+        """Cached ``load()`` for one row of ``table`` (plus rows nested from ``tables``).
+
+        ``variant`` tells apart representations of the same row (``?fields=``).
+        ``None`` results (row not found) are not cached.
+        """
+        if not self.enabled:
+            return load()
+        (row, table_rows), nested = self._versions(set(tables) - {table}, f'{table}:{id}', f'{table}:*')
+        return self._fetch(f'row:{table}:{row + table_rows}:{nested}:{id}:{variant}', load)
+
+    def invalidate(self, changes):
+        """Bump versions for ``{table: ids or ALL_ROWS}`` after a commit."""
+        if not self.enabled:
+            return
+        keys = []
+        for table, ids in changes.items():
+            keys.append(table)
+            if ids is ALL_ROWS:
+                keys.append(f'{table}:*')
+            else:
+                keys.extend(f'{table}:{id}' for id in ids)
+            self.invalidations += 1
+        self.backend.incr_many(keys)
+
+    def stats(self):
+        if not self.enabled:
+            return {'enabled': False}
+        return {
+            'enabled': True,
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            **self.backend.stats(),
+        }
+
+
+cache = Cache()
+
+
+def init_cache(app):
+    if not app.config['CACHE_ENABLED']:
+        cache.configure(None, 0)
+        return
+    backend_path = app.config['CACHE_BACKEND']
+    versions_path = app.config['CACHE_VERSIONS_PATH'] or node_file(app, 'cache')
+    if backend_path:
+        backend = import_string(backend_path)()
+    elif versions_path == 'local':
+        backend = LRUBackend(app.config['CACHE_MAX_ENTRIES'])
+    else:
+        backend = NodeBackend(versions_path, app.config['CACHE_MAX_ENTRIES'])
+    cache.configure(backend, app.config['CACHE_TTL'])
+
+
+def record_change(session, table, ids):
+    changes = session.info.setdefault('cache_changes', {})
+    if ids is ALL_ROWS or changes.get(table, ()) is ALL_ROWS:
+        changes[table] = ALL_ROWS
+    else:
+        changes.setdefault(table, set()).update(ids)
+
+
+def row_id(obj):
+    identity = inspect(obj).mapper.primary_key_from_instance(obj)
+    return identity[0] if len(identity) == 1 else tuple(identity)
+
+
+@lru_cache(maxsize=None)
+def cascaded_tables(table):
+    """Names of the tables whose rows an ``ON DELETE CASCADE`` from ``table`` can reach."""
+    found = set()
+    pending = [table]
+    while pending:
+        parent = pending.pop()
+        for child in table.metadata.tables.values():
+            if child.name in found:
+                continue
+            if any(fk.ondelete and fk.ondelete.upper() == 'CASCADE' and fk.column.table.name == parent.name
+                   for fk in child.foreign_keys):
+                found.add(child.name)
+                pending.append(child)
+    return frozenset(found)
+
+
+def statement_table(orm_execute_state):
+    """The mapped Table an ORM insert/update/delete statement writes to.
+
+    ``delete(Model).table`` is an annotated copy of the Table: it hashes and
+    compares equal to it but is not the same object.
+    """
+    mapper = orm_execute_state.bind_mapper
+    return mapper.local_table if mapper is not None else orm_execute_state.statement.table
+
+
+def record_cascade(session, table):
+    # The database deletes these rows itself, so their ids are never seen here
+    for name in cascaded_tables(table):
+        record_change(session, name, ALL_ROWS)
+
+
+@event.listens_for(Session, 'after_flush')
+def track_flushed_rows(session, flush_context):
+    for obj in session.new:
+        record_change(session, obj.__table__.name, [row_id(obj)])
+    for obj in session.deleted:
+        record_change(session, obj.__table__.name, [row_id(obj)])
+        record_cascade(session, obj.__table__)
+    for obj in session.dirty:
+        if session.is_modified(obj, include_collections=False):
+            record_change(session, obj.__table__.name, [row_id(obj)])
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def track_bulk_statements(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    table = statement_table(orm_execute_state)
+    # New rows cannot be in a row entry yet; updates/deletes may touch any row
+    record_change(orm_execute_state.session, table.name, () if orm_execute_state.is_insert else ALL_ROWS)
+    if orm_execute_state.is_delete:
+        record_cascade(orm_execute_state.session, table)
+
+
+@event.listens_for(Session, 'after_commit')
+def invalidate_committed(session):
+    changes = session.info.pop('cache_changes', None)
+    if changes:
+        cache.invalidate(changes)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def discard_changes(session, previous_transaction):
+    # A rolled-back savepoint leaves the outer transaction's changes pending
+    if not session.in_transaction():
+        session.info.pop('cache_changes', None)
@@ -0,0 +1,334 @@
+import base64
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app, request, make_response
+from flask.cli import AppGroup
+from flask_restful import Resource
+from sqlalchemy import DateTime, Integer, String, and_, delete, event, func, insert, literal, or_, select, true, update
+from sqlalchemy.orm import Session
+
+from cache import ALL_ROWS, row_id, statement_table
+from config import db
+from listing import page_size, parse_names
+from models import (Student, Teacher, Course, Enrollment, Assignment, AssignmentSubmission, ChangeClock,
+                    ChangeLogEntry, utcnow)
+from replicas import on_primary
+from serializers import serializer_for
+
+# Order of a full sync; also the entity names accepted by ?entities=
+ENTITIES = {
+    'teachers': Teacher,
+    'students': Student,
+    'courses': Course,
+    'assignments': Assignment,
+    'enrollments': Enrollment,
+    'assignment_submissions': AssignmentSubmission,
+}
+LOG_COLUMNS = ['entity', 'entity_id', 'op', 'changed_at']
+
+
+# Deletes: logged before the DELETE runs, while the rows still exist
+
+def cascade_children(table):
+    """``(child table, foreign key column)`` for synced tables deleted along with ``table``."""
+    children = []
+    for model in ENTITIES.values():
+        for fk in model.__table__.foreign_keys:
+            if fk.column.table.name == table.name and fk.ondelete and fk.ondelete.upper() == 'CASCADE':
+                children.append((model.__table__, fk.parent))
+    return children
+
+
+def write_tombstones(connection, table, criterion, now):
+    """Log the rows of ``table`` matching ``criterion`` as deleted, and the rows they cascade to.
+
+    One INSERT ... SELECT per table on the cascade path, so the database
+    deletes without the ORM ever loading them. The entries get their
+    sequence number when the transaction commits.
+    """
+    connection.execute(insert(ChangeLogEntry.__table__).from_select(LOG_COLUMNS, select(
+        literal(table.name, String), table.c.id, literal('delete', String), literal(now, DateTime)).where(criterion)))
+    ids = select(table.c.id).where(criterion)
+    for child, column in cascade_children(table):
+        write_tombstones(connection, child, column.in_(ids), now)
+
+
+@event.listens_for(Session, 'before_flush')
+def tombstone_deleted_objects(session, flush_context, instances):
+    if session.info.get('change_log_paused'):
+        return
+    deleted = {}
+    for obj in session.deleted:
+        if obj.__tablename__ in ENTITIES:
+            deleted.setdefault(obj.__table__, set()).add(obj.id)
+    if not deleted:
+        return
+    session.info['change_log_deletes'] = True
+    connection = session.connection()
+    now = utcnow()
+    for table, ids in deleted.items():
+        write_tombstones(connection, table, table.c.id.in_(ids), now)
+
+
+# Upserts: {table: ids} and {table: since} for bulk statements, in session.info until commit
+
+def record_upserts(session, table, ids, since=None):
+    """Note rows of ``table`` inserted or updated in this transaction.
+
+    For ``ALL_ROWS`` (a bulk statement) the commit logs every row of the
+    table stamped ``updated_at >= since``; ``since`` defaults to now, so
+    record before the statement runs.
+    """
+    if table not in ENTITIES or session.info.get('change_log_paused'):
+        return
+    if ids is ALL_ROWS:
+        session.info.setdefault('change_log_bulk', {}).setdefault(table, since or utcnow())
+    else:
+        session.info.setdefault('change_log', {}).setdefault(table, set()).update(ids)
+
+
+@event.listens_for(Session, 'after_flush')
+def track_flushed_upserts(session, flush_context):
+    for obj in session.new:
+        record_upserts(session, obj.__table__.name, [row_id(obj)])
+    for obj in session.dirty:
+        if session.is_modified(obj, include_collections=False):
+            record_upserts(session, obj.__table__.name, [row_id(obj)])
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def track_bulk_changes(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    table = statement_table(orm_execute_state)
+    session = orm_execute_state.session
+    if table.name not in ENTITIES or session.info.get('change_log_paused'):
+        return
+    if not orm_execute_state.is_delete:
+        record_upserts(session, table.name, ALL_ROWS)
+        return
+    session.info['change_log_deletes'] = True
+    criterion = orm_execute_state.statement.whereclause
+    write_tombstones(session.connection(), table, true() if criterion is None else criterion, utcnow())
+
+
+@event.listens_for(Session, 'before_commit')
+def write_change_log(session):
+    """Give this transaction's changes the next sequence number, as the last writes before COMMIT.
+
+    The ``change_clock`` row stays locked until the commit ends, so a
+    transaction that commits later always gets a larger number, however
+    long ago it changed its rows.
+    """
+    # Commit flushes only after this hook; flush now so those changes are logged too
+    session.flush()
+    upserts = session.info.pop('change_log', {})
+    bulk = session.info.pop('change_log_bulk', {})
+    deletes = session.info.pop('change_log_deletes', False)
+    if not (upserts or bulk or deletes):
+        return
+    connection = session.connection()
+    clock = ChangeClock.__table__
+    log = ChangeLogEntry.__table__
+    seq = connection.execute(
+        update(clock).where(clock.c.id == 1).values(value=clock.c.value + 1).returning(clock.c.value)).scalar_one()
+    now = utcnow()
+    for table, since in bulk.items():
+        model = ENTITIES[table]
+        connection.execute(insert(log).from_select(['seq', *LOG_COLUMNS], select(
+            literal(seq, Integer), literal(table, String), model.id, literal('upsert', String),
+            literal(now, DateTime)).where(model.updated_at >= since)))
+    rows = [{'seq': seq, 'entity': table, 'entity_id': id, 'op': 'upsert', 'changed_at': now}
+            for table, ids in upserts.items() for id in sorted(ids)]
+    if rows:
+        connection.execute(insert(log), rows)
+    if deletes:
+        connection.execute(update(log).where(log.c.seq.is_(None)).values(seq=seq))
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def discard_change_log(session, previous_transaction):
+    if not session.in_transaction():
+        for key in ('change_log', 'change_log_bulk', 'change_log_deletes'):
+            session.info.pop(key, None)
+
+
+def expire_change_tokens(session):
+    """Empty the log and expire every token handed out so far; clients get 410 and sync again."""
+    clock = ChangeClock.__table__
+    session.execute(delete(ChangeLogEntry))
+    session.execute(update(clock).where(clock.c.id == 1).values(
+        value=clock.c.value + 1, pruned_through=clock.c.value + 1))
+
+
+@contextmanager
+def change_log_paused(session):
+    """Load data without logging each row, e.g. a synthetic seed of millions of rows.
+
+    Afterwards every token is expired (and committed), so clients start a
+    full sync, which reads the tables themselves and so includes the
+    loaded rows. On an error the open transaction is rolled back first.
+    """
+    session.info['change_log_paused'] = True
+    try:
+        yield
+    except BaseException:
+        session.rollback()
+        raise
+    finally:
+        session.info.pop('change_log_paused', None)
+        expire_change_tokens(session)
+        session.commit()
+
+
+# Change tokens: (seq, id) is a position in the log; (clock, rank, id) a position in a
+# full sync, which reads the tables as of ``clock`` and then continues from the log
+
+class ExpiredToken(ValueError):
+    pass
+
+
+def make_token(*position):
+    raw = '|'.join(str(part) for part in position)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def parse_token(token):
+    try:
+        parts = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode().split('|')
+        if ':' not in parts[0] and len(parts) in (2, 3):
+            return tuple(int(part) for part in parts)
+        # A token of the timestamp-ordered feed the log replaced
+        datetime.fromisoformat(parts[0])
+    except ValueError:
+        raise ValueError("Invalid change token")
+    raise ExpiredToken("Change token has expired; sync again without since")
+
+
+def snapshot_changes(position, names, limit):
+    """Rows of the tables in (entity, id) order after ``position``; the position is ``None`` once all are read."""
+    clock, last_rank, last_id = position
+    changes = []
+    for rank, (name, model) in enumerate(ENTITIES.items()):
+        if name not in names or rank < last_rank:
+            continue
+        if len(changes) == limit:
+            break
+        serializer = serializer_for(model)
+        stmt = serializer.select().order_by(model.id).limit(limit - len(changes))
+        if rank == last_rank:
+            stmt = stmt.where(model.id > last_id)
+        for row in db.session.execute(stmt):
+            position = (clock, rank, row[serializer.pk_index])
+            changes.append({'entity': name, 'op': 'upsert', 'id': position[2], 'data': serializer.row(row)})
+    return changes, position if len(changes) == limit else None
+
+
+def log_changes(position, names, limit, clock):
+    """Log entries after ``position`` up to sequence number ``clock``, each upsert with the row's current data.
+
+    Upserts of rows deleted since are left out; their delete follows later in the log.
+    """
+    seq, last_id = position
+    entries = db.session.execute(
+        select(ChangeLogEntry.id, ChangeLogEntry.seq, ChangeLogEntry.entity, ChangeLogEntry.entity_id,
+               ChangeLogEntry.op)
+        .where(or_(ChangeLogEntry.seq > seq, and_(ChangeLogEntry.seq == seq, ChangeLogEntry.id > last_id)),
+               ChangeLogEntry.seq <= clock, ChangeLogEntry.entity.in_(names))
+        .order_by(ChangeLogEntry.seq, ChangeLogEntry.id)
+        .limit(limit + 1)
+    ).all()
+    more = len(entries) > limit
+    entries = entries[:limit]
+
+    upserted = {}
+    for entry in entries:
+        if entry.op == 'upsert':
+            upserted.setdefault(entry.entity, set()).add(entry.entity_id)
+    rows = {}
+    for name, ids in upserted.items():
+        model = ENTITIES[name]
+        serializer = serializer_for(model)
+        for row in db.session.execute(serializer.select().where(model.id.in_(ids))):
+            rows[name, row[serializer.pk_index]] = serializer.row(row)
+
+    changes = []
+    for entry in entries:
+        if entry.op == 'delete':
+            changes.append({'entity': entry.entity, 'op': 'delete', 'id': entry.entity_id})
+        elif (entry.entity, entry.entity_id) in rows:
+            changes.append({'entity': entry.entity, 'op': 'upsert', 'id': entry.entity_id,
+                            'data': rows[entry.entity, entry.entity_id]})
+    if more:
+        return changes, (entries[-1].seq, entries[-1].id), True
+    # Every transaction numbered up to clock has committed: resume after all of them
+    return changes, max(position, (clock + 1, 0)), False
+
+
+def changes_since(position, names, limit):
+    """Up to ``limit`` changes after ``position`` (``None``: start a full sync), oldest first.
+
+    The log is read by its (seq, id) index, so a sync costs O(changes),
+    not O(table). Returns ``(changes, next position, more)``;
+    ``ExpiredToken`` if the log has been pruned past ``position``.
+    """
+    clock, pruned_through = db.session.execute(select(ChangeClock.value, ChangeClock.pruned_through)).one()
+    if position is None:
+        position = (clock, 0, 0)
+    if len(position) == 3:
+        if position[0] < pruned_through:
+            raise ExpiredToken("Change token has expired; sync again without since")
+        changes, next_position = snapshot_changes(position, names, limit)
+        # A finished snapshot continues with every commit after the one it was read at
+        return changes, next_position or (position[0] + 1, 0), True
+    if position[0] <= pruned_through:
+        raise ExpiredToken("Change token has expired; sync again without since")
+    return log_changes(position, names, limit, clock)
+
+
+class Changes(Resource):
+    """``GET /changes?since=<token>``: rows upserted or deleted since the token.
+
+    The response carries the token to send next time. Without ``since`` the
+    feed starts with a full sync of every row (paginated with ``limit``),
+    then continues with the changes committed since it began. Reads go to
+    the primary: a lagging replica would hand out tokens past commits it
+    has not received yet.
+    """
+
+    method_decorators = [on_primary]
+
+    def get(self):
+        try:
+            limit = page_size()
+            names = parse_names('entities') or tuple(ENTITIES)
+            unknown = [name for name in names if name not in ENTITIES]
+            if unknown:
+                raise ValueError(f"Unknown entities: {', '.join(unknown)}")
+            position = parse_token(request.args['since']) if request.args.get('since') else None
+            changes, position, more = changes_since(position, names, limit)
+        except ExpiredToken as e:
+            return make_response({'error': str(e)}, 410)
+        except ValueError as e:
+            return make_response({'error': str(e)}, 400)
+        return make_response({'changes': changes, 'next': make_token(*position), 'more': more}, 200)
+
+
+changes_cli = AppGroup('changes', help='Change feed maintenance.')
+
+
+@changes_cli.command('prune')
+def prune_change_log_command():
+    """Delete change log entries older than CHANGES_RETENTION_DAYS."""
+    cutoff = utcnow() - timedelta(days=current_app.config['CHANGES_RETENTION_DAYS'])
+    through = db.session.scalar(select(func.max(ChangeLogEntry.seq)).where(ChangeLogEntry.changed_at < cutoff))
+    if through is None:
+        click.echo("Deleted 0 change log entries")
+        return
+    result = db.session.execute(delete(ChangeLogEntry).where(ChangeLogEntry.seq <= through))
+    clock = db.session.get(ChangeClock, 1)
+    clock.pruned_through = max(clock.pruned_through, through)
+    db.session.commit()
+    click.echo(f"Deleted {result.rowcount} change log entries")
@@ -0,0 +1,89 @@
+from hashlib import blake2b
+
+from flask import Response, request
+from sqlalchemy import func, select
+
+from config import db
+from encoding import MSGPACK_MIMETYPES, REPRESENTATION_SUFFIXES
+
+
+def make_etag(*parts):
+    return blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+
+
+def page_version(rows, serializer):
+    """Row count, sum of ids and newest ``updated_at`` of every nested model, from fetched rows.
+
+    Together these change whenever a row of the page is inserted, deleted or
+    updated (``updated_at`` has microsecond resolution). ``page_version_query``
+    computes the same tuple in SQL.
+    """
+    version = [len(rows), sum(row[serializer.pk_index] for row in rows)]
+    for index in serializer.version_indexes:
+        stamps = [row[index] for row in rows if row[index] is not None]
+        version.append(max(stamps) if stamps else None)
+    return tuple(version)
+
+
+def page_version_query(stmt, serializer):
+    page = stmt.subquery()
+    columns = list(page.c)
+    version = db.session.execute(select(
+        func.count(),
+        func.coalesce(func.sum(columns[serializer.pk_index]), 0),
+        *(func.max(columns[index]) for index in serializer.version_indexes),
+    )).one()
+    return tuple(version)
+
+
+def not_modified(etag, last_modified=None):
+    """Return a 304 response if the request's validators match, else ``None``.
+
+    ``If-None-Match`` takes precedence; ``If-Modified-Since`` is only
+    checked when the client sent no ETag and the resource has a
+    ``last_modified`` time.
+    """
+    if request.if_none_match:
+        matched = etag_matches(etag)
+    elif last_modified is not None and request.if_modified_since is not None:
+        matched = last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None)
+    else:
+        matched = False
+    if not matched:
+        return None
+    response = Response(status=304)
+    set_validators(response, etag, last_modified)
+    return response
+
+
+def etag_matches(etag):
+    """Weak ``If-None-Match`` comparison that accepts any encoded representation of ``etag``."""
+    if request.if_none_match.star_tag:
+        return True
+    for tag in request.if_none_match.as_set(include_weak=True):
+        while tag.endswith(REPRESENTATION_SUFFIXES):
+            tag = tag.rsplit('-', 1)[0]
+        if tag == etag:
+            return True
+    return False
+
+
+def set_validators(response, etag, last_modified=None):
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    return response
+
+
+def init_conditional(app):
+    @app.after_request
+    def hash_etag(response):
+        """Content-hash ETag for GETs whose view did not set one (gradebook, transcript, ...)."""
+        if (request.method != 'GET' or response.status_code != 200 or response.is_streamed
+                or 'ETag' in response.headers or not (response.is_json or response.mimetype in MSGPACK_MIMETYPES)):
+            return response
+        etag = make_etag(response.get_data())
+        if request.if_none_match and etag_matches(etag):
+            return set_validators(Response(status=304), etag)
+        return set_validators(response, etag)
@@ -1,45 +1,218 @@
+import functools
+import hashlib
 import os
-import re
-from flask import Flask
+import sqlite3
+import tempfile
 from flask_cors import CORS
-from flask_migrate import Migrate
-from flask_restful import Api
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import MetaData
+from sqlalchemy import MetaData, event
+from sqlalchemy.engine import Engine
 
-app = Flask(__name__)
+from replicas import RoutingSession, replica_failed, replicas
 
-# Production database configuration
-uri = os.getenv('DATABASE_URL')
-if uri and uri.startswith('postgres://'):
-    uri = uri.replace('postgres://', 'postgresql://', 1)
-app.config['SQLALCHEMY_DATABASE_URI'] = uri or 'sqlite:///app.db'
 
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'prod-secret-key-change-in-production')
-app.json.compact = False
+def env_flag(name, default):
+    return os.environ.get(name, default).lower() in ('1', 'true', 'yes')
+
+
+def database_url(uri):
+    if uri.startswith('postgres://'):
+        return uri.replace('postgres://', 'postgresql://', 1)
+    return uri
+
+
+def node_file(app, name):
+    """Default path of a SQLite file the processes of one node share, e.g. for cache versions.
+
+    Derived from the database URL, so every worker, job runner and CLI
+    command of one deployment on the node finds the same file.
+    """
+    digest = hashlib.sha1(app.config['SQLALCHEMY_DATABASE_URI'].encode()).hexdigest()[:12]
+    return os.path.join(tempfile.gettempdir(), f'school-{name}-{digest}.db')
+
+
+def settings():
+    """App settings read from the environment; ``create_app(config)`` overrides any of them."""
+    config = {}
+
+    # Production database configuration
+    config['SQLALCHEMY_DATABASE_URI'] = database_url(os.getenv('DATABASE_URL') or 'sqlite:///app.db')
+    # Read replicas for GET requests, comma-separated; a failed replica is skipped for REPLICA_RETRY_S
+    config['DATABASE_REPLICA_URLS'] = [database_url(url.strip())
+                                       for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+    config['REPLICA_RETRY_S'] = float(os.environ.get('REPLICA_RETRY_S', 30))
+
+    # SQLite connect-time pragmas; SQLITE_TUNING=0 keeps SQLite's defaults
+    config['SQLITE_TUNING'] = env_flag('SQLITE_TUNING', '1')
+    config['SQLITE_CACHE_SIZE_KB'] = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 65536))
+    config['SQLITE_MMAP_SIZE'] = int(os.environ.get('SQLITE_MMAP_SIZE', 268435456))
+
+    config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'prod-secret-key-change-in-production')
+
+    # Collection pagination
+    config['PAGE_SIZE_DEFAULT'] = int(os.environ.get('PAGE_SIZE_DEFAULT', 100))
+    config['PAGE_SIZE_MAX'] = int(os.environ.get('PAGE_SIZE_MAX', 1000))
+    config['STREAM_BATCH_SIZE'] = int(os.environ.get('STREAM_BATCH_SIZE', 1000))
+    # Change feed (/changes): how long `flask changes prune` keeps change log entries
+    config['CHANGES_RETENTION_DAYS'] = int(os.environ.get('CHANGES_RETENTION_DAYS', 30))
+    # Server-Sent Events (/events). EVENTS_BROKER_PATH is the SQLite file the workers on a node
+    # share (default: one per database in the temp dir); "local" keeps events in process, so each
+    # worker only pushes its own commits. EVENTS_MAX_SUBSCRIBERS caps open streams per worker (0: none)
+    config['EVENTS_ENABLED'] = env_flag('EVENTS_ENABLED', '1')
+    config['EVENTS_BROKER_PATH'] = os.environ.get('EVENTS_BROKER_PATH')
+    config['EVENTS_MAX_SUBSCRIBERS'] = int(os.environ.get('EVENTS_MAX_SUBSCRIBERS', 0))
+    config['EVENTS_POLL_MS'] = int(os.environ.get('EVENTS_POLL_MS', 200))
+    config['EVENTS_QUEUE_SIZE'] = int(os.environ.get('EVENTS_QUEUE_SIZE', 256))
+    config['EVENTS_KEEPALIVE_S'] = float(os.environ.get('EVENTS_KEEPALIVE_S', 15))
+    config['EVENTS_RETAIN'] = int(os.environ.get('EVENTS_RETAIN', 10000))
+    config['EVENTS_MAX_IDS'] = int(os.environ.get('EVENTS_MAX_IDS', 100))
+    # Rows fetched per server-side cursor batch by the CSV exports
+    config['EXPORT_BATCH_SIZE'] = int(os.environ.get('EXPORT_BATCH_SIZE', 5000))
+
+    # Bulk create (JSON array bodies)
+    config['BULK_CHUNK_SIZE'] = int(os.environ.get('BULK_CHUNK_SIZE', 1000))
+    config['BULK_MAX_ITEMS'] = int(os.environ.get('BULK_MAX_ITEMS', 50000))
+    # CSV roster imports: rows validated and loaded per batch
+    config['IMPORT_BATCH_SIZE'] = int(os.environ.get('IMPORT_BATCH_SIZE', 5000))
+
+    # Background jobs (POST /jobs, run by `flask jobs work`). Export files and uploaded
+    # CSVs go to JOBS_OUTPUT_DIR, which the web and worker processes must share
+    config['JOBS_OUTPUT_DIR'] = os.environ.get('JOBS_OUTPUT_DIR', os.path.join(tempfile.gettempdir(), 'school-jobs'))
+    config['JOBS_PROCESSES'] = int(os.environ.get('JOBS_PROCESSES', os.cpu_count() or 1))
+    config['JOBS_POLL_S'] = float(os.environ.get('JOBS_POLL_S', 1))
+    config['JOBS_MAX_ATTEMPTS'] = int(os.environ.get('JOBS_MAX_ATTEMPTS', 3))
+    config['JOBS_RETRY_BACKOFF_S'] = float(os.environ.get('JOBS_RETRY_BACKOFF_S', 30))
+    config['JOBS_STALE_S'] = float(os.environ.get('JOBS_STALE_S', 300))
+    config['JOBS_RETENTION_DAYS'] = int(os.environ.get('JOBS_RETENTION_DAYS', 7))
+    config['JOBS_DELETE_BATCH_SIZE'] = int(os.environ.get('JOBS_DELETE_BATCH_SIZE', 1000))
+
+    # Request instrumentation (Server-Timing, /api/metrics, slow-query log)
+    config['METRICS_ENABLED'] = env_flag('METRICS_ENABLED', '1')
+    config['SLOW_QUERY_MS'] = float(os.environ.get('SLOW_QUERY_MS', 500))
+    config['SLOW_QUERY_LOG'] = os.environ.get('SLOW_QUERY_LOG')
+
+    # Response encoding: compact JSON (pretty with JSON_PRETTY=1 or in debug), orjson when
+    # installed, MessagePack on request, gzip/brotli above COMPRESS_MIN_SIZE bytes
+    config['JSON_ENCODER'] = os.environ.get('JSON_ENCODER', 'auto')
+    config['JSON_PRETTY'] = env_flag('JSON_PRETTY', '0')
+    config['MSGPACK_ENABLED'] = env_flag('MSGPACK_ENABLED', '1')
+    config['COMPRESS_ENABLED'] = env_flag('COMPRESS_ENABLED', '1')
+    config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+    config['COMPRESS_LEVEL'] = int(os.environ.get('COMPRESS_LEVEL', 6))
+    config['BROTLI_QUALITY'] = int(os.environ.get('BROTLI_QUALITY', 4))
+
+    # Read-through cache for teachers, courses and single students
+    config['CACHE_ENABLED'] = env_flag('CACHE_ENABLED', '1')
+    config['CACHE_TTL'] = float(os.environ.get('CACHE_TTL', 300))
+    config['CACHE_MAX_ENTRIES'] = int(os.environ.get('CACHE_MAX_ENTRIES', 1024))
+    config['CACHE_BACKEND'] = os.environ.get('CACHE_BACKEND')
+    # SQLite file with the cache versions, shared by the workers on a node (default: one per
+    # database in the temp dir); "local" keeps them in process, for a single worker
+    config['CACHE_VERSIONS_PATH'] = os.environ.get('CACHE_VERSIONS_PATH')
+    return config
+
+
+def engine_options(uri):
+    """Connection pool / driver options for the database at ``uri``."""
+    options = {}
+    if uri.startswith('sqlite'):
+        # Busy timeout: how long a connection waits on a locked database
+        options['connect_args'] = {'timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)) / 1000}
+    else:
+        options.update(
+            pool_size=int(os.environ.get('DB_POOL_SIZE', 5)),
+            max_overflow=int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+            pool_timeout=int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+            pool_recycle=int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+            pool_pre_ping=env_flag('DB_POOL_PRE_PING', '1'),
+        )
+        statement_timeout = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 30000))
+        if statement_timeout and uri.startswith('postgresql'):
+            options['connect_args'] = {'options': f'-c statement_timeout={statement_timeout}'}
+    return options
+
+
+# Set from the app config by init_db(); the connect listener below runs outside any app context
+_sqlite_pragmas = {'SQLITE_TUNING': True, 'SQLITE_CACHE_SIZE_KB': 65536, 'SQLITE_MMAP_SIZE': 268435456}
+
+
+@event.listens_for(Engine, 'connect')
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """WAL lets readers run alongside a writer; NORMAL sync is safe under WAL.
+
+    Foreign keys are always enforced: deletes rely on ``ON DELETE CASCADE``.
+    """
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA foreign_keys=ON')
+    if not _sqlite_pragmas['SQLITE_TUNING']:
+        cursor.close()
+        return
+    try:
+        cursor.execute('PRAGMA journal_mode=WAL')
+    except sqlite3.OperationalError:
+        pass  # a read-only connection (mode=ro replica) cannot change the journal mode
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute(f"PRAGMA cache_size=-{_sqlite_pragmas['SQLITE_CACHE_SIZE_KB']}")
+    cursor.execute(f"PRAGMA mmap_size={_sqlite_pragmas['SQLITE_MMAP_SIZE']}")
+    cursor.close()
+
 
 metadata = MetaData(naming_convention={
+    "ix": "ix_%(column_0_label)s",
     "fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s",
 })
-db = SQLAlchemy(metadata=metadata)
-migrate = Migrate(app, db)
-db.init_app(app)
+db = SQLAlchemy(metadata=metadata, session_options={'class_': RoutingSession})
+
+
+def init_db(app):
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config['SQLALCHEMY_DATABASE_URI']))
+    # Each replica is a bind that no model belongs to, so create_all() and migrations leave it alone
+    keys = [f'replica{n}' for n in range(len(app.config['DATABASE_REPLICA_URLS']))]
+    binds = app.config.setdefault('SQLALCHEMY_BINDS', {})
+    for key, url in zip(keys, app.config['DATABASE_REPLICA_URLS']):
+        binds[key] = {'url': url, **engine_options(url)}
+    _sqlite_pragmas.update((key, app.config[key]) for key in _sqlite_pragmas)
+    db.init_app(app)
+    replicas.configure(keys, app.config['REPLICA_RETRY_S'])
+    with app.app_context():
+        for key in keys:
+            event.listen(db.engines[key], 'handle_error', functools.partial(replica_failed, key))
+
+
+def dispose_engines(app):
+    """Drop connections inherited from the parent process (gunicorn ``--preload``).
+
+    ``close=False`` leaves the parent's sockets alone; the worker opens its own.
+    """
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
 
-api = Api(app)
 
-# Updated CORS configuration with your actual URLs
-CORS(app, 
-     origins=[
-         "https://school-management-system-tau-five.vercel.app", 
-         "http://localhost:3000",
-         "http://localhost:5173"
-     ],
-     methods=["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS"],
-     allow_headers=["Content-Type", "Authorization", "X-Requested-With"],
-     supports_credentials=True)
+def init_migrate(app):
+    """Flask-Migrate, for the ``flask db`` commands.
 
+    Alembic is slow to import, so it is only loaded under the ``flask``
+    command (which sets ``FLASK_RUN_FROM_CLI``), never in web workers.
+    """
+    if os.environ.get('FLASK_RUN_FROM_CLI') != 'true':
+        return
+    from flask_migrate import Migrate
+    Migrate(app, db)
 
 
-if __name__ == '__main__':
-    app.run()
\ No newline at end of file
+def init_cors(app):
+    # Updated CORS configuration with your actual URLs
+    CORS(app, 
+         origins=[
+             "https://school-management-system-tau-five.vercel.app", 
+             "http://localhost:3000",
+             "http://localhost:5173"
+         ],
+         methods=["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS"],
+         allow_headers=["Content-Type", "Authorization", "X-Requested-With", "Last-Event-ID"],
+         expose_headers=["Link", "X-Next-Cursor", "Server-Timing", "Content-Disposition"],
+         supports_credentials=True)
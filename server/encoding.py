@@ -0,0 +1,177 @@
+import gzip
+import json
+import zlib
+
+from flask import has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+
+from instrumentation import timed
+
+try:
+    import orjson
+except ImportError:  # optional: pip install orjson
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli
+    brotli = None
+
+try:
+    import msgpack
+except ImportError:  # optional: pip install msgpack
+    msgpack = None
+
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack')
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/x-ndjson', 'text/csv', 'text/html', 'text/plain',
+                          *MSGPACK_MIMETYPES}
+# ETag suffixes for the encoded representations of one resource version
+REPRESENTATION_SUFFIXES = ('-msgpack', '-gzip', '-br')
+
+if orjson is not None:
+    _ORJSON_OPTIONS = (orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+                       | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS)
+
+
+def compact_dumps(obj):
+    """One-line JSON with sorted keys (NDJSON rows)."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=_ORJSON_OPTIONS).decode()
+    return json.dumps(obj, separators=(',', ':'), sort_keys=True)
+
+
+class APIJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider with a pluggable encoder and MessagePack negotiation.
+
+    ``JSON_ENCODER`` picks ``orjson`` or the standard library (``auto``
+    uses orjson when it is installed). Output follows ``compact``: compact
+    unless the app runs in debug mode or ``JSON_PRETTY`` is set. Datetimes
+    and other non-JSON types go through Flask's ``default`` with either
+    backend, so the output is the same.
+
+    ``response()`` answers ``Accept: application/msgpack`` with MessagePack
+    when the ``msgpack`` package is installed and ``MSGPACK_ENABLED`` is on.
+    """
+
+    use_orjson = False
+    msgpack_enabled = False
+
+    def dumps(self, obj, **kwargs):
+        with timed('serialize'):
+            if self.use_orjson and not kwargs:
+                return self._orjson(obj).decode()
+            return super().dumps(obj, **kwargs)
+
+    def _orjson(self, obj):
+        options = _ORJSON_OPTIONS if self.sort_keys else _ORJSON_OPTIONS & ~orjson.OPT_SORT_KEYS
+        if not self._compact():
+            options |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=options)
+
+    def _compact(self):
+        return self.compact if self.compact is not None else not self._app.debug
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if self.msgpack_enabled and has_request_context() and wants_msgpack():
+            with timed('serialize'):
+                data = msgpack.packb(obj, default=self.default, use_bin_type=True)
+            response = self._app.response_class(data, mimetype=MSGPACK_MIMETYPES[0])
+        elif self.use_orjson:
+            with timed('serialize'):
+                data = self._orjson(obj) + b'\n'
+            response = self._app.response_class(data, mimetype=self.mimetype)
+        else:
+            return super().response(obj)
+        response.vary.add('Accept')
+        return response
+
+
+def wants_msgpack():
+    best = request.accept_mimetypes.best_match(['application/json', *MSGPACK_MIMETYPES])
+    return best in MSGPACK_MIMETYPES
+
+
+def choose_encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br'] and accepted['br'] >= accepted['gzip']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def stream_compressor(level, quality, encoding):
+    """``(compress(chunk), finish())`` for incremental bodies, flushing each chunk."""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=quality)
+        return (lambda chunk: compressor.process(chunk) + compressor.flush()), compressor.finish
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    return (lambda chunk: compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)), compressor.flush
+
+
+def compressed_chunks(chunks, compress, finish):
+    for chunk in chunks:
+        data = compress(chunk)
+        if data:
+            yield data
+    yield finish()
+
+
+def init_encoding(app):
+    encoder = app.config['JSON_ENCODER']
+    if encoder == 'orjson' and orjson is None:
+        raise RuntimeError('JSON_ENCODER=orjson but orjson is not installed')
+    provider = APIJSONProvider(app)
+    provider.use_orjson = orjson is not None and encoder in ('auto', 'orjson')
+    provider.msgpack_enabled = msgpack is not None and app.config['MSGPACK_ENABLED']
+    provider.compact = False if app.config['JSON_PRETTY'] else None
+    app.json = provider
+
+    if app.config['COMPRESS_ENABLED']:
+        init_compression(app)
+
+    @app.after_request
+    def msgpack_etag(response):
+        # Registered after compress() so it runs first: "<tag>-msgpack-gzip"
+        etag, weak = response.get_etag()
+        if etag and response.mimetype in MSGPACK_MIMETYPES:
+            response.set_etag(etag + '-msgpack', weak)
+        return response
+
+
+def init_compression(app):
+    min_size = app.config['COMPRESS_MIN_SIZE']
+    level = app.config['COMPRESS_LEVEL']
+    quality = app.config['BROTLI_QUALITY']
+
+    @app.after_request
+    def compress(response):
+        """gzip/brotli for compressible bodies; streamed bodies are compressed chunk by chunk."""
+        if response.mimetype not in COMPRESSIBLE_MIMETYPES and response.status_code != 304:
+            return response
+        response.vary.add('Accept-Encoding')
+        if (response.status_code < 200 or response.status_code >= 300 or response.status_code == 204
+                or 'Content-Encoding' in response.headers or request.method == 'HEAD'):
+            return response
+        encoding = choose_encoding()
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            compress_chunk, finish = stream_compressor(level, quality, encoding)
+            response.response = compressed_chunks(response.iter_encoded(), compress_chunk, finish)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < min_size:
+                return response
+            if encoding == 'br':
+                response.set_data(brotli.compress(data, quality=quality))
+            else:
+                response.set_data(gzip.compress(data, compresslevel=level, mtime=0))
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(etag + f'-{encoding}', weak)
+        return response
@@ -0,0 +1,394 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+
+from flask import Response, request, make_response
+from flask_restful import Resource
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from cache import ALL_ROWS, cascaded_tables, row_id, statement_table
+from changes import ENTITIES
+from config import node_file
+from encoding import compact_dumps
+from listing import parse_names
+
+events_logger = logging.getLogger('school.events')
+
+# Milliseconds an EventSource waits before reconnecting
+RETRY_MS = 3000
+
+
+class LocalBroker:
+    """Recent events in process memory: only this worker's subscribers see them."""
+
+    shared = False
+
+    def __init__(self, retain):
+        self.messages = deque(maxlen=retain)
+        self.seq = 0
+        self.lock = threading.Lock()
+
+    def publish(self, payload):
+        with self.lock:
+            self.seq += 1
+            self.messages.append((self.seq, payload))
+            return self.seq
+
+    def read(self, after, limit):
+        with self.lock:
+            return [message for message in self.messages if message[0] > after][:limit]
+
+    def last(self):
+        return self.seq
+
+
+class SQLiteBroker:
+    """Events appended to a SQLite file that every worker on the node polls.
+
+    Each commit is one row; its id is the event id sent to clients, so a
+    reconnecting client can resume from ``Last-Event-ID`` on any worker.
+    Only the newest ``retain`` rows are kept.
+    """
+
+    shared = True
+
+    def __init__(self, path, retain):
+        self.path = path
+        self.retain = retain
+        self.local = threading.local()
+
+    def connection(self):
+        # One connection per thread, opened again in a forked worker
+        if getattr(self.local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=OFF')
+            connection.execute('CREATE TABLE IF NOT EXISTS events '
+                               '(id INTEGER PRIMARY KEY AUTOINCREMENT, payload TEXT NOT NULL)')
+            self.local.connection, self.local.pid = connection, os.getpid()
+        return self.local.connection
+
+    def publish(self, payload):
+        connection = self.connection()
+        seq = connection.execute('INSERT INTO events (payload) VALUES (?)', (payload,)).lastrowid
+        if seq % 256 == 0:
+            connection.execute('DELETE FROM events WHERE id <= ?', (seq - self.retain,))
+        return seq
+
+    def read(self, after, limit):
+        return self.connection().execute(
+            'SELECT id, payload FROM events WHERE id > ? ORDER BY id LIMIT ?', (after, limit)).fetchall()
+
+    def last(self):
+        return self.connection().execute('SELECT coalesce(max(id), 0) FROM events').fetchone()[0]
+
+
+class Subscriber:
+    """One open ``/events`` stream: a bounded queue that drops its oldest events when full."""
+
+    def __init__(self, entities, size):
+        self.entities = frozenset(entities) if entities else None
+        self.queue = deque(maxlen=size)
+        self.dropped = 0
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+
+    def offer(self, message):
+        if self.entities is not None and not any(change['entity'] in self.entities for change in message[1]):
+            return
+        with self.lock:
+            if len(self.queue) == self.queue.maxlen:
+                self.dropped += 1
+            self.queue.append(message)
+        self.ready.set()
+
+    def take(self, timeout):
+        """Wait up to ``timeout`` seconds; return ``(messages, dropped)``, or ``None`` on timeout."""
+        if not self.ready.wait(timeout):
+            return None
+        with self.lock:
+            self.ready.clear()
+            messages = list(self.queue)
+            self.queue.clear()
+            dropped, self.dropped = self.dropped, 0
+        return messages, dropped
+
+    def format(self, message):
+        seq, changes, payload = message
+        if self.entities is not None:
+            payload = compact_dumps([change for change in changes if change['entity'] in self.entities])
+        return f'id: {seq}\nevent: change\ndata: {payload}\n\n'
+
+
+class Hub:
+    """Fans committed changes out to the ``/events`` subscribers of this worker.
+
+    A commit's changes are published to the broker once. With the
+    in-process broker they are handed to the subscribers straight away;
+    with the SQLite broker one thread per worker polls for new rows, so a
+    commit on any worker reaches every subscriber on the node. The thread
+    only runs while the worker has subscribers, and idle subscribers are
+    threads blocked on an ``Event``, so an idle stream costs no CPU
+    between keep-alive comments.
+    """
+
+    def __init__(self):
+        self.broker = None
+        self.subscribers = set()
+        self.changed = threading.Condition()
+        self.poller_pid = None
+        self.queue_size = 256
+        self.poll_interval = 0.2
+        self.keepalive = 15.0
+        self.max_ids = 100
+        self.max_subscribers = 0
+        self.published = 0
+        self.dropped = 0
+        self.rejected = 0
+
+    def configure(self, broker, queue_size, poll_interval, keepalive, max_ids, max_subscribers=0):
+        self.broker = broker
+        self.queue_size = queue_size
+        self.poll_interval = poll_interval
+        self.keepalive = keepalive
+        self.max_ids = max_ids
+        self.max_subscribers = max_subscribers
+
+    @property
+    def enabled(self):
+        return self.broker is not None
+
+    def subscribe(self, entities):
+        """A new subscriber, or ``None`` when the worker already has ``max_subscribers`` (0: no limit)."""
+        subscriber = Subscriber(entities, self.queue_size)
+        with self.changed:
+            if self.max_subscribers and len(self.subscribers) >= self.max_subscribers:
+                self.rejected += 1
+                return None
+            self.subscribers.add(subscriber)
+            if self.broker.shared and self.poller_pid != os.getpid():
+                # Started lazily, so a worker forked from a preloaded app gets its own
+                self.poller_pid = os.getpid()
+                threading.Thread(target=self.poll, name='events-poller', daemon=True).start()
+            self.changed.notify()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.changed:
+            self.subscribers.discard(subscriber)
+
+    def publish(self, changes):
+        """Publish ``{(table, op): ids or ALL_ROWS}`` recorded for one commit."""
+        payload = []
+        for (table, op), ids in changes.items():
+            if ids is ALL_ROWS or len(ids) > self.max_ids:
+                payload.append({'entity': table, 'op': op, 'id': None})
+            else:
+                payload.extend({'entity': table, 'op': op, 'id': id} for id in sorted(ids))
+        encoded = compact_dumps(payload)
+        try:
+            seq = self.broker.publish(encoded)
+        except sqlite3.Error:
+            events_logger.exception('Could not publish change event')
+            return
+        self.published += 1
+        if not self.broker.shared:
+            self.dispatch((seq, payload, encoded))
+
+    def dispatch(self, message):
+        with self.changed:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            subscriber.offer(message)
+
+    def replay(self, after, limit):
+        """Events after id ``after``; ``complete`` is false if some are gone (pruned or from before a restart)."""
+        rows = self.broker.read(after, limit + 1)
+        complete = after <= self.broker.last() and len(rows) <= limit and (not rows or rows[0][0] == after + 1)
+        return [(seq, json.loads(payload), payload) for seq, payload in rows[:limit]], complete
+
+    def poll(self):
+        cursor = None
+        while True:
+            with self.changed:
+                if not self.subscribers:
+                    cursor = None
+                    while not self.subscribers:
+                        self.changed.wait()
+            try:
+                if cursor is None:
+                    cursor = self.broker.last()
+                time.sleep(self.poll_interval)
+                for seq, payload in self.broker.read(cursor, 1000):
+                    self.dispatch((seq, json.loads(payload), payload))
+                    cursor = seq
+            except sqlite3.Error:
+                events_logger.exception('Could not read change events')
+                time.sleep(1)
+
+    def stats(self):
+        if not self.enabled:
+            return {'enabled': False}
+        return {
+            'enabled': True,
+            'broker': 'sqlite' if self.broker.shared else 'local',
+            'subscribers': len(self.subscribers),
+            'max_subscribers': self.max_subscribers,
+            'rejected': self.rejected,
+            'published': self.published,
+            'dropped': self.dropped + sum(subscriber.dropped for subscriber in list(self.subscribers)),
+        }
+
+
+hub = Hub()
+
+
+def init_events(app):
+    if not app.config['EVENTS_ENABLED']:
+        hub.broker = None
+        return
+    retain = app.config['EVENTS_RETAIN']
+    path = app.config['EVENTS_BROKER_PATH'] or node_file(app, 'events')
+    hub.configure(
+        LocalBroker(retain) if path == 'local' else SQLiteBroker(path, retain),
+        queue_size=app.config['EVENTS_QUEUE_SIZE'],
+        poll_interval=app.config['EVENTS_POLL_MS'] / 1000,
+        keepalive=app.config['EVENTS_KEEPALIVE_S'],
+        max_ids=app.config['EVENTS_MAX_IDS'],
+        max_subscribers=app.config['EVENTS_MAX_SUBSCRIBERS'],
+    )
+
+
+# Change tracking: {(table, op): ids or ALL_ROWS} in session.info until commit
+
+def record_event(session, table, op, ids):
+    if not hub.enabled or table not in ENTITIES:
+        return
+    changes = session.info.setdefault('events', {})
+    key = (table, op)
+    if ids is ALL_ROWS or changes.get(key, ()) is ALL_ROWS:
+        changes[key] = ALL_ROWS
+    else:
+        changes.setdefault(key, set()).update(ids)
+
+
+def record_cascade_events(session, table):
+    for name in cascaded_tables(table):
+        record_event(session, name, 'delete', ALL_ROWS)
+
+
+@event.listens_for(Session, 'after_flush')
+def track_flushed_events(session, flush_context):
+    if not hub.enabled:
+        return
+    for obj in session.new:
+        record_event(session, obj.__table__.name, 'create', [row_id(obj)])
+    for obj in session.deleted:
+        record_event(session, obj.__table__.name, 'delete', [row_id(obj)])
+        record_cascade_events(session, obj.__table__)
+    for obj in session.dirty:
+        if session.is_modified(obj, include_collections=False):
+            record_event(session, obj.__table__.name, 'update', [row_id(obj)])
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def track_bulk_events(orm_execute_state):
+    if not hub.enabled or not (orm_execute_state.is_insert or orm_execute_state.is_update
+                               or orm_execute_state.is_delete):
+        return
+    table = statement_table(orm_execute_state)
+    op = 'create' if orm_execute_state.is_insert else 'update' if orm_execute_state.is_update else 'delete'
+    record_event(orm_execute_state.session, table.name, op, ALL_ROWS)
+    if orm_execute_state.is_delete:
+        record_cascade_events(orm_execute_state.session, table)
+
+
+@event.listens_for(Session, 'after_commit')
+def publish_committed(session):
+    changes = session.info.pop('events', None)
+    if changes:
+        hub.publish(changes)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def discard_events(session, previous_transaction):
+    if not session.in_transaction():
+        session.info.pop('events', None)
+
+
+# The stream
+
+def event_stream(subscriber, last_id):
+    """SSE text for one subscriber: replayed events after ``last_id``, then live ones.
+
+    An ``event: reset`` means events were lost (the client fell behind and
+    its queue dropped the oldest, or ``Last-Event-ID`` is too old); the
+    client should refetch what it shows. Comments keep idle connections
+    open through proxies.
+    """
+    try:
+        yield f'retry: {RETRY_MS}\n\n'
+        last = 0
+        if last_id is not None:
+            backlog, complete = hub.replay(last_id, hub.queue_size)
+            if not complete:
+                yield 'event: reset\ndata: {"reason":"expired"}\n\n'
+            for message in backlog:
+                yield subscriber.format(message)
+            last = backlog[-1][0] if backlog else last_id
+        while True:
+            taken = subscriber.take(hub.keepalive)
+            if taken is None:
+                yield ':\n\n'
+                continue
+            messages, dropped = taken
+            if dropped:
+                hub.dropped += dropped
+                yield f'event: reset\ndata: {{"reason":"overflow","dropped":{dropped}}}\n\n'
+            for message in messages:
+                if message[0] > last:
+                    yield subscriber.format(message)
+                    last = message[0]
+    finally:
+        hub.unsubscribe(subscriber)
+
+
+class Events(Resource):
+    """``GET /events``: a Server-Sent Events stream of committed changes.
+
+    Each event is one commit: ``[{"entity", "op", "id"}, ...]`` with ``op``
+    one of ``create``, ``update`` or ``delete``. ``id`` is ``null`` when a
+    bulk statement or a cascade changed rows of that entity. ``?entities=``
+    limits the stream to some entities.
+    """
+
+    def get(self):
+        if not hub.enabled:
+            return make_response({'error': 'Events are disabled'}, 404)
+        names = parse_names('entities')
+        unknown = [name for name in names if name not in ENTITIES]
+        if unknown:
+            return make_response({'error': f"Unknown entities: {', '.join(unknown)}"}, 400)
+        last_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+        try:
+            last_id = int(last_id) if last_id else None
+        except ValueError:
+            return make_response({'error': 'Last-Event-ID must be an integer'}, 400)
+
+        # Subscribe before replaying, so nothing published in between is missed
+        subscriber = hub.subscribe(names)
+        if subscriber is None:
+            response = make_response({'error': 'Too many open event streams on this worker; retry later'}, 503)
+            response.headers['Retry-After'] = str(RETRY_MS // 1000)
+            return response
+        response = Response(event_stream(subscriber, last_id), mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'
+        # A stream closed before its first chunk never runs event_stream's finally
+        response.call_on_close(lambda: hub.unsubscribe(subscriber))
+        return response
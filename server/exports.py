@@ -0,0 +1,205 @@
+import csv
+import io
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import Boolean, DateTime, Float, Integer, and_, exists, select
+
+from config import db
+from models import Student, Course, Enrollment, Assignment, AssignmentSubmission
+
+
+def submissions_export(course_id=None, semester=None):
+    """Submissions joined to their assignment, course and student, in id order.
+
+    ``semester`` keeps submissions by students enrolled in the assignment's
+    course for that semester.
+    """
+    stmt = (
+        select(
+            AssignmentSubmission.id.label('submission_id'),
+            Course.id.label('course_id'),
+            Course.course_code,
+            Assignment.id.label('assignment_id'),
+            Assignment.title.label('assignment_title'),
+            Assignment.max_points,
+            Student.id.label('student_id'),
+            Student.name.label('student_name'),
+            Student.email.label('student_email'),
+            AssignmentSubmission.points_earned,
+            AssignmentSubmission.submitted,
+            AssignmentSubmission.submission_date,
+        )
+        .join(Assignment, Assignment.id == AssignmentSubmission.assignment_id)
+        .join(Course, Course.id == Assignment.course_id)
+        .join(Student, Student.id == AssignmentSubmission.student_id)
+        .order_by(AssignmentSubmission.id)
+    )
+    if course_id is not None:
+        stmt = stmt.where(Assignment.course_id == course_id)
+    if semester is not None:
+        stmt = stmt.where(exists().where(and_(
+            Enrollment.student_id == AssignmentSubmission.student_id,
+            Enrollment.course_id == Assignment.course_id,
+            Enrollment.semester == semester,
+        )))
+    return stmt
+
+
+def enrollments_export(course_id=None, semester=None):
+    stmt = (
+        select(
+            Enrollment.id.label('enrollment_id'),
+            Course.id.label('course_id'),
+            Course.course_code,
+            Enrollment.semester,
+            Student.id.label('student_id'),
+            Student.name.label('student_name'),
+            Student.email.label('student_email'),
+            Enrollment.enrollment_date,
+        )
+        .join(Course, Course.id == Enrollment.course_id)
+        .join(Student, Student.id == Enrollment.student_id)
+        .order_by(Enrollment.id)
+    )
+    if course_id is not None:
+        stmt = stmt.where(Enrollment.course_id == course_id)
+    if semester is not None:
+        stmt = stmt.where(Enrollment.semester == semester)
+    return stmt
+
+
+EXPORTS = {
+    'submissions': submissions_export,
+    'enrollments': enrollments_export,
+}
+
+
+def export_query(name, course_id=None, semester=None):
+    """SELECT for the export called ``name``; ``KeyError`` if there is none."""
+    return EXPORTS[name](course_id=course_id, semester=semester)
+
+
+def export_batches(stmt, batch_size):
+    """Yield lists of row tuples, ``batch_size`` at a time.
+
+    ``yield_per`` fetches through a server-side cursor where the driver
+    supports one (psycopg2 named cursors), so memory stays flat however
+    many rows the export has.
+    """
+    result = db.session.execute(stmt.execution_options(yield_per=batch_size))
+    for rows in result.partitions():
+        yield rows
+
+
+def csv_header(stmt):
+    return [column.name for column in stmt.selected_columns]
+
+
+def csv_rows(stmt):
+    """Row converter for ``csv.writer``: datetimes as ISO 8601, everything else as is."""
+    dates = [index for index, column in enumerate(stmt.selected_columns) if isinstance(column.type, DateTime)]
+    if not dates:
+        return lambda rows: rows
+
+    def convert(rows):
+        converted = []
+        for row in rows:
+            row = list(row)
+            for index in dates:
+                if row[index] is not None:
+                    row[index] = row[index].isoformat(sep=' ')
+            converted.append(row)
+        return converted
+    return convert
+
+
+def csv_chunks(stmt, batch_size):
+    """Yield CSV text: the header, then one chunk per batch of rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(csv_header(stmt))
+    convert = csv_rows(stmt)
+    for rows in export_batches(stmt, batch_size):
+        writer.writerows(convert(rows))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def arrow_schema(stmt):
+    import pyarrow
+    types = []
+    for column in stmt.selected_columns:
+        if isinstance(column.type, Boolean):
+            arrow_type = pyarrow.bool_()
+        elif isinstance(column.type, Integer):
+            arrow_type = pyarrow.int64()
+        elif isinstance(column.type, Float):
+            arrow_type = pyarrow.float64()
+        elif isinstance(column.type, DateTime):
+            arrow_type = pyarrow.timestamp('us')
+        else:
+            arrow_type = pyarrow.string()
+        types.append((column.name, arrow_type))
+    return pyarrow.schema(types)
+
+
+def write_parquet(stmt, path, batch_size, on_batch=None):
+    """Write the export to a Parquet file, one row group per batch. Returns the row count.
+
+    ``on_batch(count)`` is called with the number of rows in each batch once it is written.
+    """
+    # Optional, and slow to import, so only loaded here
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise click.ClickException('Parquet output needs pyarrow: pip install pyarrow')
+    schema = arrow_schema(stmt)
+    count = 0
+    with pyarrow.parquet.ParquetWriter(path, schema) as writer:
+        for rows in export_batches(stmt, batch_size):
+            columns = list(zip(*rows))
+            writer.write_batch(pyarrow.record_batch(
+                [pyarrow.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema,
+            ))
+            count += len(rows)
+            if on_batch:
+                on_batch(len(rows))
+    return count
+
+
+def write_csv(stmt, path, batch_size, on_batch=None):
+    count = 0
+    convert = csv_rows(stmt)
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(csv_header(stmt))
+        for rows in export_batches(stmt, batch_size):
+            writer.writerows(convert(rows))
+            count += len(rows)
+            if on_batch:
+                on_batch(len(rows))
+    return count
+
+
+exports_cli = AppGroup('exports', help='Offline data exports.')
+
+
+@exports_cli.command('write')
+@click.argument('name', type=click.Choice(sorted(EXPORTS)))
+@click.argument('path', type=click.Path(dir_okay=False, writable=True))
+@click.option('--format', 'file_format', type=click.Choice(['parquet', 'csv']), default='parquet', show_default=True)
+@click.option('--course-id', type=int, help='Only this course.')
+@click.option('--semester', help='Only this semester.')
+@click.option('--batch-size', type=int, default=50000, show_default=True, help='Rows fetched and written at a time.')
+def write_export_command(name, path, file_format, course_id, semester, batch_size):
+    """Write the NAME export (submissions or enrollments) to PATH."""
+    stmt = export_query(name, course_id=course_id, semester=semester)
+    write = write_parquet if file_format == 'parquet' else write_csv
+    count = write(stmt, path, batch_size)
+    click.echo(f"Wrote {count} {name} rows to {path}")
@@ -0,0 +1,187 @@
+import click
+from flask.cli import AppGroup
+from sqlalchemy import and_, case, delete, func, insert, select
+
+from config import db
+from models import (Student, Course, Enrollment, Assignment, AssignmentSubmission,
+                    CourseGradeSummary, grade_summary_select)
+
+# Percentage thresholds on a 4.0 scale
+GRADE_SCALE = ((90, 'A', 4.0), (80, 'B', 3.0), (70, 'C', 2.0), (60, 'D', 1.0), (0, 'F', 0.0))
+
+
+def percentage(points_earned, points_possible):
+    if not points_possible:
+        return None
+    return round(100.0 * points_earned / points_possible, 2)
+
+
+def letter_grade(percent):
+    if percent is None:
+        return None, None
+    for threshold, letter, grade_points in GRADE_SCALE:
+        if percent >= threshold:
+            return letter, grade_points
+
+
+def weighted_gpa(courses):
+    """Credit-weighted GPA over the graded courses in ``courses``."""
+    credits = sum(course['credits'] for course in courses if course['grade_points'] is not None)
+    if not credits:
+        return None
+    total = sum(course['credits'] * course['grade_points'] for course in courses if course['grade_points'] is not None)
+    return round(total / credits, 2)
+
+
+def course_gradebook(course_id, semester=None):
+    """Per-student, per-assignment points for one course.
+
+    One grouped query over enrolled students x course assignments, left
+    joined to submissions. A student's best attempt counts when an
+    assignment was submitted more than once, and the window sums give each
+    student's course totals without a second pass over the database.
+    """
+    enrolled = select(Enrollment.student_id).where(Enrollment.course_id == course_id)
+    if semester is not None:
+        enrolled = enrolled.where(Enrollment.semester == semester)
+    enrolled = enrolled.distinct().subquery()
+
+    points = func.max(AssignmentSubmission.points_earned)
+    graded_max = case((points.isnot(None), Assignment.max_points))
+    stmt = (
+        select(
+            Student.id.label('student_id'),
+            Student.name,
+            Assignment.id.label('assignment_id'),
+            Assignment.title,
+            Assignment.max_points,
+            points.label('points_earned'),
+            func.sum(points).over(partition_by=Student.id).label('total_earned'),
+            func.sum(graded_max).over(partition_by=Student.id).label('total_possible'),
+        )
+        .select_from(enrolled)
+        .join(Student, Student.id == enrolled.c.student_id)
+        .join(Assignment, Assignment.course_id == course_id)
+        .outerjoin(AssignmentSubmission, and_(
+            AssignmentSubmission.assignment_id == Assignment.id,
+            AssignmentSubmission.student_id == Student.id,
+        ))
+        .group_by(Student.id, Student.name, Assignment.id, Assignment.title, Assignment.max_points)
+        .order_by(Student.id, Assignment.id)
+    )
+
+    assignments = {}
+    students = {}
+    for row in db.session.execute(stmt):
+        assignments.setdefault(row.assignment_id, {
+            'id': row.assignment_id,
+            'title': row.title,
+            'max_points': row.max_points,
+        })
+        student = students.get(row.student_id)
+        if student is None:
+            percent = percentage(row.total_earned or 0, row.total_possible)
+            student = students[row.student_id] = {
+                'student_id': row.student_id,
+                'name': row.name,
+                'points_earned': row.total_earned or 0,
+                'points_possible': row.total_possible or 0,
+                'percentage': percent,
+                'letter_grade': letter_grade(percent)[0],
+                'assignments': [],
+            }
+        student['assignments'].append({'assignment_id': row.assignment_id, 'points_earned': row.points_earned})
+
+    return {
+        'assignments': list(assignments.values()),
+        'students': list(students.values()),
+    }
+
+
+def student_transcript(student_id):
+    """Course percentages and credit-weighted GPA for one student.
+
+    Reads one ``course_grade_summaries`` row per enrolled course.
+    """
+    enrolled = (
+        select(Enrollment.course_id)
+        .where(Enrollment.student_id == student_id)
+        .distinct()
+        .subquery()
+    )
+    stmt = (
+        select(
+            Course.id,
+            Course.name,
+            Course.course_code,
+            Course.credits,
+            CourseGradeSummary.points_earned,
+            CourseGradeSummary.points_possible,
+        )
+        .select_from(enrolled)
+        .join(Course, Course.id == enrolled.c.course_id)
+        .outerjoin(CourseGradeSummary, and_(
+            CourseGradeSummary.student_id == student_id,
+            CourseGradeSummary.course_id == Course.id,
+        ))
+        .order_by(Course.id)
+    )
+    return transcript_payload(db.session.execute(stmt))
+
+
+def transcript_payload(rows):
+    courses = []
+    for row in rows:
+        percent = percentage(row.points_earned or 0, row.points_possible)
+        letter, grade_points = letter_grade(percent)
+        courses.append({
+            'course_id': row.id,
+            'name': row.name,
+            'course_code': row.course_code,
+            'credits': row.credits,
+            'points_earned': row.points_earned or 0,
+            'points_possible': row.points_possible or 0,
+            'percentage': percent,
+            'letter_grade': letter,
+            'grade_points': grade_points,
+        })
+    return {'courses': courses, 'gpa': weighted_gpa(courses)}
+
+
+SUMMARY_COLUMNS = ('student_id', 'course_id', 'points_earned', 'points_possible', 'graded_count')
+
+
+def grade_summary_drift():
+    """Count summary rows that are missing/stale and rows that should not exist."""
+    table = CourseGradeSummary.__table__
+    expected = grade_summary_select()
+    actual = select(*(table.c[name] for name in SUMMARY_COLUMNS))
+    missing = db.session.execute(
+        select(func.count()).select_from(expected.except_(actual).subquery())).scalar()
+    extra = db.session.execute(
+        select(func.count()).select_from(actual.except_(expected).subquery())).scalar()
+    return missing, extra
+
+
+def rebuild_grade_summaries():
+    table = CourseGradeSummary.__table__
+    db.session.execute(delete(table))
+    db.session.execute(insert(table).from_select(SUMMARY_COLUMNS, grade_summary_select()))
+    db.session.commit()
+
+
+grades_cli = AppGroup('grades', help='Grade summary maintenance.')
+
+
+@grades_cli.command('rebuild-summaries')
+@click.option('--check', is_flag=True, help='Only report drift; do not rewrite the table.')
+def rebuild_summaries_command(check):
+    """Recompute course_grade_summaries from submissions."""
+    missing, extra = grade_summary_drift()
+    click.echo(f"Drift: {missing} missing or stale rows, {extra} unexpected rows")
+    if check:
+        if missing or extra:
+            raise SystemExit(1)
+        return
+    rebuild_grade_summaries()
+    click.echo("Rebuilt course_grade_summaries")
@@ -0,0 +1,38 @@
+"""Gunicorn settings, read automatically when gunicorn is started from server/:
+
+    gunicorn wsgi:app
+
+With ``preload_app`` the master imports and builds the app once and the
+workers are forked from it, so they share its memory pages and boot
+without importing anything. Connections the master may have opened are
+then disposed of in each worker.
+
+Each open ``/events`` stream holds one of a worker's threads, so these
+workers accept at most half their threads in streams and answer 503
+beyond that; serve ``/events`` from ``gunicorn.events.conf.py`` instead.
+
+The other half serve API requests, and each may need a database
+connection at once, so the pool's overflow defaults to cover them:
+DB_POOL_SIZE + DB_MAX_OVERFLOW = GUNICORN_THREADS / 2 per worker. With
+the defaults that is 5 + 10, as without gunicorn. Raise GUNICORN_THREADS
+only as far as the database accepts WEB_CONCURRENCY times that many
+connections (Postgres: ``max_connections``, 100 by default).
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5555')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 30))
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1').lower() in ('1', 'true', 'yes')
+# Read by the app's config: streams may take half the threads, and every
+# other thread can hold a pooled database connection without waiting
+os.environ.setdefault('EVENTS_MAX_SUBSCRIBERS', str(threads // 2))
+os.environ.setdefault('DB_MAX_OVERFLOW',
+                      str(max(0, threads - threads // 2 - int(os.environ.get('DB_POOL_SIZE', 5)))))
+
+
+def post_fork(server, worker):
+    if server.cfg.preload_app:
+        from config import dispose_engines
+        dispose_engines(server.app.wsgi())
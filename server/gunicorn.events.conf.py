@@ -0,0 +1,23 @@
+"""Gunicorn settings for a server dedicated to ``/events``:
+
+    gunicorn -c gunicorn.events.conf.py wsgi:app
+
+A gevent worker holds each stream in a greenlet rather than a thread, so
+one worker keeps thousands of idle streams open. Route ``/events`` to
+this server (EVENTS_PORT) and everything else to the one started with
+``gunicorn.conf.py``; commits on either reach the streams through the
+shared events broker.
+
+The app is not preloaded: gevent has to patch the standard library in
+each worker before the app and its database drivers are imported.
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('EVENTS_PORT', '5556')}"
+workers = int(os.environ.get('EVENTS_WORKERS', 1))
+worker_class = 'gevent'
+# Open connections (streams) per worker
+worker_connections = int(os.environ.get('EVENTS_WORKER_CONNECTIONS', 10000))
+preload_app = False
+# Read by the app's config; worker_connections is the limit here
+os.environ.setdefault('EVENTS_MAX_SUBSCRIBERS', '0')
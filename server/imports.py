@@ -0,0 +1,376 @@
+import csv
+import io
+from itertools import islice
+
+import click
+from flask import current_app, request, make_response
+from flask.cli import AppGroup
+from sqlalchemy import insert, select, tuple_
+from sqlalchemy.exc import IntegrityError
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+
+from bulk import existing
+from cache import ALL_ROWS, record_change
+from changes import record_upserts
+from config import db
+from events import record_event
+from listing import parse_bool
+from models import (Student, Teacher, Course, Enrollment, utcnow, check_name, check_email, check_grade_level,
+                    check_department, check_course_code, check_credits, check_semester)
+
+
+def integer(row, key):
+    try:
+        return int(row[key])
+    except (TypeError, ValueError):
+        raise ValueError(f"{key} must be an integer")
+
+
+def text(row, key):
+    value = row[key]
+    if value is None:
+        raise ValueError(f"Missing value: {key}")
+    return value
+
+
+class RosterImport:
+    """Validate and load one kind of roster CSV, a batch of rows at a time.
+
+    ``parse`` applies the same rules as the model's ``@validates`` methods
+    (``check_*`` in models.py) to one CSV row. ``check`` then resolves
+    references and uniqueness for the whole batch with one query per
+    lookup, and the rows that pass are loaded with ``COPY`` on Postgres or
+    one executemany ``INSERT`` elsewhere. Rows that fail are reported by
+    CSV line number and skipped.
+    """
+
+    model = None
+    columns = ()
+
+    def parse(self, row):
+        raise NotImplementedError
+
+    def check(self, batch):
+        """Return ``{line: message}`` for rows of ``batch`` that cannot be loaded."""
+        return {}
+
+    def run(self, rows, batch_size, on_batch=None):
+        """Import ``(line, row)`` pairs; return ``(imported, errors)``.
+
+        ``on_batch(count)`` is called with the number of rows in each batch once it is loaded.
+        """
+        imported, errors = 0, []
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            parsed, failed = [], {}
+            for line, row in batch:
+                try:
+                    parsed.append((line, self.parse(row)))
+                except (ValueError, TypeError, AttributeError) as e:
+                    failed[line] = str(e)
+            failed.update(self.check(parsed))
+            values = [values for line, values in parsed if line not in failed]
+            if values:
+                load_rows(self.model, values)
+                imported += len(values)
+            errors.extend({'line': line, 'error': failed[line]} for line in sorted(failed))
+            if on_batch:
+                on_batch(len(batch))
+        return imported, errors
+
+
+class UniqueEmailImport(RosterImport):
+    def __init__(self):
+        self.emails = set()
+
+    def check(self, batch):
+        errors = {}
+        taken = existing(self.model.email, (values['email'] for _, values in batch))
+        for line, values in batch:
+            if values['email'] in taken or values['email'] in self.emails:
+                errors[line] = 'Email already exists'
+            else:
+                self.emails.add(values['email'])
+        return errors
+
+
+class StudentImport(UniqueEmailImport):
+    model = Student
+    columns = ('name', 'email', 'grade_level')
+
+    def parse(self, row):
+        return {
+            'name': check_name(row['name']),
+            'email': check_email(text(row, 'email')),
+            'grade_level': check_grade_level(integer(row, 'grade_level')),
+        }
+
+
+class TeacherImport(UniqueEmailImport):
+    model = Teacher
+    columns = ('name', 'email', 'department')
+
+    def parse(self, row):
+        return {
+            'name': check_name(row['name']),
+            'email': check_email(text(row, 'email')),
+            'department': check_department(row['department']),
+        }
+
+
+class CourseImport(RosterImport):
+    """Courses reference their teacher by ``teacher_email``."""
+
+    model = Course
+    columns = ('name', 'course_code', 'credits', 'teacher_email')
+
+    def __init__(self):
+        self.codes = set()
+
+    def parse(self, row):
+        return {
+            'name': check_name(row['name'], 'Course name'),
+            'course_code': check_course_code(text(row, 'course_code')),
+            'credits': check_credits(integer(row, 'credits')),
+            'teacher_email': text(row, 'teacher_email'),
+        }
+
+    def check(self, batch):
+        errors = {}
+        taken = existing(Course.course_code, (values['course_code'] for _, values in batch))
+        teachers = lookup(Teacher.email, Teacher.id, (values['teacher_email'] for _, values in batch))
+        for line, values in batch:
+            teacher_id = teachers.get(values.pop('teacher_email'))
+            if values['course_code'] in taken or values['course_code'] in self.codes:
+                errors[line] = 'Course code already exists'
+            elif teacher_id is None:
+                errors[line] = 'Teacher not found'
+            else:
+                values['teacher_id'] = teacher_id
+                self.codes.add(values['course_code'])
+        return errors
+
+
+class EnrollmentImport(RosterImport):
+    """Enrollments reference the student by ``student_email`` and the course by ``course_code``."""
+
+    model = Enrollment
+    columns = ('student_email', 'course_code', 'semester')
+
+    def __init__(self):
+        self.keys = set()
+
+    def parse(self, row):
+        return {
+            'student_email': text(row, 'student_email'),
+            'course_code': text(row, 'course_code').upper(),
+            'semester': check_semester(row['semester']),
+        }
+
+    def check(self, batch):
+        errors = {}
+        students = lookup(Student.email, Student.id, (values['student_email'] for _, values in batch))
+        courses = lookup(Course.course_code, Course.id, (values['course_code'] for _, values in batch))
+        for values in (values for _, values in batch):
+            values['student_id'] = students.get(values.pop('student_email'))
+            values['course_id'] = courses.get(values.pop('course_code'))
+        keys = {(values['student_id'], values['course_id'], values['semester'])
+                for _, values in batch if values['student_id'] and values['course_id']}
+        enrolled = set(db.session.execute(
+            select(Enrollment.student_id, Enrollment.course_id, Enrollment.semester)
+            .where(tuple_(Enrollment.student_id, Enrollment.course_id, Enrollment.semester).in_(keys))
+        ).all()) if keys else set()
+        for line, values in batch:
+            key = (values['student_id'], values['course_id'], values['semester'])
+            if values['student_id'] is None:
+                errors[line] = 'Student not found'
+            elif values['course_id'] is None:
+                errors[line] = 'Course not found'
+            elif key in enrolled or key in self.keys:
+                errors[line] = 'Student already enrolled in this course'
+            else:
+                self.keys.add(key)
+        return errors
+
+
+IMPORTS = {
+    'students': StudentImport,
+    'teachers': TeacherImport,
+    'courses': CourseImport,
+    'enrollments': EnrollmentImport,
+}
+
+
+def lookup(key_column, value_column, keys):
+    """``{key: value}`` for the rows whose ``key_column`` is in ``keys``."""
+    keys = {key for key in keys if key is not None}
+    if not keys:
+        return {}
+    return dict(db.session.execute(select(key_column, value_column).where(key_column.in_(keys))).all())
+
+
+def load_rows(model, rows):
+    """Insert ``rows`` (dicts with the same keys) with COPY on psycopg2, else executemany."""
+    connection = db.session.connection()
+    if connection.dialect.driver != 'psycopg2':
+        db.session.execute(insert(model.__table__), rows)
+        return
+    table = model.__table__
+    columns = [*rows[0], 'updated_at']
+    now = utcnow()
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([*row.values(), now] for row in rows)
+    buffer.seek(0)
+    statement = f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+    with connection.connection.dbapi_connection.cursor() as cursor:
+        try:
+            cursor.copy_expert(statement, buffer)
+        except connection.dialect.dbapi.IntegrityError as e:
+            # A concurrent writer took an email/code after check() ran
+            raise IntegrityError(statement, None, e)
+    # COPY bypasses the ORM, so tell the response cache, the change feed and the event hub directly;
+    # the feed logs the rows stamped updated_at >= now, i.e. the ones copied above
+    record_change(db.session, table.name, ())
+    record_upserts(db.session, table.name, ALL_ROWS, now)
+    record_event(db.session, table.name, 'create', ALL_ROWS)
+
+
+def read_csv(stream, columns):
+    """``(line, row)`` pairs from a CSV text stream whose header has ``columns``."""
+    reader = csv.DictReader(stream)
+    missing = [column for column in columns if column not in (reader.fieldnames or ())]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+    return ((reader.line_num, row) for row in reader)
+
+
+def import_csv(kind, stream, batch_size, on_batch=None):
+    """Import one roster file; ``ValueError`` for an unknown kind or a bad header."""
+    if kind not in IMPORTS:
+        raise ValueError(f"Unknown import: {kind}. Expected one of: {', '.join(IMPORTS)}")
+    importer = IMPORTS[kind]()
+    return importer.run(read_csv(stream, importer.columns), batch_size, on_batch)
+
+
+class MultipartField(io.RawIOBase):
+    """The data of the multipart field ``name``, decoded from ``stream`` as it is read.
+
+    ``request.files`` would spool the whole body to a temporary file before
+    the first row is parsed; this reads the request ``chunk_size`` bytes at
+    a time. Fields before ``name`` are skipped and nothing after it is read.
+    """
+
+    def __init__(self, stream, boundary, name, chunk_size=65536):
+        super().__init__()
+        self.stream = stream
+        self.decoder = MultipartDecoder(boundary)
+        self.name = name
+        self.chunk_size = chunk_size
+        self.part = None
+        self.found = False
+        self.done = False
+        self.pending = memoryview(b'')
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self.pending and not self.done:
+            self.pending = memoryview(self.next_data())
+        count = min(len(buffer), len(self.pending))
+        buffer[:count] = self.pending[:count]
+        self.pending = self.pending[count:]
+        return count
+
+    def next_data(self):
+        event = self.decoder.next_event()
+        if isinstance(event, NeedData):
+            self.decoder.receive_data(self.stream.read(self.chunk_size) or None)
+        elif isinstance(event, (Field, File)):
+            self.part = event.name
+            self.found = self.found or event.name == self.name
+        elif isinstance(event, Data) and self.part == self.name:
+            self.done = not event.more_data
+            return event.data
+        elif isinstance(event, Epilogue):
+            if not self.found:
+                raise ValueError(f"Missing multipart field: {self.name}")
+            self.done = True
+        return b''
+
+
+def request_body():
+    """The request body as binary IO: the ``file`` field of a multipart upload, else the raw body."""
+    if request.mimetype != 'multipart/form-data':
+        return request.stream
+    boundary = request.mimetype_params.get('boundary')
+    if not boundary:
+        raise ValueError("Multipart body without a boundary")
+    return io.BufferedReader(MultipartField(request.stream, boundary.encode('latin-1'), 'file'))
+
+
+def import_response():
+    """``POST /imports?kind=...``: import a CSV body or multipart ``file`` upload.
+
+    The body is read from the request stream, decoded and parsed as it
+    arrives, never buffered whole. Valid rows are committed and failures
+    reported by line (207); ``?atomic=1`` rolls everything back if any row
+    fails.
+    """
+    try:
+        atomic = parse_bool(request.args.get('atomic', '0'))
+    except ValueError as e:
+        return make_response({'error': str(e)}, 400)
+    try:
+        stream = io.TextIOWrapper(request_body(), encoding='utf-8-sig', newline='')
+        imported, errors = import_csv(request.args.get('kind'), stream, current_app.config['IMPORT_BATCH_SIZE'])
+    except ValueError as e:
+        db.session.rollback()
+        return make_response({'error': str(e)}, 400)
+    except IntegrityError:
+        db.session.rollback()
+        return make_response({'error': 'Conflicting rows were written concurrently; nothing was saved'}, 409)
+
+    if errors and (atomic or not imported):
+        db.session.rollback()
+        return make_response({'imported': 0, 'failed': len(errors), 'errors': errors}, 400)
+    db.session.commit()
+    return make_response({'imported': imported, 'failed': len(errors), 'errors': errors}, 207 if errors else 201)
+
+
+imports_cli = AppGroup('imports', help='Roster imports from CSV.')
+
+
+@imports_cli.command('roster')
+@click.argument('kind', type=click.Choice(list(IMPORTS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', type=int, help='Rows validated and loaded at a time [default: IMPORT_BATCH_SIZE].')
+@click.option('--atomic', is_flag=True, help='Roll back everything if any row fails.')
+@click.option('--report', type=click.Path(dir_okay=False, writable=True), help='Write the per-row errors to this CSV.')
+def import_roster_command(kind, path, batch_size, atomic, report):
+    """Import a KIND roster (students, teachers, courses or enrollments) from PATH."""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        try:
+            imported, errors = import_csv(kind, f, batch_size or current_app.config['IMPORT_BATCH_SIZE'])
+        except ValueError as e:
+            raise click.ClickException(str(e))
+    if errors and atomic:
+        db.session.rollback()
+        imported = 0
+    else:
+        db.session.commit()
+    if report:
+        with open(report, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=['line', 'error'])
+            writer.writeheader()
+            writer.writerows(errors)
+    else:
+        for error in errors:
+            click.echo(f"line {error['line']}: {error['error']}", err=True)
+    click.echo(f"Imported {imported} {kind}, {len(errors)} rows failed")
+    if errors:
+        raise SystemExit(1)
@@ -0,0 +1,196 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Histogram bucket upper bounds in milliseconds
+BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+slow_query_logger = logging.getLogger('school.slow_query')
+_slow_query_ms = None
+
+
+class Histogram:
+    __slots__ = ('counts', 'count', 'sum')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(BUCKETS_MS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the ``q`` quantile."""
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS_MS, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+    def snapshot(self):
+        cumulative = 0
+        buckets = []
+        for bound, count in zip(BUCKETS_MS + ('+Inf',), self.counts):
+            cumulative += count
+            buckets.append([bound, cumulative])
+        return {
+            'count': self.count,
+            'sum_ms': round(self.sum, 3),
+            'p50_ms': self.quantile(0.5) if self.count else None,
+            'p95_ms': self.quantile(0.95) if self.count else None,
+            'buckets': buckets,
+        }
+
+
+class RouteMetrics:
+    __slots__ = ('total', 'db', 'serialize', 'sql_total', 'sql_max', 'statuses')
+
+    def __init__(self):
+        self.total = Histogram()
+        self.db = Histogram()
+        self.serialize = Histogram()
+        self.sql_total = 0
+        self.sql_max = 0
+        self.statuses = {}
+
+    def observe(self, total, timing, status):
+        self.total.observe(total * 1000)
+        self.db.observe(timing['db'] * 1000)
+        self.serialize.observe(timing['serialize'] * 1000)
+        self.sql_total += timing['sql']
+        self.sql_max = max(self.sql_max, timing['sql'])
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def snapshot(self):
+        return {
+            'total': self.total.snapshot(),
+            'db': self.db.snapshot(),
+            'serialize': self.serialize.snapshot(),
+            'sql_statements': {
+                'mean': round(self.sql_total / self.total.count, 2) if self.total.count else None,
+                'max': self.sql_max,
+            },
+            'statuses': dict(self.statuses),
+        }
+
+
+_routes = {}
+_lock = threading.Lock()
+
+
+def metrics_snapshot():
+    """Per-route histograms for this worker process since it started."""
+    with _lock:
+        return {
+            'buckets_ms': list(BUCKETS_MS),
+            'routes': {route: metrics.snapshot() for route, metrics in sorted(_routes.items())},
+        }
+
+
+@contextmanager
+def timed(name):
+    """Add the time spent in the block to the current request's ``name`` timer."""
+    if not has_request_context() or 'timing' not in g:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        g.timing[name] += time.perf_counter() - start
+
+
+def route_name():
+    rule = request.url_rule.rule if request.url_rule is not None else '<unmatched>'
+    return f'{request.method} {rule}'
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start'].pop()
+    in_request = has_request_context() and 'timing' in g
+    if in_request:
+        g.timing['db'] += elapsed
+        g.timing['sql'] += 1
+
+    if _slow_query_ms is not None and elapsed * 1000 >= _slow_query_ms:
+        params = repr(parameters)
+        if len(params) > 1000:
+            params = params[:1000] + '...'
+        slow_query_logger.warning(
+            'slow query %.1fms route=%s executemany=%s\n%s\nparameters: %s',
+            elapsed * 1000, route_name() if in_request else '-', executemany, statement, params,
+        )
+
+
+def init_instrumentation(app):
+    """Per-request SQL counts and timings, Server-Timing, route histograms and a slow-query log.
+
+    Engine events time every cursor execute; the totals for the current
+    request are kept in ``g.timing``. ``after_request`` reports them in a
+    ``Server-Timing`` header and ``teardown_request`` adds them to the
+    route's histograms (so streamed responses include their whole body).
+    Statements slower than ``SLOW_QUERY_MS`` are logged with their
+    parameters and route to the ``school.slow_query`` logger.
+    """
+    global _slow_query_ms
+    if not app.config['METRICS_ENABLED']:
+        return
+
+    if app.config['SLOW_QUERY_MS'] > 0:
+        _slow_query_ms = app.config['SLOW_QUERY_MS']
+        log_file = app.config['SLOW_QUERY_LOG']
+        if log_file and not slow_query_logger.handlers:
+            handler = logging.FileHandler(log_file)
+            handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+            slow_query_logger.addHandler(handler)
+
+    if not event.contains(Engine, 'before_cursor_execute', before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', after_cursor_execute)
+
+    @app.before_request
+    def start_timing():
+        g.timing = {'start': time.perf_counter(), 'db': 0.0, 'serialize': 0.0, 'sql': 0}
+
+    @app.after_request
+    def server_timing(response):
+        timing = g.get('timing')
+        if timing is None:
+            return response
+        total = time.perf_counter() - timing['start']
+        g.status = response.status_code
+        response.headers['Server-Timing'] = (
+            f'db;dur={timing["db"] * 1000:.2f};desc="{timing["sql"]} queries", '
+            f'serialize;dur={timing["serialize"] * 1000:.2f}, '
+            f'total;dur={total * 1000:.2f}'
+        )
+        return response
+
+    @app.teardown_request
+    def record_metrics(exc):
+        timing = g.pop('timing', None)
+        if timing is None or request.endpoint == 'api.metrics':
+            return
+        total = time.perf_counter() - timing['start']
+        status = f'{str(g.get("status", 500))[0]}xx'
+        route = route_name()
+        with _lock:
+            metrics = _routes.get(route)
+            if metrics is None:
+                metrics = _routes[route] = RouteMetrics()
+            metrics.observe(total, timing, status)
@@ -0,0 +1,635 @@
+import csv
+import importlib.util
+import json
+import multiprocessing
+import os
+import queue
+import signal
+import socket
+import time
+import traceback
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+
+import click
+from flask import current_app, request, make_response, send_file, url_for
+from flask.cli import AppGroup
+from flask_restful import Resource
+from sqlalchemy import and_, delete, func, select, update
+from sqlalchemy.exc import OperationalError
+
+from changes import ENTITIES
+from config import db, settings
+from exports import EXPORTS, export_query, write_csv, write_parquet
+from grades import rebuild_grade_summaries
+from imports import IMPORTS, import_csv
+from listing import coerce_param, parse_bool
+from models import CourseGradeSummary, Job, utcnow
+from replicas import on_primary
+
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+# Failed rows kept in an import job's result; the count covers them all
+MAX_REPORTED_ERRORS = 1000
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def output_dir(*parts):
+    path = os.path.join(current_app.config['JOBS_OUTPUT_DIR'], *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def remove_file(path):
+    if path:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+# Job kinds
+
+class JobKind:
+    """One kind of job.
+
+    ``check`` validates the params when the job is queued and returns them
+    normalized (``ValueError`` becomes a 400). ``run`` does the work in a
+    worker process and returns the job's JSON result. A ``ValueError``
+    from ``run`` fails the job for good; any other exception is retried.
+    """
+
+    upload = False
+
+    def check(self, params):
+        return {}
+
+    def run(self, params, progress):
+        raise NotImplementedError
+
+
+class ExportJob(JobKind):
+    """``{"name": "submissions", "format": "csv", "course_id": 3, "semester": "Fall"}``.
+
+    The file is written to JOBS_OUTPUT_DIR and served by ``GET /jobs/<id>/result``.
+    """
+
+    def check(self, params):
+        name = params.get('name')
+        if name not in EXPORTS:
+            raise ValueError(f"Unknown export: {name}. Expected one of: {', '.join(EXPORTS)}")
+        file_format = params.get('format', 'csv')
+        if file_format not in ('csv', 'parquet'):
+            raise ValueError("format must be csv or parquet")
+        if file_format == 'parquet' and importlib.util.find_spec('pyarrow') is None:
+            raise ValueError("Parquet output needs pyarrow on the server")
+        course_id = params.get('course_id')
+        if course_id is not None and (not isinstance(course_id, int) or isinstance(course_id, bool)):
+            raise ValueError("course_id must be an integer")
+        semester = params.get('semester')
+        if semester is not None and not isinstance(semester, str):
+            raise ValueError("semester must be a string")
+        return {'name': name, 'format': file_format, 'course_id': course_id, 'semester': semester}
+
+    def run(self, params, progress):
+        stmt = export_query(params['name'], course_id=params['course_id'], semester=params['semester'])
+        progress.start(db.session.scalar(select(func.count()).select_from(stmt.order_by(None).subquery())))
+        filename = f"{params['name']}.{params['format']}"
+        path = os.path.join(output_dir(), f"job-{progress.job_id}-{filename}")
+        write = write_parquet if params['format'] == 'parquet' else write_csv
+        try:
+            rows = write(stmt, path, current_app.config['EXPORT_BATCH_SIZE'], on_batch=progress.advance)
+        except BaseException:
+            remove_file(path)
+            raise
+        return {'rows': rows, 'filename': filename, 'path': path}
+
+
+class ImportJob(JobKind):
+    """``{"roster": "students", "atomic": false}``, posted as multipart form fields with the CSV ``file``.
+
+    Runs like ``POST /imports``, in one transaction: a cancelled import saves nothing.
+    """
+
+    upload = True
+
+    def check(self, params):
+        roster = params.get('roster')
+        if roster not in IMPORTS:
+            raise ValueError(f"Unknown import: {roster}. Expected one of: {', '.join(IMPORTS)}")
+        atomic = params.get('atomic', False)
+        if isinstance(atomic, str):
+            atomic = parse_bool(atomic)
+        return {'roster': roster, 'atomic': bool(atomic)}
+
+    def run(self, params, progress):
+        with open(params['path'], newline='', encoding='utf-8-sig') as f:
+            progress.start(max(sum(1 for _ in csv.reader(f)) - 1, 0))
+            f.seek(0)
+            imported, errors = import_csv(params['roster'], f, current_app.config['IMPORT_BATCH_SIZE'],
+                                          on_batch=progress.advance)
+        if errors and (params['atomic'] or not imported):
+            db.session.rollback()
+            imported = 0
+        else:
+            db.session.commit()
+        return {'imported': imported, 'failed': len(errors), 'errors': errors[:MAX_REPORTED_ERRORS]}
+
+
+class DeleteJob(JobKind):
+    """``{"entity": "students", "filters": {"grade_level": 12}}``.
+
+    Deletes the matching rows, and the rows they cascade to, a batch of
+    JOBS_DELETE_BATCH_SIZE ids at a time with a commit after each, so no
+    lock is held for long. A cancelled delete keeps the batches already
+    committed.
+    """
+
+    def check(self, params):
+        entity = params.get('entity')
+        if entity not in ENTITIES:
+            raise ValueError(f"Unknown entity: {entity}. Expected one of: {', '.join(ENTITIES)}")
+        filters = params.get('filters')
+        if not isinstance(filters, dict) or not filters:
+            raise ValueError("At least one filter is required")
+        columns = ENTITIES[entity].__table__.columns
+        checked = {}
+        for name, value in filters.items():
+            if name not in columns or columns[name].type.python_type not in (int, bool, str):
+                raise ValueError(f"Cannot filter {entity} on {name}")
+            checked[name] = coerce_param(columns[name], str(value))
+        return {'entity': entity, 'filters': checked}
+
+    def run(self, params, progress):
+        model = ENTITIES[params['entity']]
+        criterion = and_(*(model.__table__.columns[name] == value for name, value in params['filters'].items()))
+        progress.start(db.session.scalar(select(func.count()).select_from(model).where(criterion)))
+        batch_size = current_app.config['JOBS_DELETE_BATCH_SIZE']
+        deleted = 0
+        while True:
+            ids = db.session.scalars(select(model.id).where(criterion).order_by(model.id).limit(batch_size)).all()
+            if not ids:
+                break
+            result = db.session.execute(
+                delete(model).where(model.id.in_(ids)).execution_options(synchronize_session=False))
+            db.session.commit()
+            deleted += result.rowcount
+            progress.advance(len(ids))
+        return {'deleted': deleted}
+
+
+class RebuildGradeSummariesJob(JobKind):
+    """``flask grades rebuild-summaries``; takes no params."""
+
+    def run(self, params, progress):
+        progress.start(1, 'Rebuilding course_grade_summaries')
+        rebuild_grade_summaries()
+        progress.advance(1)
+        return {'rows': db.session.scalar(select(func.count()).select_from(CourseGradeSummary))}
+
+
+JOBS = {
+    'export': ExportJob(),
+    'import': ImportJob(),
+    'delete': DeleteJob(),
+    'rebuild_grade_summaries': RebuildGradeSummariesJob(),
+}
+
+
+# Running jobs (in the pool processes)
+
+class Progress:
+    """Handed to ``JobKind.run``: reports progress to the worker and notices cancellation.
+
+    ``advance`` looks up ``cancel_requested`` at most once a second, on a
+    connection of its own so the job's transaction is left alone, and
+    raises ``JobCancelled`` once it is set.
+    """
+
+    def __init__(self, job_id, updates, check_every=1.0):
+        self.job_id = job_id
+        self.updates = updates
+        self.check_every = check_every
+        self.checked = time.monotonic()
+        self.done = 0
+        self.total = None
+        self.message = None
+
+    def start(self, total, message=None):
+        self.total = total
+        self.message = message
+        self.report()
+
+    def advance(self, count, message=None):
+        self.done += count
+        if message is not None:
+            self.message = message
+        self.report()
+        self.check_cancelled()
+
+    def report(self):
+        self.updates.put((self.job_id, self.done, self.total, self.message))
+
+    def check_cancelled(self):
+        now = time.monotonic()
+        if now - self.checked < self.check_every:
+            return
+        self.checked = now
+        with db.engine.connect() as connection:
+            if connection.scalar(select(Job.cancel_requested).where(Job.id == self.job_id)):
+                raise JobCancelled()
+
+
+_pool_app = None
+_pool_updates = None
+
+
+def init_pool_process(config, updates):
+    """Pool process initializer: build this process's own app (and database connections)."""
+    global _pool_app, _pool_updates
+    # The worker command stops the pool itself; Ctrl-C must not kill a job halfway through a batch
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from app import create_app
+    _pool_app = create_app(config)
+    _pool_updates = updates
+
+
+def run_job(job_id):
+    """Run one claimed job; returns ``(status, result or error, done, total)``.
+
+    Exceptions are turned into a status here, since not all of them survive
+    being pickled back to the worker.
+    """
+    with _pool_app.app_context():
+        kind, params = db.session.execute(select(Job.kind, Job.params).where(Job.id == job_id)).one()
+        db.session.rollback()
+        progress = Progress(job_id, _pool_updates)
+        try:
+            result = JOBS[kind].run(json.loads(params), progress)
+            return 'succeeded', result, progress.done, progress.total
+        except JobCancelled:
+            outcome = 'cancelled', None
+        except ValueError as e:
+            outcome = 'failed', str(e)
+        except Exception as e:
+            traceback.print_exc()
+            outcome = 'error', f'{type(e).__name__}: {e}'
+        db.session.rollback()
+        return (*outcome, progress.done, progress.total)
+
+
+# The worker (flask jobs work)
+
+class Worker:
+    """Claims due jobs from the ``jobs`` table and runs them on a process pool.
+
+    The table is the queue: a job is claimed with ``UPDATE ... WHERE id = :id
+    AND status = 'queued'``, so several workers (on one box or more) never
+    run the same job. Each job runs in a pool process of its own and sends
+    its progress back over a queue; this process writes the progress,
+    heartbeats for the jobs it runs and their outcomes. A job that fails
+    with anything but a ``ValueError`` is queued again with exponential
+    backoff until it has been tried ``max_attempts`` times. Running jobs
+    whose heartbeat is older than JOBS_STALE_S (their worker died) are
+    queued again.
+
+    On SQLite a job holding the write lock blocks these writes; progress
+    waits until the next poll, and nothing is lost.
+    """
+
+    def __init__(self, app, processes):
+        self.app = app
+        self.processes = processes
+        self.config = app.config
+        self.name = f'{socket.gethostname()}:{os.getpid()}'[:100]
+        self.context = multiprocessing.get_context('spawn')
+        self.updates = self.context.Queue()
+        self.running = {}    # future -> job id
+        self.progress = {}   # job id -> (done, total, message) not yet written
+        self.outcomes = {}   # job id -> run_job() result not yet written
+        self.next_recovery = 0
+        self.stopping = False
+        self.pool = None
+
+    def start_pool(self):
+        # Only the settings: everything else in the app config is derived from them
+        config = {key: self.config[key] for key in settings()}
+        return ProcessPoolExecutor(self.processes, mp_context=self.context,
+                                   initializer=init_pool_process, initargs=(config, self.updates))
+
+    def stop(self, signum, frame):
+        if self.stopping:
+            raise SystemExit(1)
+        self.stopping = True
+        click.echo("Stopping: waiting for running jobs to finish (signal again to requeue them and exit)")
+
+    def run(self, burst=False):
+        """Run jobs until stopped or, with ``burst``, until no job is due."""
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, self.stop)
+        self.pool = self.start_pool()
+        try:
+            while True:
+                self.collect()
+                self.drain_updates()
+                self.save()
+                claimed = 0 if self.stopping else self.claim(self.processes - len(self.running))
+                if not self.running and not self.outcomes and (self.stopping or (burst and not claimed)):
+                    break
+                if self.running:
+                    wait(list(self.running), timeout=self.config['JOBS_POLL_S'], return_when=FIRST_COMPLETED)
+                elif not claimed:
+                    time.sleep(self.config['JOBS_POLL_S'])
+        finally:
+            self.shutdown()
+
+    def claim(self, count):
+        if count <= 0:
+            return 0
+        now = utcnow()
+        try:
+            ids = db.session.scalars(
+                select(Job.id).where(Job.status == 'queued', Job.run_after <= now)
+                .order_by(Job.run_after, Job.id).limit(count)
+            ).all()
+            claimed = []
+            for job_id in ids:
+                result = db.session.execute(
+                    update(Job).where(Job.id == job_id, Job.status == 'queued')
+                    .values(status='running', attempts=Job.attempts + 1, worker=self.name,
+                            started_at=now, heartbeat_at=now)
+                    .execution_options(synchronize_session=False)
+                )
+                if result.rowcount:
+                    claimed.append(job_id)
+            db.session.commit()
+        except OperationalError:
+            db.session.rollback()
+            return 0
+        for job_id in claimed:
+            self.running[self.pool.submit(run_job, job_id)] = job_id
+            click.echo(f"job {job_id}: started")
+        return len(claimed)
+
+    def collect(self):
+        """Take the outcomes of finished jobs; replace the pool if a process died."""
+        broken = False
+        for future in [future for future in self.running if future.done()]:
+            job_id = self.running.pop(future)
+            try:
+                self.outcomes[job_id] = future.result()
+            except BrokenProcessPool:
+                broken = True
+                self.outcomes[job_id] = ('error', 'The worker process running the job exited', None, None)
+        if broken:
+            self.pool.shutdown(wait=False)
+            self.pool = self.start_pool()
+
+    def drain_updates(self):
+        while True:
+            try:
+                job_id, done, total, message = self.updates.get_nowait()
+            except queue.Empty:
+                return
+            self.progress[job_id] = (done, total, message)
+
+    def save(self):
+        """Write outcomes, progress and heartbeats in one transaction; on a lock, try again next time."""
+        now = utcnow()
+        running = list(self.running.values())
+        try:
+            finished = [(job_id, self.finish(job_id, outcome, now)) for job_id, outcome in self.outcomes.items()]
+            for job_id, (done, total, message) in self.progress.items():
+                if job_id in self.running.values():
+                    db.session.execute(
+                        update(Job).where(Job.id == job_id, Job.status == 'running')
+                        .values(progress_done=done, progress_total=total, message=message)
+                        .execution_options(synchronize_session=False))
+            if running:
+                db.session.execute(update(Job).where(Job.id.in_(running)).values(heartbeat_at=now)
+                                   .execution_options(synchronize_session=False))
+            recover = time.monotonic() >= self.next_recovery
+            if recover:
+                self.requeue_stale(now, running)
+            db.session.commit()
+        except OperationalError:
+            db.session.rollback()
+            return
+        for job_id, status in finished:
+            click.echo(f"job {job_id}: {status}")
+        self.outcomes.clear()
+        self.progress.clear()
+        if recover:
+            self.next_recovery = time.monotonic() + min(60, self.config['JOBS_STALE_S'] / 2)
+
+    def finish(self, job_id, outcome, now):
+        status, value, done, total = outcome
+        job = db.session.get(Job, job_id)
+        if job is None:
+            return status
+        if done is not None:
+            job.progress_done, job.progress_total = done, total
+        if status == 'succeeded':
+            job.result = json.dumps(value)
+            job.error = None
+        else:
+            job.error = value
+            if job.cancel_requested:
+                status = 'cancelled'
+            elif status == 'error' and job.attempts < job.max_attempts:
+                backoff = self.config['JOBS_RETRY_BACKOFF_S'] * 2 ** (job.attempts - 1)
+                job.status = 'queued'
+                job.run_after = now + timedelta(seconds=backoff)
+                job.worker = None
+                return f'retrying in {backoff:g}s ({value})'
+            elif status == 'error':
+                status = 'failed'
+        job.status = status
+        job.finished_at = now
+        return status if value is None or status == 'succeeded' else f'{status} ({value})'
+
+    def requeue_stale(self, now, running):
+        """Queue again the jobs of workers that stopped sending heartbeats."""
+        cutoff = now - timedelta(seconds=self.config['JOBS_STALE_S'])
+        stale = and_(Job.status == 'running', Job.heartbeat_at < cutoff, Job.id.notin_(running))
+        error = 'The worker running the job stopped responding'
+        for criterion, values in (
+            (Job.cancel_requested, {'status': 'cancelled', 'finished_at': now}),
+            (Job.attempts >= Job.max_attempts, {'status': 'failed', 'error': error, 'finished_at': now}),
+            (True, {'status': 'queued', 'error': error, 'run_after': now, 'worker': None}),
+        ):
+            db.session.execute(update(Job).where(stale, criterion).values(**values)
+                               .execution_options(synchronize_session=False))
+
+    def shutdown(self):
+        """Stop the pool; jobs still running go back to the queue without using up an attempt."""
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        running = list(self.running.values())
+        if self.pool is None:
+            return
+        if not running:
+            self.pool.shutdown()
+            return
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        for process in self.context.active_children():
+            process.terminate()
+        db.session.rollback()
+        db.session.execute(
+            update(Job).where(Job.id.in_(running), Job.status == 'running')
+            .values(status='queued', attempts=Job.attempts - 1, worker=None, run_after=utcnow())
+            .execution_options(synchronize_session=False))
+        db.session.commit()
+        click.echo(f"Requeued jobs {', '.join(map(str, running))}")
+
+
+# HTTP API
+
+def public(values):
+    """Params or result without server file paths."""
+    return {key: value for key, value in values.items() if key != 'path'}
+
+
+def job_payload(job):
+    def stamp(value):
+        return value.strftime(DATETIME_FORMAT) if value else None
+
+    result = json.loads(job.result) if job.result else None
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'params': public(json.loads(job.params)),
+        'status': job.status,
+        'progress': {'done': job.progress_done, 'total': job.progress_total},
+        'message': job.message,
+        'result': public(result) if isinstance(result, dict) else result,
+        'error': job.error,
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'cancel_requested': job.cancel_requested,
+        'created_at': stamp(job.created_at),
+        'started_at': stamp(job.started_at),
+        'finished_at': stamp(job.finished_at),
+    }
+
+
+def job_request():
+    """``(kind, params, upload)`` from a JSON body or, for uploads, multipart form fields."""
+    if request.files:
+        try:
+            params = json.loads(request.form.get('params') or '{}')
+        except json.JSONDecodeError:
+            raise ValueError("params must be a JSON object")
+        return request.form.get('kind'), params, request.files.get('file')
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        raise ValueError("Expected a JSON object with kind and params")
+    return data.get('kind'), data.get('params') or {}, None
+
+
+class Jobs(Resource):
+    """``POST /jobs`` queues a job and answers 202 with its status URL."""
+
+    def post(self):
+        try:
+            kind, params, upload = job_request()
+            if kind not in JOBS:
+                raise ValueError(f"Unknown job kind: {kind}. Expected one of: {', '.join(JOBS)}")
+            if not isinstance(params, dict):
+                raise ValueError("params must be a JSON object")
+            params = JOBS[kind].check(params)
+            if JOBS[kind].upload and upload is None:
+                raise ValueError(f"A {kind} job needs a multipart file upload")
+        except ValueError as e:
+            return make_response({'error': str(e)}, 400)
+
+        if JOBS[kind].upload:
+            params['path'] = os.path.join(output_dir('uploads'), f'{uuid.uuid4().hex}.csv')
+            upload.save(params['path'])
+        job = Job(kind=kind, params=json.dumps(params), max_attempts=current_app.config['JOBS_MAX_ATTEMPTS'])
+        db.session.add(job)
+        db.session.commit()
+        return make_response(job_payload(job), 202, {'Location': url_for('api.jobbyid', id=job.id)})
+
+
+class JobByID(Resource):
+    # A replica may not have the job yet, or show an older status
+    method_decorators = [on_primary]
+
+    def get(self, id):
+        job = db.session.get(Job, id)
+        if not job:
+            return make_response({'error': 'Job not found'}, 404)
+        return make_response(job_payload(job), 200)
+
+
+class JobCancel(Resource):
+    def post(self, id):
+        """Cancel a queued job at once; ask a running one to stop (202) at its next batch."""
+        job = db.session.get(Job, id)
+        if not job:
+            return make_response({'error': 'Job not found'}, 404)
+        cancelled = db.session.execute(
+            update(Job).where(Job.id == id, Job.status == 'queued')
+            .values(status='cancelled', finished_at=utcnow()).execution_options(synchronize_session=False))
+        if not cancelled.rowcount:
+            db.session.execute(
+                update(Job).where(Job.id == id, Job.status == 'running')
+                .values(cancel_requested=True).execution_options(synchronize_session=False))
+        db.session.commit()
+        db.session.refresh(job)
+        if job.status == 'running':
+            return make_response(job_payload(job), 202)
+        if job.status != 'cancelled':
+            return make_response({'error': f'Job already {job.status}'}, 409)
+        return make_response(job_payload(job), 200)
+
+
+class JobResult(Resource):
+    method_decorators = [on_primary]
+
+    def get(self, id):
+        """Download the file written by a finished export job."""
+        job = db.session.get(Job, id)
+        if not job:
+            return make_response({'error': 'Job not found'}, 404)
+        if job.kind != 'export':
+            return make_response({'error': f'{job.kind} jobs have no file to download'}, 404)
+        if job.status != 'succeeded':
+            return make_response({'error': f'Job is {job.status}'}, 409)
+        result = json.loads(job.result)
+        if not os.path.exists(result['path']):
+            return make_response({'error': 'Export file has been removed'}, 410)
+        return send_file(result['path'], as_attachment=True, download_name=result['filename'])
+
+
+jobs_cli = AppGroup('jobs', help='Background jobs.')
+
+
+@jobs_cli.command('work')
+@click.option('--processes', type=int, help='Jobs run at once, each in its own process [default: JOBS_PROCESSES].')
+@click.option('--burst', is_flag=True, help='Exit once no job is due instead of waiting for more.')
+def work_command(processes, burst):
+    """Run queued jobs on a pool of worker processes."""
+    worker = Worker(current_app._get_current_object(), processes or current_app.config['JOBS_PROCESSES'])
+    click.echo(f"Worker {worker.name} running up to {worker.processes} jobs at once")
+    worker.run(burst)
+
+
+@jobs_cli.command('prune')
+def prune_jobs_command():
+    """Delete jobs finished more than JOBS_RETENTION_DAYS ago, with their files."""
+    cutoff = utcnow() - timedelta(days=current_app.config['JOBS_RETENTION_DAYS'])
+    jobs = db.session.scalars(select(Job).where(Job.finished_at < cutoff)).all()
+    for job in jobs:
+        remove_file(json.loads(job.params).get('path'))
+        if job.result:
+            result = json.loads(job.result)
+            remove_file(result.get('path') if isinstance(result, dict) else None)
+    db.session.execute(delete(Job).where(Job.id.in_([job.id for job in jobs])))
+    db.session.commit()
+    click.echo(f"Deleted {len(jobs)} jobs")
@@ -0,0 +1,239 @@
+from urllib.parse import urlencode
+
+from flask import Response, current_app, request, make_response, stream_with_context
+from flask_restful import Resource
+from sqlalchemy import delete
+from cache import cache
+from conditional import make_etag, not_modified, page_version, page_version_query, set_validators
+from config import db
+from encoding import compact_dumps
+from instrumentation import timed
+from serializers import Expansion, serializer_for
+
+
+def parse_bool(value):
+    lowered = value.lower()
+    if lowered in ('1', 'true', 'yes'):
+        return True
+    if lowered in ('0', 'false', 'no'):
+        return False
+    raise ValueError(f"Invalid boolean value: {value}")
+
+
+def coerce_param(column, value):
+    """Convert a query-string value to the python type of ``column``."""
+    python_type = column.type.python_type
+    if python_type is bool:
+        return parse_bool(value)
+    if python_type is int:
+        try:
+            return int(value)
+        except ValueError:
+            raise ValueError(f"{column.key} must be an integer")
+    return value
+
+
+def page_size():
+    default = current_app.config['PAGE_SIZE_DEFAULT']
+    maximum = current_app.config['PAGE_SIZE_MAX']
+    raw = request.args.get('limit')
+    if raw is None:
+        return default
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+    return min(limit, maximum)
+
+
+def parse_cursor():
+    raw = request.args.get('cursor')
+    if raw is None or raw == '':
+        return None
+    try:
+        return int(raw)
+    except ValueError:
+        raise ValueError("cursor must be an integer")
+
+
+def wants_stream():
+    if 'stream' in request.args:
+        return parse_bool(request.args['stream'])
+    best = request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson'])
+    return best == 'application/x-ndjson'
+
+
+def parse_names(name):
+    raw = request.args.get(name, '')
+    return tuple(dict.fromkeys(key.strip() for key in raw.split(',') if key.strip()))
+
+
+def parse_fields():
+    fields = parse_names('fields')
+    return tuple(sorted(fields)) if fields else None
+
+
+def list_serializer(model):
+    """The serializer for ``?fields=`` and the ``Expansion`` list for ``?expand=``."""
+    fields = parse_fields()
+    expansions = [Expansion(model, key) for key in parse_names('expand')]
+    # Relationships the serializer already nests (Course.teacher) come with the page query
+    nested = {key for key, _ in serializer_for(model).nested}
+    if fields is not None:
+        fields = tuple(sorted(set(fields) | {e.key for e in expansions if e.key in nested}))
+    expansions = [e for e in expansions if e.key not in nested]
+    serializer = serializer_for(model, fields,
+                                required={e.local_key for e in expansions},
+                                allowed={e.key for e in expansions})
+    return serializer, expansions
+
+
+def serialize_rows(rows, serializer, expansions):
+    """Serialize ``rows`` and attach expanded relationships; returns ``(items, related)``.
+
+    ``related`` holds the fetched rows of each expansion, for validators.
+    """
+    related = []
+    for expansion in expansions:
+        stmt = expansion.select(rows, serializer)
+        related.append([] if stmt is None else db.session.execute(stmt).all())
+    with timed('serialize'):
+        items = [serializer.row(row) for row in rows]
+        for expansion, expanded in zip(expansions, related):
+            expansion.attach(rows, items, expanded, serializer)
+    return items, related
+
+
+def ndjson_chunks(stmt, serializer, batch_size, expansions=()):
+    """Yield NDJSON text one batch of rows at a time.
+
+    ``yield_per`` makes SQLAlchemy fetch through a server-side cursor where
+    the driver supports one, so only ``batch_size`` rows are held at once.
+    Expanded relationships are loaded once per batch.
+    """
+    result = db.session.execute(stmt.execution_options(yield_per=batch_size))
+    for rows in result.partitions():
+        items, _ = serialize_rows(rows, serializer, expansions)
+        yield ''.join(compact_dumps(item) + '\n' for item in items)
+
+
+def next_page_link(cursor):
+    args = request.args.copy()
+    args['cursor'] = str(cursor)
+    return f'<{request.base_url}?{urlencode(list(args.items(multi=True)))}>; rel="next"'
+
+
+class ListResource(Resource):
+    """Collection resource with keyset pagination on ``id``.
+
+    Subclasses set ``model`` and the column names accepted as equality
+    filters in ``filters``. Pages are fetched with ``WHERE id > :cursor
+    ORDER BY id LIMIT :limit`` so the cost of a request depends on the page
+    size rather than on the size of the table. The response body stays a
+    plain JSON array; the cursor for the next page is sent in the ``Link``
+    and ``X-Next-Cursor`` headers.
+
+    ``?stream=1`` or ``Accept: application/x-ndjson`` switches to an export
+    mode that ignores ``limit`` and streams every matching row (starting
+    after ``cursor``) as newline-delimited JSON.
+
+    Rows are selected as plain column tuples and turned into dicts by the
+    model's compiled serializer, so list requests never build ORM objects.
+    With ``cached = True`` pages go through the read-through cache, keyed
+    on the query string and invalidated when any table they read commits.
+
+    ``?expand=a,b`` embeds the named relationships of each row, loaded
+    with one query per relationship (see ``Expansion``). ``?fields=a,b``
+    limits the output to those columns, and the SELECT list with it.
+
+    Pages carry a strong ETag derived from the row count, the sum of ids
+    and the newest ``updated_at`` of each nested or expanded model; a
+    matching ``If-None-Match`` gets a bodyless 304 before the body is
+    encoded (and, without ``expand``, before any row is fetched).
+    """
+
+    model = None
+    filters = ()
+    cached = False
+
+    def filter_query(self, stmt):
+        columns = self.model.__table__.columns
+        for name in self.filters:
+            if name in request.args:
+                stmt = stmt.where(columns[name] == coerce_param(columns[name], request.args[name]))
+        return stmt
+
+    def delete_matching(self):
+        """Delete every row matching the request's filters with one ``DELETE`` statement.
+
+        At least one filter is required. Dependent rows go with them through
+        the ``ON DELETE CASCADE`` foreign keys, without being loaded.
+        """
+        if not any(name in request.args for name in self.filters):
+            return make_response({'error': f"At least one filter is required: {', '.join(self.filters)}"}, 400)
+        try:
+            stmt = self.filter_query(delete(self.model))
+        except ValueError as e:
+            return make_response({'error': str(e)}, 400)
+        result = db.session.execute(stmt.execution_options(synchronize_session=False))
+        db.session.commit()
+        return make_response({'deleted': result.rowcount}, 200)
+
+    def get(self):
+        try:
+            stream = wants_stream()
+            limit = page_size()
+            cursor = parse_cursor()
+            serializer, expansions = list_serializer(self.model)
+            stmt = self.filter_query(serializer.select())
+        except ValueError as e:
+            return make_response({'error': str(e)}, 400)
+
+        if cursor is not None:
+            stmt = stmt.where(self.model.id > cursor)
+        stmt = stmt.order_by(self.model.id)
+
+        if stream:
+            batch_size = current_app.config['STREAM_BATCH_SIZE']
+            return Response(stream_with_context(ndjson_chunks(stmt, serializer, batch_size, expansions)),
+                            mimetype='application/x-ndjson')
+
+        page = stmt.limit(limit + 1)
+
+        def load():
+            rows = db.session.execute(page).all()
+            version = [page_version(rows, serializer)]
+            next_cursor = None
+            if len(rows) > limit:
+                rows = rows[:limit]
+                next_cursor = rows[-1][serializer.pk_index]
+            body, related = serialize_rows(rows, serializer, expansions)
+            for expansion, expanded in zip(expansions, related):
+                version.append((expansion.key, page_version(expanded, expansion.serializer)))
+            return body, next_cursor, make_etag(self.model.__tablename__, serializer.fields, *version)
+
+        if self.cached:
+            key = f'{self.model.__tablename__}?{urlencode(sorted(request.args.items(multi=True)))}'
+            tables = serializer.tables.union(*(expansion.serializer.tables for expansion in expansions))
+            body, next_cursor, etag = cache.collection(tables, key, load)
+            unchanged = not_modified(etag)
+        elif expansions:
+            # The validator covers the related rows too, so it needs the full fetch
+            body, next_cursor, etag = load()
+            unchanged = not_modified(etag)
+        else:
+            # Check the validators with one aggregate query before fetching the page
+            etag = make_etag(self.model.__tablename__, serializer.fields, page_version_query(page, serializer))
+            unchanged = not_modified(etag)
+            if unchanged is None:
+                body, next_cursor, etag = load()
+        if unchanged is not None:
+            return unchanged
+
+        headers = {}
+        if next_cursor is not None:
+            headers['Link'] = next_page_link(next_cursor)
+            headers['X-Next-Cursor'] = str(next_cursor)
+        return set_validators(make_response(body, 200, headers), etag)
@@ -0,0 +1,24 @@
+"""Index students.grade_level for collection filters
+
+Revision ID: 0b3791e9197f
+Revises: 0f0659170b7f
+Create Date: 2026-10-17 09:12:40.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b3791e9197f'
+down_revision = '0f0659170b7f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(op.f('ix_students_grade_level'), 'students', ['grade_level'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_students_grade_level'), table_name='students')
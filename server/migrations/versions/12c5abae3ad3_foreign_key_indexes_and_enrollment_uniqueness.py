@@ -0,0 +1,53 @@
+"""Foreign key indexes and unique enrollments
+
+Revision ID: 12c5abae3ad3
+Revises: 0b3791e9197f
+Create Date: 2026-10-17 10:03:15.502871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '12c5abae3ad3'
+down_revision = '0b3791e9197f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Checked before any DDL: SQLite cannot roll the indexes back if the constraint fails.
+    # Duplicates are reported, not deleted, since the downgrade could not restore them
+    duplicates = op.get_bind().execute(sa.text(
+        'SELECT student_id, course_id, semester, COUNT(*) FROM enrollments '
+        'GROUP BY student_id, course_id, semester HAVING COUNT(*) > 1 '
+        'ORDER BY student_id, course_id, semester'
+    )).all()
+    if duplicates:
+        listed = '\n'.join(f'  student_id={student_id} course_id={course_id} semester={semester!r}: {count} rows'
+                           for student_id, course_id, semester, count in duplicates)
+        raise RuntimeError(
+            f'Duplicate enrollments; remove the extra rows and upgrade again:\n{listed}'
+        )
+
+    op.create_index(op.f('ix_courses_teacher_id'), 'courses', ['teacher_id'], unique=False)
+    op.create_index(op.f('ix_enrollments_course_id'), 'enrollments', ['course_id'], unique=False)
+    op.create_index(op.f('ix_assignments_course_id'), 'assignments', ['course_id'], unique=False)
+    op.create_index(op.f('ix_assignment_submissions_student_id'), 'assignment_submissions', ['student_id'], unique=False)
+    op.create_index(op.f('ix_assignment_submissions_assignment_id'), 'assignment_submissions', ['assignment_id'], unique=False)
+
+    # The constraint's index also serves lookups on enrollments.student_id
+    with op.batch_alter_table('enrollments', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_enrollments_student_id_course_id_semester', ['student_id', 'course_id', 'semester'])
+
+
+def downgrade():
+    with op.batch_alter_table('enrollments', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_enrollments_student_id_course_id_semester', type_='unique')
+
+    op.drop_index(op.f('ix_assignment_submissions_assignment_id'), table_name='assignment_submissions')
+    op.drop_index(op.f('ix_assignment_submissions_student_id'), table_name='assignment_submissions')
+    op.drop_index(op.f('ix_assignments_course_id'), table_name='assignments')
+    op.drop_index(op.f('ix_enrollments_course_id'), table_name='enrollments')
+    op.drop_index(op.f('ix_courses_teacher_id'), table_name='courses')
@@ -0,0 +1,55 @@
+"""commit-ordered change log for the change feed, replacing tombstones
+
+Revision ID: 4a41fde7b4a9
+Revises: 7c88cbd00ce9
+Create Date: 2026-10-17 07:24:44.201291
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4a41fde7b4a9'
+down_revision = '7c88cbd00ce9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    change_clock = op.create_table('change_clock',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('value', sa.Integer(), nullable=False),
+    sa.Column('pruned_through', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.bulk_insert(change_clock, [{'id': 1, 'value': 0, 'pruned_through': 0}])
+    op.create_table('change_log',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('seq', sa.Integer(), nullable=True),
+    sa.Column('entity', sa.String(length=50), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('op', sa.String(length=10), nullable=False),
+    sa.Column('changed_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_change_log_changed_at'), 'change_log', ['changed_at'], unique=False)
+    op.create_index('ix_change_log_seq_id', 'change_log', ['seq', 'id'], unique=False)
+    # Tokens of the old feed are answered with 410, so clients sync again from scratch
+    op.drop_index(op.f('ix_tombstones_deleted_at'), table_name='tombstones')
+    op.drop_table('tombstones')
+
+
+def downgrade():
+    op.create_table('tombstones',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('entity', sa.String(length=50), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_tombstones_deleted_at'), 'tombstones', ['deleted_at'], unique=False)
+    op.drop_index('ix_change_log_seq_id', table_name='change_log')
+    op.drop_index(op.f('ix_change_log_changed_at'), table_name='change_log')
+    op.drop_table('change_log')
+    op.drop_table('change_clock')
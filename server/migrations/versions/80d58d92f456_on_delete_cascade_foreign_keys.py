@@ -0,0 +1,62 @@
+"""ON DELETE CASCADE on child foreign keys
+
+Revision ID: 80d58d92f456
+Revises: 89e02c0b192d
+Create Date: 2026-10-17 06:30:53.394204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '80d58d92f456'
+down_revision = '89e02c0b192d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Deleting a teacher, course, assignment or student removes its dependent rows
+    # in the database, instead of the ORM loading and deleting them one by one
+    with op.batch_alter_table('assignment_submissions', schema=None) as batch_op:
+        batch_op.drop_constraint(batch_op.f('fk_assignment_submissions_assignment_id_assignments'), type_='foreignkey')
+        batch_op.drop_constraint(batch_op.f('fk_assignment_submissions_student_id_students'), type_='foreignkey')
+        batch_op.create_foreign_key(batch_op.f('fk_assignment_submissions_student_id_students'), 'students', ['student_id'], ['id'], ondelete='CASCADE')
+        batch_op.create_foreign_key(batch_op.f('fk_assignment_submissions_assignment_id_assignments'), 'assignments', ['assignment_id'], ['id'], ondelete='CASCADE')
+
+    with op.batch_alter_table('assignments', schema=None) as batch_op:
+        batch_op.drop_constraint(batch_op.f('fk_assignments_course_id_courses'), type_='foreignkey')
+        batch_op.create_foreign_key(batch_op.f('fk_assignments_course_id_courses'), 'courses', ['course_id'], ['id'], ondelete='CASCADE')
+
+    with op.batch_alter_table('courses', schema=None) as batch_op:
+        batch_op.drop_constraint(batch_op.f('fk_courses_teacher_id_teachers'), type_='foreignkey')
+        batch_op.create_foreign_key(batch_op.f('fk_courses_teacher_id_teachers'), 'teachers', ['teacher_id'], ['id'], ondelete='CASCADE')
+
+    with op.batch_alter_table('enrollments', schema=None) as batch_op:
+        batch_op.drop_constraint(batch_op.f('fk_enrollments_student_id_students'), type_='foreignkey')
+        batch_op.drop_constraint(batch_op.f('fk_enrollments_course_id_courses'), type_='foreignkey')
+        batch_op.create_foreign_key(batch_op.f('fk_enrollments_course_id_courses'), 'courses', ['course_id'], ['id'], ondelete='CASCADE')
+        batch_op.create_foreign_key(batch_op.f('fk_enrollments_student_id_students'), 'students', ['student_id'], ['id'], ondelete='CASCADE')
+
+
+def downgrade():
+    with op.batch_alter_table('enrollments', schema=None) as batch_op:
+        batch_op.drop_constraint(batch_op.f('fk_enrollments_student_id_students'), type_='foreignkey')
+        batch_op.drop_constraint(batch_op.f('fk_enrollments_course_id_courses'), type_='foreignkey')
+        batch_op.create_foreign_key(batch_op.f('fk_enrollments_course_id_courses'), 'courses', ['course_id'], ['id'])
+        batch_op.create_foreign_key(batch_op.f('fk_enrollments_student_id_students'), 'students', ['student_id'], ['id'])
+
+    with op.batch_alter_table('courses', schema=None) as batch_op:
+        batch_op.drop_constraint(batch_op.f('fk_courses_teacher_id_teachers'), type_='foreignkey')
+        batch_op.create_foreign_key(batch_op.f('fk_courses_teacher_id_teachers'), 'teachers', ['teacher_id'], ['id'])
+
+    with op.batch_alter_table('assignments', schema=None) as batch_op:
+        batch_op.drop_constraint(batch_op.f('fk_assignments_course_id_courses'), type_='foreignkey')
+        batch_op.create_foreign_key(batch_op.f('fk_assignments_course_id_courses'), 'courses', ['course_id'], ['id'])
+
+    with op.batch_alter_table('assignment_submissions', schema=None) as batch_op:
+        batch_op.drop_constraint(batch_op.f('fk_assignment_submissions_assignment_id_assignments'), type_='foreignkey')
+        batch_op.drop_constraint(batch_op.f('fk_assignment_submissions_student_id_students'), type_='foreignkey')
+        batch_op.create_foreign_key(batch_op.f('fk_assignment_submissions_student_id_students'), 'students', ['student_id'], ['id'])
+        batch_op.create_foreign_key(batch_op.f('fk_assignment_submissions_assignment_id_assignments'), 'assignments', ['assignment_id'], ['id'])
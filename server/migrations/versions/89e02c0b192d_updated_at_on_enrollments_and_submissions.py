@@ -0,0 +1,38 @@
+"""updated_at on enrollments and submissions
+
+Revision ID: 89e02c0b192d
+Revises: d6d9b21fbe5b
+Create Date: 2026-10-17 06:14:17.876713
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '89e02c0b192d'
+down_revision = 'd6d9b21fbe5b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('assignment_submissions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+    with op.batch_alter_table('enrollments', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+    # Rows that were never updated get their creation time, so max(updated_at) covers every row
+    op.execute('UPDATE assignment_submissions SET updated_at = submission_date WHERE updated_at IS NULL')
+    op.execute('UPDATE enrollments SET updated_at = enrollment_date WHERE updated_at IS NULL')
+    for table in ('students', 'teachers', 'courses', 'assignments'):
+        op.execute(f'UPDATE {table} SET updated_at = created_at WHERE updated_at IS NULL')
+
+
+def downgrade():
+    with op.batch_alter_table('enrollments', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
+
+    with op.batch_alter_table('assignment_submissions', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
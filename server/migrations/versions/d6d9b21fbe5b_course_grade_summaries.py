@@ -0,0 +1,49 @@
+"""Course grade summaries
+
+Revision ID: d6d9b21fbe5b
+Revises: 12c5abae3ad3
+Create Date: 2026-10-17 11:26:48.730411
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd6d9b21fbe5b'
+down_revision = '12c5abae3ad3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('course_grade_summaries',
+    sa.Column('student_id', sa.Integer(), nullable=False),
+    sa.Column('course_id', sa.Integer(), nullable=False),
+    sa.Column('points_earned', sa.Integer(), nullable=False),
+    sa.Column('points_possible', sa.Integer(), nullable=False),
+    sa.Column('graded_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['course_id'], ['courses.id'], name=op.f('fk_course_grade_summaries_course_id_courses'), ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['student_id'], ['students.id'], name=op.f('fk_course_grade_summaries_student_id_students'), ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('student_id', 'course_id')
+    )
+    op.create_index(op.f('ix_course_grade_summaries_course_id'), 'course_grade_summaries', ['course_id'], unique=False)
+
+    # Backfill with each student's best attempt per assignment, summed per course
+    op.execute(
+        'INSERT INTO course_grade_summaries '
+        '(student_id, course_id, points_earned, points_possible, graded_count) '
+        'SELECT best.student_id, assignments.course_id, '
+        'COALESCE(SUM(best.points_earned), 0), '
+        'COALESCE(SUM(CASE WHEN best.points_earned IS NOT NULL THEN assignments.max_points END), 0), '
+        'COUNT(best.points_earned) '
+        'FROM (SELECT student_id, assignment_id, MAX(points_earned) AS points_earned '
+        'FROM assignment_submissions GROUP BY student_id, assignment_id) AS best '
+        'JOIN assignments ON assignments.id = best.assignment_id '
+        'GROUP BY best.student_id, assignments.course_id'
+    )
+
+
+def downgrade():
+    op.drop_index(op.f('ix_course_grade_summaries_course_id'), table_name='course_grade_summaries')
+    op.drop_table('course_grade_summaries')
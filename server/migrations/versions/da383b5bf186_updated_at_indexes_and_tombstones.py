@@ -0,0 +1,39 @@
+"""updated_at indexes and tombstones for the change feed
+
+Revision ID: da383b5bf186
+Revises: 80d58d92f456
+Create Date: 2026-10-17 06:34:21.436733
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'da383b5bf186'
+down_revision = '80d58d92f456'
+branch_labels = None
+depends_on = None
+
+
+TABLES = ('teachers', 'students', 'courses', 'assignments', 'enrollments', 'assignment_submissions')
+
+
+def upgrade():
+    op.create_table('tombstones',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('entity', sa.String(length=50), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_tombstones_deleted_at'), 'tombstones', ['deleted_at'], unique=False)
+    for table in TABLES:
+        op.create_index(op.f(f'ix_{table}_updated_at'), table, ['updated_at'], unique=False)
+
+
+def downgrade():
+    for table in TABLES:
+        op.drop_index(op.f(f'ix_{table}_updated_at'), table_name=table)
+    op.drop_index(op.f('ix_tombstones_deleted_at'), table_name='tombstones')
+    op.drop_table('tombstones')
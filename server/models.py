@@ -1,47 +1,102 @@
 from sqlalchemy_serializer import SerializerMixin
+from sqlalchemy import DDL, case, delete, event, func, insert, inspect, select, tuple_
 from sqlalchemy.ext.associationproxy import association_proxy
-from sqlalchemy.orm import validates, object_session
+from sqlalchemy.orm import Session, validates, object_session
+from sqlalchemy.sql import Select
 import re
+from datetime import datetime, timezone
 
 from config import db
 
 
+def utcnow():
+    """Microsecond-resolution timestamps, so every write changes ``updated_at`` (see conditional.py)."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+# Validation rules, shared by the @validates methods and the CSV roster import
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+COURSE_CODE_PATTERN = re.compile(r'^[A-Z]{3,4}\d{3,4}$')
+DEPARTMENTS = ('Math', 'Science', 'English', 'History', 'Art', 'Music', 'Physical Education')
+SEMESTERS = ('Fall', 'Spring', 'Summer')
+_DEPARTMENT_SET = frozenset(DEPARTMENTS)
+_SEMESTER_SET = frozenset(SEMESTERS)
+
+
+def check_name(name, label='Name'):
+    if not name or len(name.strip()) < 2:
+        raise ValueError(f"{label} must be at least 2 characters long")
+    return name.strip()
+
+
+def check_email(email):
+    if not EMAIL_PATTERN.match(email):
+        raise ValueError("Invalid email format")
+    return email
+
+
+def check_grade_level(grade_level):
+    if not isinstance(grade_level, int) or grade_level < 1 or grade_level > 12:
+        raise ValueError("Grade level must be between 1 and 12")
+    return grade_level
+
+
+def check_department(department):
+    if not isinstance(department, str) or department not in _DEPARTMENT_SET:
+        raise ValueError(f"Department must be one of: {', '.join(DEPARTMENTS)}")
+    return department
+
+
+def check_course_code(course_code):
+    # Convert to uppercase first, then validate
+    course_code_upper = course_code.upper()
+    if not COURSE_CODE_PATTERN.match(course_code_upper):
+        raise ValueError("Course code must be 3-4 letters followed by 3-4 numbers (e.g., MATH101)")
+    return course_code_upper
+
+
+def check_credits(credits):
+    if not isinstance(credits, int) or credits < 1 or credits > 5:
+        raise ValueError("Credits must be between 1 and 5")
+    return credits
+
+
+def check_semester(semester):
+    if not isinstance(semester, str) or semester not in _SEMESTER_SET:
+        raise ValueError(f"Semester must be one of: {', '.join(SEMESTERS)}")
+    return semester
+
+
 class Student(db.Model, SerializerMixin):
     __tablename__ = 'students'
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(100), unique=True, nullable=False)
-    grade_level = db.Column(db.Integer, nullable=False)
+    grade_level = db.Column(db.Integer, nullable=False, index=True)
     created_at = db.Column(db.DateTime, server_default=db.func.now())
-    updated_at = db.Column(db.DateTime, onupdate=db.func.now())
+    updated_at = db.Column(db.DateTime, default=utcnow, onupdate=utcnow, index=True)
     
     # One-to-many relationship: Student has many Enrollments
-    enrollments = db.relationship('Enrollment', back_populates='student', cascade='all, delete-orphan')
+    enrollments = db.relationship('Enrollment', back_populates='student', cascade='all, delete-orphan', passive_deletes=True)
     
     # One-to-many relationship: Student has many AssignmentSubmissions
-    assignment_submissions = db.relationship('AssignmentSubmission', back_populates='student', cascade='all, delete-orphan')
+    assignment_submissions = db.relationship('AssignmentSubmission', back_populates='student', cascade='all, delete-orphan', passive_deletes=True)
     
     # SIMPLIFIED serialization rules
     serialize_rules = ('-enrollments', '-assignment_submissions')
     
     @validates('name')
     def validate_name(self, key, name):
-        if not name or len(name.strip()) < 2:
-            raise ValueError("Name must be at least 2 characters long")
-        return name.strip()
+        return check_name(name)
     
     @validates('email')
     def validate_email(self, key, email):
-        if not re.match(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', email):
-            raise ValueError("Invalid email format")
-        return email
+        return check_email(email)
     
     @validates('grade_level')
     def validate_grade_level(self, key, grade_level):
-        if not isinstance(grade_level, int) or grade_level < 1 or grade_level > 12:
-            raise ValueError("Grade level must be between 1 and 12")
-        return grade_level
+        return check_grade_level(grade_level)
 
 
 class Teacher(db.Model, SerializerMixin):
@@ -52,31 +107,24 @@ class Teacher(db.Model, SerializerMixin):
     email = db.Column(db.String(100), unique=True, nullable=False)
     department = db.Column(db.String(50), nullable=False)
     created_at = db.Column(db.DateTime, server_default=db.func.now())
-    updated_at = db.Column(db.DateTime, onupdate=db.func.now())
+    updated_at = db.Column(db.DateTime, default=utcnow, onupdate=utcnow, index=True)
     
     # One-to-many relationship: Teacher has many Courses
-    courses = db.relationship('Course', back_populates='teacher', cascade='all, delete-orphan')
+    courses = db.relationship('Course', back_populates='teacher', cascade='all, delete-orphan', passive_deletes=True)
     
     serialize_rules = ('-courses',)
     
     @validates('name')
     def validate_name(self, key, name):
-        if not name or len(name.strip()) < 2:
-            raise ValueError("Name must be at least 2 characters long")
-        return name.strip()
+        return check_name(name)
     
     @validates('email')
     def validate_email(self, key, email):
-        if not re.match(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', email):
-            raise ValueError("Invalid email format")
-        return email
+        return check_email(email)
     
     @validates('department')
     def validate_department(self, key, department):
-        valid_departments = ['Math', 'Science', 'English', 'History', 'Art', 'Music', 'Physical Education']
-        if department not in valid_departments:
-            raise ValueError(f"Department must be one of: {', '.join(valid_departments)}")
-        return department
+        return check_department(department)
 
 
 class Course(db.Model, SerializerMixin):
@@ -87,38 +135,30 @@ class Course(db.Model, SerializerMixin):
     course_code = db.Column(db.String(20), unique=True, nullable=False)
     credits = db.Column(db.Integer, nullable=False)
     created_at = db.Column(db.DateTime, server_default=db.func.now())
-    updated_at = db.Column(db.DateTime, onupdate=db.func.now())
+    updated_at = db.Column(db.DateTime, default=utcnow, onupdate=utcnow, index=True)
     
     # Foreign key for one-to-many relationship with Teacher
-    teacher_id = db.Column(db.Integer, db.ForeignKey('teachers.id'), nullable=False)
+    teacher_id = db.Column(db.Integer, db.ForeignKey('teachers.id', ondelete='CASCADE'), nullable=False, index=True)
     
     # Relationships
     teacher = db.relationship('Teacher', back_populates='courses')
-    enrollments = db.relationship('Enrollment', back_populates='course', cascade='all, delete-orphan')
-    assignments = db.relationship('Assignment', back_populates='course', cascade='all, delete-orphan')
+    enrollments = db.relationship('Enrollment', back_populates='course', cascade='all, delete-orphan', passive_deletes=True)
+    assignments = db.relationship('Assignment', back_populates='course', cascade='all, delete-orphan', passive_deletes=True)
     
     # SIMPLIFIED serialization rules
     serialize_rules = ('-enrollments', '-assignments')
     
     @validates('name')
     def validate_name(self, key, name):
-        if not name or len(name.strip()) < 2:
-            raise ValueError("Course name must be at least 2 characters long")
-        return name.strip()
+        return check_name(name, 'Course name')
     
     @validates('course_code')
     def validate_course_code(self, key, course_code):
-        # Convert to uppercase first, then validate
-        course_code_upper = course_code.upper()
-        if not re.match(r'^[A-Z]{3,4}\d{3,4}$', course_code_upper):
-            raise ValueError("Course code must be 3-4 letters followed by 3-4 numbers (e.g., MATH101)")
-        return course_code_upper
+        return check_course_code(course_code)
     
     @validates('credits')
     def validate_credits(self, key, credits):
-        if not isinstance(credits, int) or credits < 1 or credits > 5:
-            raise ValueError("Credits must be between 1 and 5")
-        return credits
+        return check_credits(credits)
 
 
 class Enrollment(db.Model, SerializerMixin):
@@ -127,10 +167,11 @@ class Enrollment(db.Model, SerializerMixin):
     id = db.Column(db.Integer, primary_key=True)
     enrollment_date = db.Column(db.DateTime, server_default=db.func.now())
     semester = db.Column(db.String(20), nullable=False)  # User-submittable attribute
+    updated_at = db.Column(db.DateTime, default=utcnow, onupdate=utcnow, index=True)
     
-    # Foreign keys
-    student_id = db.Column(db.Integer, db.ForeignKey('students.id'), nullable=False)
-    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False)
+    # Foreign keys (student_id lookups use the unique constraint's index)
+    student_id = db.Column(db.Integer, db.ForeignKey('students.id', ondelete='CASCADE'), nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id', ondelete='CASCADE'), nullable=False, index=True)
     
     # Relationships
     student = db.relationship('Student', back_populates='enrollments')
@@ -138,12 +179,13 @@ class Enrollment(db.Model, SerializerMixin):
     
     serialize_rules = ('-student', '-course')
     
+    __table_args__ = (
+        db.UniqueConstraint('student_id', 'course_id', 'semester', name='uq_enrollments_student_id_course_id_semester'),
+    )
+    
     @validates('semester')
     def validate_semester(self, key, semester):
-        valid_semesters = ['Fall', 'Spring', 'Summer']
-        if semester not in valid_semesters:
-            raise ValueError(f"Semester must be one of: {', '.join(valid_semesters)}")
-        return semester
+        return check_semester(semester)
 
 
 class Assignment(db.Model, SerializerMixin):
@@ -155,22 +197,20 @@ class Assignment(db.Model, SerializerMixin):
     due_date = db.Column(db.DateTime, nullable=False)
     max_points = db.Column(db.Integer, nullable=False)
     created_at = db.Column(db.DateTime, server_default=db.func.now())
-    updated_at = db.Column(db.DateTime, onupdate=db.func.now())
+    updated_at = db.Column(db.DateTime, default=utcnow, onupdate=utcnow, index=True)
     
     # Foreign key
-    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id', ondelete='CASCADE'), nullable=False, index=True)
     
     # Relationships
     course = db.relationship('Course', back_populates='assignments')
-    submissions = db.relationship('AssignmentSubmission', back_populates='assignment', cascade='all, delete-orphan')
+    submissions = db.relationship('AssignmentSubmission', back_populates='assignment', cascade='all, delete-orphan', passive_deletes=True)
     
     serialize_rules = ('-submissions',)
     
     @validates('title')
     def validate_title(self, key, title):
-        if not title or len(title.strip()) < 2:
-            raise ValueError("Assignment title must be at least 2 characters long")
-        return title.strip()
+        return check_name(title, 'Assignment title')
     
     @validates('max_points')
     def validate_max_points(self, key, max_points):
@@ -179,6 +219,16 @@ class Assignment(db.Model, SerializerMixin):
         return max_points
 
 
+def check_points_earned(points_earned, max_points=None):
+    """Shared by the validator and the batch grading path, which preloads ``max_points``."""
+    if points_earned is not None:
+        if not isinstance(points_earned, int) or points_earned < 0:
+            raise ValueError("Points earned must be a non-negative integer")
+        if max_points is not None and points_earned > max_points:
+            raise ValueError("Points earned cannot exceed assignment max points")
+    return points_earned
+
+
 class AssignmentSubmission(db.Model, SerializerMixin):
     __tablename__ = 'assignment_submissions'
     
@@ -187,30 +237,267 @@ class AssignmentSubmission(db.Model, SerializerMixin):
     content = db.Column(db.Text)
     points_earned = db.Column(db.Integer)  # User-submittable attribute
     submitted = db.Column(db.Boolean, default=False)
+    updated_at = db.Column(db.DateTime, default=utcnow, onupdate=utcnow, index=True)
     
     # Foreign keys
-    student_id = db.Column(db.Integer, db.ForeignKey('students.id'), nullable=False)
-    assignment_id = db.Column(db.Integer, db.ForeignKey('assignments.id'), nullable=False)
+    student_id = db.Column(db.Integer, db.ForeignKey('students.id', ondelete='CASCADE'), nullable=False, index=True)
+    assignment_id = db.Column(db.Integer, db.ForeignKey('assignments.id', ondelete='CASCADE'), nullable=False, index=True)
     
     # Relationships
     student = db.relationship('Student', back_populates='assignment_submissions')
     assignment = db.relationship('Assignment', back_populates='submissions')
     
     serialize_rules = ('-student', '-assignment')
+
+    # Set only while the constructor runs, see __init__
+    known_max_points = None
+
+    def __init__(self, max_points=None, **kwargs):
+        """``max_points``: the assignment's, when the caller already has it (bulk creates preload it per chunk)."""
+        self.known_max_points = max_points
+        try:
+            super().__init__(**kwargs)
+        finally:
+            del self.known_max_points
     
     @validates('points_earned')
     def validate_points_earned(self, key, points_earned):
-        if points_earned is not None:
-            if not isinstance(points_earned, int) or points_earned < 0:
-                raise ValueError("Points earned must be a non-negative integer")
-            
-            # Only check if assignment is loaded
-            if self.assignment and points_earned > self.assignment.max_points:
-                raise ValueError("Points earned cannot exceed assignment max points")
-        return points_earned
+        max_points = self.assignment_max_points() if points_earned is not None else None
+        return check_points_earned(points_earned, max_points)
+
+    def assignment_max_points(self):
+        """The assignment's ``max_points``: as given to the constructor, from the loaded relationship, or else one query.
+
+        Never lazy-loads the whole assignment, and also works on a new
+        submission that only has ``assignment_id`` set.
+        """
+        if self.known_max_points is not None:
+            return self.known_max_points
+        assignment = inspect(self).dict.get('assignment')
+        if assignment is not None:
+            return assignment.max_points
+        if self.assignment_id is None:
+            return None
+        session = object_session(self) or db.session
+        with session.no_autoflush:
+            return session.scalar(select(Assignment.max_points).where(Assignment.id == self.assignment_id))
     
     @validates('content')
     def validate_content(self, key, content):
         if content and len(content.strip()) > 10000:
             raise ValueError("Submission content must be less than 10000 characters")
-        return content
\ No newline at end of file
+        return content
+
+
+class ChangeLogEntry(db.Model):
+    """One row upserted or deleted by a committed transaction, for the ``/changes`` feed (see changes.py)."""
+    __tablename__ = 'change_log'
+    __table_args__ = (db.Index('ix_change_log_seq_id', 'seq', 'id'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    # The transaction's ChangeClock value, set as it commits; NULL until then
+    seq = db.Column(db.Integer)
+    entity = db.Column(db.String(50), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    op = db.Column(db.String(10), nullable=False)
+    changed_at = db.Column(db.DateTime, nullable=False, default=utcnow, index=True)
+
+
+class ChangeClock(db.Model):
+    """Single row: the last ``change_log`` sequence number given to a commit.
+
+    Each committing transaction increments it last thing before COMMIT. The
+    row lock is held until the commit ends, so sequence numbers follow
+    commit order. ``pruned_through`` is the newest sequence number
+    ``flask changes prune`` has deleted.
+    """
+    __tablename__ = 'change_clock'
+
+    id = db.Column(db.Integer, primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+    pruned_through = db.Column(db.Integer, nullable=False, default=0)
+
+
+event.listen(ChangeClock.__table__, 'after_create',
+             DDL('INSERT INTO change_clock (id, value, pruned_through) VALUES (1, 0, 0)'))
+
+
+class Job(db.Model):
+    """A background job: queued by ``POST /jobs``, run by ``flask jobs work`` (see jobs.py)."""
+    __tablename__ = 'jobs'
+    __table_args__ = (db.Index('ix_jobs_status_run_after', 'status', 'run_after'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    params = db.Column(db.Text, nullable=False, default='{}')
+    # queued, running, succeeded, failed or cancelled
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    run_after = db.Column(db.DateTime, nullable=False, default=utcnow)
+    cancel_requested = db.Column(db.Boolean, nullable=False, default=False)
+    progress_done = db.Column(db.Integer, nullable=False, default=0)
+    progress_total = db.Column(db.Integer)
+    message = db.Column(db.String(255))
+    result = db.Column(db.Text)
+    error = db.Column(db.Text)
+    worker = db.Column(db.String(100))
+    heartbeat_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime, index=True)
+
+
+class CourseGradeSummary(db.Model):
+    """Denormalized per-(student, course) grade totals.
+
+    Maintained by the session events below in the same transaction as the
+    submission or assignment change, so transcripts read one row per course
+    instead of aggregating submissions. ``flask grades rebuild-summaries``
+    recomputes it from scratch.
+    """
+    __tablename__ = 'course_grade_summaries'
+
+    student_id = db.Column(db.Integer, db.ForeignKey('students.id', ondelete='CASCADE'), primary_key=True)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id', ondelete='CASCADE'), primary_key=True, index=True)
+    points_earned = db.Column(db.Integer, nullable=False, default=0)
+    points_possible = db.Column(db.Integer, nullable=False, default=0)
+    graded_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+# Grade summary maintenance
+
+def grade_summary_select(student_ids=None):
+    """Grouped totals per (student, course), counting each student's best attempt per assignment."""
+    best = select(
+        AssignmentSubmission.student_id,
+        AssignmentSubmission.assignment_id,
+        func.max(AssignmentSubmission.points_earned).label('points_earned'),
+    )
+    if student_ids is not None:
+        best = best.where(AssignmentSubmission.student_id.in_(student_ids))
+    best = best.group_by(AssignmentSubmission.student_id, AssignmentSubmission.assignment_id).subquery()
+
+    return (
+        select(
+            best.c.student_id,
+            Assignment.course_id,
+            func.coalesce(func.sum(best.c.points_earned), 0).label('points_earned'),
+            func.coalesce(func.sum(case((best.c.points_earned.isnot(None), Assignment.max_points))), 0).label('points_possible'),
+            func.count(best.c.points_earned).label('graded_count'),
+        )
+        .join(Assignment, Assignment.id == best.c.assignment_id)
+        .group_by(best.c.student_id, Assignment.course_id)
+    )
+
+
+def refresh_grade_summaries(connection, pairs):
+    """Recompute the summary rows for the given (student_id, course_id) pairs.
+
+    ``pairs`` is a collection of pairs or a SELECT of them. Either way this
+    is one DELETE and one INSERT ... SELECT: the totals are grouped in the
+    database and restricted to the pairs, however many there are.
+    """
+    if not isinstance(pairs, Select):
+        pairs = list(pairs)
+        if not pairs:
+            return
+        student_ids = {student_id for student_id, _ in pairs}
+    else:
+        student_ids = select(pairs.subquery().c.student_id)
+    table = CourseGradeSummary.__table__
+    connection.execute(delete(table).where(tuple_(table.c.student_id, table.c.course_id).in_(pairs)))
+    totals = grade_summary_select(student_ids)
+    totals = totals.where(tuple_(totals.selected_columns.student_id, Assignment.course_id).in_(pairs))
+    connection.execute(insert(table).from_select(
+        ['student_id', 'course_id', 'points_earned', 'points_possible', 'graded_count'], totals))
+
+
+def summary_pairs_select(submission_ids):
+    """SELECT of the (student_id, course_id) pairs of the given submissions."""
+    return (
+        select(AssignmentSubmission.student_id, Assignment.course_id)
+        .join(Assignment, Assignment.id == AssignmentSubmission.assignment_id)
+        .where(AssignmentSubmission.id.in_(submission_ids))
+        .distinct()
+    )
+
+
+def summary_pairs_for_submissions(connection, keys):
+    """Map (student_id, assignment_id) keys to (student_id, course_id) pairs."""
+    keys = {(student_id, assignment_id) for student_id, assignment_id in keys if student_id and assignment_id}
+    if not keys:
+        return set()
+    courses = dict(connection.execute(
+        select(Assignment.id, Assignment.course_id).where(Assignment.id.in_({a for _, a in keys}))
+    ).all())
+    return {(student_id, courses[assignment_id]) for student_id, assignment_id in keys if assignment_id in courses}
+
+
+def summary_pairs_for_assignments(connection, assignment_ids):
+    """(student_id, course_id) pairs of every student with a submission for the given assignments."""
+    if not assignment_ids:
+        return set()
+    return set(connection.execute(
+        select(AssignmentSubmission.student_id, Assignment.course_id)
+        .join(Assignment, Assignment.id == AssignmentSubmission.assignment_id)
+        .where(AssignmentSubmission.assignment_id.in_(assignment_ids))
+        .distinct()
+    ).all())
+
+
+def _changed(obj, *keys):
+    state = inspect(obj)
+    return any(state.attrs[key].history.has_changes() for key in keys)
+
+
+@event.listens_for(Session, 'before_flush')
+def track_grade_summary_changes(session, flush_context, instances):
+    # Old keys are read from the database before the flush writes over them;
+    # new keys are resolved after it, once pending rows have ids.
+    submissions = [obj for obj in session.dirty
+                   if isinstance(obj, AssignmentSubmission) and _changed(obj, 'points_earned', 'student_id', 'assignment_id')]
+    assignments = [obj for obj in session.dirty
+                   if isinstance(obj, Assignment) and _changed(obj, 'max_points', 'course_id')]
+    pending = session.info.setdefault('grade_summary_pending', [])
+    pending.extend(obj for obj in session.new if isinstance(obj, AssignmentSubmission))
+    pending.extend(submissions)
+    session.info.setdefault('grade_summary_assignments', set()).update(obj.id for obj in assignments)
+
+    deleted = {type(obj): set() for obj in session.deleted}
+    for obj in session.deleted:
+        deleted[type(obj)].add(inspect(obj).identity[0])
+    submission_ids = {inspect(obj).identity[0] for obj in submissions} | deleted.get(AssignmentSubmission, set())
+    assignment_ids = {obj.id for obj in assignments} | deleted.get(Assignment, set())
+    # Summary rows of deleted students and courses go with them (ON DELETE CASCADE)
+    if not (submission_ids or assignment_ids):
+        return
+
+    connection = session.connection()
+    pairs = session.info.setdefault('grade_summary_pairs', set())
+    if submission_ids:
+        keys = connection.execute(
+            select(AssignmentSubmission.student_id, AssignmentSubmission.assignment_id)
+            .where(AssignmentSubmission.id.in_(submission_ids))
+        ).all()
+        pairs |= summary_pairs_for_submissions(connection, keys)
+    pairs |= summary_pairs_for_assignments(connection, assignment_ids)
+
+
+@event.listens_for(Session, 'after_flush')
+def apply_grade_summary_changes(session, flush_context):
+    pending = session.info.pop('grade_summary_pending', [])
+    assignment_ids = session.info.pop('grade_summary_assignments', set())
+    pairs = session.info.pop('grade_summary_pairs', set())
+    if not (pending or assignment_ids or pairs):
+        return
+    connection = session.connection()
+    pairs |= summary_pairs_for_submissions(connection, {(obj.student_id, obj.assignment_id) for obj in pending})
+    pairs |= summary_pairs_for_assignments(connection, assignment_ids)
+    refresh_grade_summaries(connection, pairs)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def discard_grade_summary_changes(session, previous_transaction):
+    for key in ('grade_summary_pending', 'grade_summary_assignments', 'grade_summary_pairs'):
+        session.info.pop(key, None)
@@ -0,0 +1,175 @@
+import functools
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy.exc import DBAPIError, OperationalError
+
+READ_METHODS = ('GET', 'HEAD')
+
+
+class ReplicaSet:
+    """Read replicas, taken in turn, skipping any that recently failed.
+
+    A replica that cannot be connected to, or whose statement fails with
+    a disconnect or ``OperationalError``, is left out for
+    ``retry_after`` seconds and then tried again.
+    """
+
+    def __init__(self):
+        self.keys = ()
+        self.retry_after = 30.0
+        self.down_until = {}
+        self.reads = {}
+        self.failures = {}
+        self.turn = itertools.count()
+        self.lock = threading.Lock()
+
+    def configure(self, keys, retry_after):
+        self.keys = tuple(keys)
+        self.retry_after = retry_after
+        self.down_until = {}
+        self.reads = dict.fromkeys(self.keys, 0)
+        self.failures = dict.fromkeys(self.keys, 0)
+
+    @property
+    def enabled(self):
+        return bool(self.keys)
+
+    def candidates(self):
+        """Healthy replica keys, starting with the next one in round-robin order."""
+        start = next(self.turn) % len(self.keys)
+        now = time.monotonic()
+        for key in self.keys[start:] + self.keys[:start]:
+            if self.down_until.get(key, 0) <= now:
+                yield key
+
+    def mark_down(self, key):
+        now = time.monotonic()
+        with self.lock:
+            if self.down_until.get(key, 0) <= now:
+                self.failures[key] += 1
+            self.down_until[key] = now + self.retry_after
+
+    def record_read(self, key):
+        with self.lock:
+            self.reads[key] += 1
+
+    def stats(self):
+        if not self.enabled:
+            return {'enabled': False}
+        now = time.monotonic()
+        return {
+            'enabled': True,
+            'replicas': [
+                {'bind': key, 'healthy': self.down_until.get(key, 0) <= now,
+                 'reads': self.reads[key], 'failures': self.failures[key]}
+                for key in self.keys
+            ],
+        }
+
+
+replicas = ReplicaSet()
+
+
+def reads_from_replica():
+    return (replicas.enabled and has_request_context() and request.method in READ_METHODS
+            and not g.get('db_primary', False) and not g.get('db_wrote', False))
+
+
+@contextmanager
+def primary_reads():
+    """Send the block's reads to the primary, even in a GET."""
+    if not has_request_context():
+        yield
+        return
+    previous = g.get('db_primary', False)
+    g.db_primary = True
+    try:
+        yield
+    finally:
+        g.db_primary = previous
+
+
+def on_primary(method):
+    """Resource method decorator: read from the primary (``method_decorators = [on_primary]``)."""
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        with primary_reads():
+            return method(*args, **kwargs)
+    return wrapper
+
+
+def replica_failed(key, context):
+    """``handle_error`` listener on a replica engine."""
+    if context.is_disconnect or isinstance(context.sqlalchemy_exception, OperationalError):
+        replicas.mark_down(key)
+
+
+class RoutingSession(Session):
+    """Session that reads from a replica in GET and HEAD requests.
+
+    One replica serves a whole request, so its reads are consistent with
+    each other. A flush or an INSERT/UPDATE/DELETE goes to the primary and
+    pins the rest of the request there, so a request reads its own
+    writes. Outside requests (CLI, seeding) everything uses the primary.
+
+    A replica that fails while running a statement is marked down and the
+    statement is run again on the primary, which then serves the rest of
+    the request.
+    """
+
+    def execute(self, *args, **kwargs):
+        return self.failing_over(super().execute, *args, **kwargs)
+
+    def scalar(self, *args, **kwargs):
+        return self.failing_over(super().scalar, *args, **kwargs)
+
+    def scalars(self, *args, **kwargs):
+        return self.failing_over(super().scalars, *args, **kwargs)
+
+    def failing_over(self, method, *args, **kwargs):
+        try:
+            return method(*args, **kwargs)
+        except DBAPIError as e:
+            key = g.get('db_replica') if has_request_context() else None
+            if key is None or not (isinstance(e, OperationalError) or e.connection_invalidated):
+                raise
+            replicas.mark_down(key)
+            # Only reads have run (a write pins the request to the primary), so nothing is lost
+            self.rollback()
+            g.db_replica = None
+            g.db_primary = True
+            return method(*args, **kwargs)
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context():
+            if self._flushing or getattr(clause, 'is_dml', False):
+                g.db_wrote = True
+            elif reads_from_replica():
+                engine = self.replica_engine()
+                if engine is not None:
+                    return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def replica_engine(self):
+        """This request's replica engine, or ``None`` when no replica is reachable."""
+        engines = self._db.engines
+        key = g.get('db_replica')
+        if key is not None:
+            return engines[key]
+        for key in replicas.candidates():
+            engine = engines[key]
+            try:
+                # Check out the connection now, so an unreachable replica fails over here
+                self.connection(bind_arguments={'bind': engine})
+            except DBAPIError:
+                replicas.mark_down(key)
+                continue
+            g.db_replica = key
+            replicas.record_read(key)
+            return engine
+        return None
@@ -1,21 +1,40 @@
 #!/usr/bin/env python3
 
 # Standard library imports
-from random import randint, choice as rc
+import argparse
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from random import Random, randint, choice as rc
 from datetime import datetime, timedelta
 
 # Remote library imports
-from faker import Faker
+from sqlalchemy import insert, text
 
 # Local imports
-from config import app, db
-from models import Student, Teacher, Course, Enrollment, Assignment, AssignmentSubmission
+from app import create_app
+from changes import change_log_paused
+from config import db
+from models import (Student, Teacher, Course, Enrollment, Assignment, AssignmentSubmission,
+                    CourseGradeSummary, check_points_earned)
+from grades import rebuild_grade_summaries
+
+_fake = None
+
+
+def fake():
+    """Faker for the demo data, imported on first use (it is slow to load)."""
+    global _fake
+    if _fake is None:
+        from faker import Faker
+        _fake = Faker()
+    return _fake
 
-fake = Faker()
 
 def clear_data():
     print("Clearing existing data...")
     # Clear in correct order to avoid foreign key constraints
+    CourseGradeSummary.query.delete()
     AssignmentSubmission.query.delete()
     Assignment.query.delete()
     Enrollment.query.delete()
@@ -29,8 +48,8 @@ def create_students(n=10):
     students = []
     for _ in range(n):
         student = Student(
-            name=fake.name(),
-            email=fake.unique.email(),
+            name=fake().name(),
+            email=fake().unique.email(),
             grade_level=randint(9, 12)
         )
         students.append(student)
@@ -44,8 +63,8 @@ def create_teachers():
     teachers = []
     for _ in range(8):
         teacher = Teacher(
-            name=fake.name(),
-            email=fake.unique.email(),
+            name=fake().name(),
+            email=fake().unique.email(),
             department=rc(departments)
         )
         teachers.append(teacher)
@@ -111,7 +130,7 @@ def create_assignments(courses):
         for i in range(3):
             assignment = Assignment(
                 title=f"{course.name} Assignment {i+1}",
-                description=fake.paragraph(),
+                description=fake().paragraph(),
                 due_date=datetime.now() + timedelta(days=randint(7, 30)),  # FIXED: Variable due dates
                 max_points=rc([100, 50, 75, 25]),
                 course_id=course.id
@@ -135,24 +154,227 @@ def create_assignment_submissions(students, assignments):
                 submission = AssignmentSubmission(
                     assignment_id=assignment.id,
                     student_id=student.id,
-                    content=fake.paragraph() if randint(0, 1) else None,
+                    content=fake().paragraph() if randint(0, 1) else None,
                     points_earned=randint(0, assignment.max_points) if randint(0, 1) else None,
                     submitted=rc([True, False])
                 )
                 db.session.add(submission)
     db.session.commit()
 
+# Synthetic datasets for load testing
+
+DEPARTMENTS = ['Math', 'Science', 'English', 'History', 'Art', 'Music', 'Physical Education']
+COURSE_PREFIXES = ['MATH', 'SCIE', 'ENGL', 'HIST', 'ARTS', 'MUSC', 'PHED', 'CHEM', 'BIOL', 'PHYS']
+SEMESTERS = ['Fall', 'Spring', 'Summer']
+BASE_DATE = datetime(2026, 1, 5)
+
+# Set per worker process by init_generator()
+_names = None
+_courses = None
+
+
+def init_generator(names, courses):
+    global _names, _courses
+    _names = names
+    _courses = courses
+
+
+def name_pool(seed, size=500):
+    """Deterministic first/last name pools; Faker is far too slow to call per row."""
+    from faker import Faker
+    faker = Faker()
+    faker.seed_instance(seed)
+    return [faker.first_name() for _ in range(size)], [faker.last_name() for _ in range(size)]
+
+
+def validator(model, key):
+    """The model's own @validates function for ``key``, callable on plain values."""
+    fn = model.__mapper__.validators[key][0]
+    blank = model()
+    return lambda value: fn(blank, key, value)
+
+
+def validated(rows, validators):
+    for row in rows:
+        for key, validate in validators.items():
+            row[key] = validate(row[key])
+    return rows
+
+
+def generate_chunk(args):
+    """Students [first_id, last_id) with their enrollments and submissions.
+
+    Each chunk has its own RNG derived from (seed, chunk index), so the
+    dataset is identical however many worker processes produce it.
+    """
+    seed, index, first_id, last_id, courses_per_student, submission_rate = args
+    rng = Random(seed * 1_000_003 + index)
+    first_names, last_names = _names
+    course_ids = list(_courses)
+
+    students, enrollments, submissions = [], [], []
+    enrollment_id = (first_id - 1) * courses_per_student + 1
+    for student_id in range(first_id, last_id):
+        first, last = rng.choice(first_names), rng.choice(last_names)
+        local = re.sub('[^a-z.]', '', f"{first}.{last}".lower())
+        students.append({
+            'id': student_id,
+            'name': f"{first} {last}",
+            'email': f"{local}.{student_id}@example.org",
+            'grade_level': rng.randint(9, 12),
+        })
+        for course_id in rng.sample(course_ids, min(courses_per_student, len(course_ids))):
+            enrollments.append({
+                'id': enrollment_id,
+                'student_id': student_id,
+                'course_id': course_id,
+                'semester': rng.choice(SEMESTERS),
+            })
+            enrollment_id += 1
+            for assignment_id, max_points in _courses[course_id]:
+                if rng.random() >= submission_rate:
+                    continue
+                graded = rng.random() < 0.8
+                points = rng.randint(max_points // 2, max_points) if graded else None
+                submissions.append({
+                    'student_id': student_id,
+                    'assignment_id': assignment_id,
+                    'content': None,
+                    'points_earned': check_points_earned(points, max_points),
+                    'submitted': True,
+                })
+
+    validated(students, {key: validator(Student, key) for key in ('name', 'email', 'grade_level')})
+    validated(enrollments, {'semester': validator(Enrollment, 'semester')})
+    return students, enrollments, submissions
+
+
+def reset_sequences():
+    if db.engine.dialect.name != 'postgresql':
+        return
+    for table in ('students', 'teachers', 'courses', 'enrollments', 'assignments', 'assignment_submissions'):
+        db.session.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)"
+        ))
+
+
+def seed_synthetic(students, teachers, courses, assignments_per_course, courses_per_student,
+                   submission_rate, seed, chunk_size, workers):
+    # The change feed would log every seeded row; clients resync from the tables instead
+    with change_log_paused(db.session):
+        insert_synthetic(students, teachers, courses, assignments_per_course, courses_per_student,
+                         submission_rate, seed, chunk_size, workers)
+
+
+def insert_synthetic(students, teachers, courses, assignments_per_course, courses_per_student,
+                     submission_rate, seed, chunk_size, workers):
+    rng = Random(seed)
+    names = name_pool(seed)
+    first_names, last_names = names
+    started = time.perf_counter()
+
+    teacher_rows = validated([
+        {'id': i, 'name': f"{rng.choice(first_names)} {rng.choice(last_names)}",
+         'email': f"teacher.{i}@example.org", 'department': rng.choice(DEPARTMENTS)}
+        for i in range(1, teachers + 1)
+    ], {key: validator(Teacher, key) for key in ('name', 'email', 'department')})
+    course_rows = validated([
+        {'id': i, 'name': f"{COURSE_PREFIXES[i % len(COURSE_PREFIXES)].title()} {i}",
+         'course_code': f"{COURSE_PREFIXES[i % len(COURSE_PREFIXES)]}{100 + i // len(COURSE_PREFIXES)}",
+         'credits': rng.randint(1, 5), 'teacher_id': rng.randint(1, teachers)}
+        for i in range(1, courses + 1)
+    ], {key: validator(Course, key) for key in ('name', 'course_code', 'credits')})
+    assignment_rows = validated([
+        {'id': (course_id - 1) * assignments_per_course + n + 1, 'title': f"Assignment {n + 1}",
+         'description': None, 'due_date': BASE_DATE + timedelta(days=rng.randint(0, 120)),
+         'max_points': rng.choice([25, 50, 75, 100]), 'course_id': course_id}
+        for course_id in range(1, courses + 1) for n in range(assignments_per_course)
+    ], {key: validator(Assignment, key) for key in ('title', 'max_points')})
+
+    db.session.execute(insert(Teacher.__table__), teacher_rows)
+    db.session.execute(insert(Course.__table__), course_rows)
+    db.session.execute(insert(Assignment.__table__), assignment_rows)
+    db.session.commit()
+
+    course_assignments = {course_id: [] for course_id in range(1, courses + 1)}
+    for row in assignment_rows:
+        course_assignments[row['course_id']].append((row['id'], row['max_points']))
+    init_generator(names, course_assignments)
+
+    tasks = [
+        (seed, index, first, min(first + chunk_size, students + 1), courses_per_student, submission_rate)
+        for index, first in enumerate(range(1, students + 1, chunk_size))
+    ]
+    totals = [0, 0, 0]
+    pool = ProcessPoolExecutor(workers, initializer=init_generator, initargs=(names, course_assignments)) if workers > 1 else None
+    chunks = pool.map(generate_chunk, tasks) if pool else map(generate_chunk, tasks)
+    try:
+        for student_rows, enrollment_rows, submission_rows in chunks:
+            db.session.execute(insert(Student.__table__), student_rows)
+            db.session.execute(insert(Enrollment.__table__), enrollment_rows)
+            if submission_rows:
+                db.session.execute(insert(AssignmentSubmission.__table__), submission_rows)
+            db.session.commit()
+            totals[0] += len(student_rows)
+            totals[1] += len(enrollment_rows)
+            totals[2] += len(submission_rows)
+            print(f"  {totals[0]}/{students} students, {totals[1]} enrollments, {totals[2]} submissions")
+    finally:
+        if pool:
+            pool.shutdown()
+
+    reset_sequences()
+    db.session.commit()
+    print("Rebuilding grade summaries...")
+    rebuild_grade_summaries()
+    print(f"Seeded {teachers} teachers, {courses} courses, {len(assignment_rows)} assignments, "
+          f"{totals[0]} students, {totals[1]} enrollments, {totals[2]} submissions "
+          f"in {time.perf_counter() - started:.1f}s")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Seed the database. Without --students, creates a small demo dataset.')
+    parser.add_argument('--students', type=int, help='generate a synthetic dataset with this many students')
+    parser.add_argument('--courses', type=int, help='default: students / 100, at least 8')
+    parser.add_argument('--teachers', type=int, help='default: courses / 4, at least 1')
+    parser.add_argument('--assignments-per-course', type=int, default=10)
+    parser.add_argument('--courses-per-student', type=int, default=6)
+    parser.add_argument('--submission-rate', type=float, default=0.8)
+    parser.add_argument('--seed', type=int, default=42, help='RNG seed; the same seed gives the same dataset')
+    parser.add_argument('--chunk-size', type=int, default=1000, help='students generated and inserted per batch')
+    parser.add_argument('--workers', type=int, default=1, help='processes generating chunks in parallel')
+    return parser.parse_args()
+
+
 if __name__ == '__main__':
-    with app.app_context():
-        print("Starting database seeding...")
-        clear_data()
-
-        teachers = create_teachers()
-        students = create_students()
-        courses = create_courses(teachers)
-        create_enrollments(students, courses)
-        assignments = create_assignments(courses)
-        create_assignment_submissions(students, assignments)
-        
-        print("Database seeded successfully!")
-        print(f"Created: {len(teachers)} teachers, {len(students)} students, {len(courses)} courses")
\ No newline at end of file
+    args = parse_args()
+    with create_app().app_context():
+        if args.students:
+            courses = args.courses or max(8, args.students // 100)
+            print(f"Seeding synthetic dataset (seed {args.seed})...")
+            with change_log_paused(db.session):
+                clear_data()
+            seed_synthetic(
+                students=args.students,
+                teachers=args.teachers or max(1, courses // 4),
+                courses=courses,
+                assignments_per_course=args.assignments_per_course,
+                courses_per_student=args.courses_per_student,
+                submission_rate=args.submission_rate,
+                seed=args.seed,
+                chunk_size=args.chunk_size,
+                workers=args.workers,
+            )
+        else:
+            print("Starting database seeding...")
+            clear_data()
+
+            teachers = create_teachers()
+            students = create_students()
+            courses = create_courses(teachers)
+            create_enrollments(students, courses)
+            assignments = create_assignments(courses)
+            create_assignment_submissions(students, assignments)
+
+            print("Database seeded successfully!")
+            print(f"Created: {len(teachers)} teachers, {len(students)} students, {len(courses)} courses")
\ No newline at end of file
@@ -0,0 +1,39 @@
+from datetime import datetime
+
+import pytest
+
+from app import create_app
+from config import db
+from models import Assignment
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}", 'METRICS_ENABLED': False})
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def school(client):
+    """Two teachers with a course each; three students enrolled and graded in the first course."""
+    for n in (1, 2):
+        client.post('/teachers', json={'name': f'Teacher {n}', 'email': f't{n}@example.org', 'department': 'Math'})
+        client.post('/courses', json={'name': f'Course {n}', 'course_code': f'SCI10{n}', 'credits': 3, 'teacher_id': n})
+    db.session.add(Assignment(title='Homework', due_date=datetime(2026, 1, 1), max_points=100, course_id=1))
+    db.session.commit()
+    for n in (1, 2, 3):
+        client.post('/students', json={'name': f'Student {n}', 'email': f's{n}@example.org', 'grade_level': 10})
+        client.post('/enrollments', json={'student_id': n, 'course_id': 1, 'semester': 'Fall'})
+        response = client.post('/assignment_submissions', json={'assignment_id': 1, 'student_id': n,
+                                                                 'points_earned': 50 + n, 'submitted': True})
+        assert response.status_code == 201, response.get_json()
@@ -0,0 +1,53 @@
+import app as app_module
+from app import create_app
+from config import db, dispose_engines
+from models import Student
+
+
+def make_app(path, **config):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}', 'METRICS_ENABLED': False, **config})
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def test_apps_are_isolated(tmp_path):
+    first = make_app(tmp_path / 'first.db', PAGE_SIZE_DEFAULT=1)
+    second = make_app(tmp_path / 'second.db')
+    first.test_client().post('/students', json={'name': 'First One', 'email': 'one@example.org', 'grade_level': 9})
+    first.test_client().post('/students', json={'name': 'First Two', 'email': 'two@example.org', 'grade_level': 9})
+    second.test_client().post('/students', json={'name': 'Second', 'email': 'one@example.org', 'grade_level': 10})
+
+    # Each app reads its own database, with its own settings
+    assert [s['name'] for s in first.test_client().get('/students').get_json()] == ['First One']
+    assert [s['name'] for s in second.test_client().get('/students').get_json()] == ['Second']
+    assert first.config['PAGE_SIZE_DEFAULT'] == 1
+    assert second.config['PAGE_SIZE_DEFAULT'] == 100
+    with first.app_context():
+        assert db.session.get(Student, 1).name == 'First One'
+        assert str(db.engine.url).endswith('first.db')
+    with second.app_context():
+        assert db.session.get(Student, 1).name == 'Second'
+
+
+def test_settings_come_from_the_environment(tmp_path, monkeypatch):
+    monkeypatch.setenv('PAGE_SIZE_DEFAULT', '7')
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'env.db'}")
+    app = create_app({'METRICS_ENABLED': False})
+    assert app.config['PAGE_SIZE_DEFAULT'] == 7
+    assert app.config['SQLALCHEMY_DATABASE_URI'] == f"sqlite:///{tmp_path / 'env.db'}"
+    # config overrides the environment
+    assert make_app(tmp_path / 'other.db', PAGE_SIZE_DEFAULT=3).config['PAGE_SIZE_DEFAULT'] == 3
+
+
+def test_no_app_at_import():
+    # Building the app (and its engine) is left to create_app(), so gunicorn --preload controls it
+    assert not hasattr(app_module, 'app')
+
+
+def test_dispose_engines_keeps_the_app_working(tmp_path):
+    app = make_app(tmp_path / 'forked.db')
+    client = app.test_client()
+    client.post('/students', json={'name': 'Before Fork', 'email': 'fork@example.org', 'grade_level': 9})
+    dispose_engines(app)
+    assert [s['name'] for s in client.get('/students').get_json()] == ['Before Fork']
@@ -0,0 +1,52 @@
+from sqlalchemy import delete
+
+from cache import ALL_ROWS, Cache, NodeBackend, cascaded_tables
+from config import db
+from models import Student, Teacher
+
+
+def test_cascaded_tables():
+    assert cascaded_tables(Teacher.__table__) == {
+        'courses', 'enrollments', 'assignments', 'assignment_submissions', 'course_grade_summaries'}
+    assert cascaded_tables(Student.__table__) == {'enrollments', 'assignment_submissions', 'course_grade_summaries'}
+
+
+def test_bulk_delete_records_cascaded_tables(client, school):
+    cascaded_tables.cache_clear()
+    db.session.execute(delete(Student).where(Student.id == 1))
+    changes = db.session.info['cache_changes']
+    assert changes['students'] is ALL_ROWS
+    assert changes['enrollments'] is ALL_ROWS
+    assert changes['assignment_submissions'] is ALL_ROWS
+    db.session.commit()
+
+    # The bulk delete must not leave a wrong cascade cached for later single-row deletes
+    db.session.delete(db.session.get(Student, 2))
+    db.session.flush()
+    assert db.session.info['cache_changes']['enrollments'] is ALL_ROWS
+    db.session.commit()
+
+
+def test_node_backend_shares_versions_between_workers(tmp_path):
+    workers = []
+    for _ in range(2):
+        worker = Cache()
+        worker.configure(NodeBackend(str(tmp_path / 'versions.db')), 300)
+        workers.append(worker)
+    first, second = workers
+    loads = []
+
+    def load():
+        loads.append(1)
+        return {'name': f'Student (version {len(loads)})'}
+
+    assert first.row('students', 1, load) == {'name': 'Student (version 1)'}
+    assert first.row('students', 1, load) == {'name': 'Student (version 1)'}
+    second.invalidate({'students': {1}})
+    assert first.row('students', 1, load) == {'name': 'Student (version 2)'}
+    second.invalidate({'students': ALL_ROWS})
+    assert first.row('students', 1, load) == {'name': 'Student (version 3)'}
+    assert first.collection({'students'}, 'page', load) == {'name': 'Student (version 4)'}
+    second.invalidate({'students': {2}})
+    assert first.row('students', 1, load) == {'name': 'Student (version 3)'}
+    assert first.collection({'students'}, 'page', load) == {'name': 'Student (version 5)'}
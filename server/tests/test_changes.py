@@ -0,0 +1,104 @@
+import base64
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+
+from changes import make_token
+from config import db
+from models import ChangeLogEntry, Student, utcnow
+
+
+def sync(client, since=None, limit=None):
+    """Follow the feed until ``more`` is false; return the changes and the next token."""
+    changes = []
+    while True:
+        query = {'since': since} if since else {}
+        if limit:
+            query['limit'] = limit
+        response = client.get('/changes', query_string=query)
+        assert response.status_code == 200, response.get_json()
+        body = response.get_json()
+        changes.extend(body['changes'])
+        since = body['next']
+        if not body['more']:
+            return changes, since
+
+
+def keys(changes, op=None):
+    return {(change['entity'], change['id']) for change in changes if op is None or change['op'] == op}
+
+
+def test_full_sync_pages(client, school):
+    everything, _ = sync(client)
+    paged, _ = sync(client, limit=2)
+    assert len(everything) == 2 + 2 + 1 + 3 + 3 + 3
+    assert [(change['entity'], change['id']) for change in paged] == [
+        (change['entity'], change['id']) for change in everything]
+
+
+def test_incremental_sync(client, school):
+    _, token = sync(client)
+    assert sync(client, token)[0] == []
+
+    client.post('/students', json={'name': 'New Student', 'email': 'new@example.org', 'grade_level': 9})
+    db.session.execute(update(Student).where(Student.id == 2).values(grade_level=12))
+    db.session.commit()
+    changes, token = sync(client, token, limit=1)
+    assert keys(changes) == {('students', 2), ('students', 4)}
+    assert [change['data']['grade_level'] for change in changes if change['id'] == 2] == [12]
+    assert sync(client, token)[0] == []
+
+
+def test_rows_stamped_before_a_slow_commit_are_not_skipped(client, school):
+    _, token = sync(client)
+    with Session(db.engine) as slow:
+        # Stamped an hour before it commits, after a transaction that started later
+        slow.add(Student(name='Slow Student', email='slow@example.org', grade_level=9,
+                         updated_at=utcnow() - timedelta(hours=1)))
+        client.post('/students', json={'name': 'Fast Student', 'email': 'fast@example.org', 'grade_level': 9})
+        _, later_token = sync(client, token)
+        slow.commit()
+
+    assert keys(sync(client, token)[0]) == {('students', 4), ('students', 5)}
+    assert keys(sync(client, later_token)[0]) == {('students', 5)}
+
+
+def test_bulk_delete_tombstones_cascaded_rows(app, client, school):
+    _, token = sync(client)
+
+    db.session.execute(delete(Student).where(Student.id == 1))
+    db.session.commit()
+
+    changes, _ = sync(client, token)
+    assert keys(changes, 'delete') == {('students', 1), ('enrollments', 1), ('assignment_submissions', 1)}
+    assert keys(changes, 'upsert') == set()
+
+
+def test_expired_tokens(app, client, school):
+    _, token = sync(client)
+    client.post('/students', json={'name': 'New Student', 'email': 'new@example.org', 'grade_level': 9})
+    db.session.execute(update(ChangeLogEntry).values(changed_at=datetime(2020, 1, 1)))
+    db.session.commit()
+    result = app.test_cli_runner().invoke(args=['changes', 'prune'])
+    assert db.session.scalar(select(func.count()).select_from(ChangeLogEntry)) == 0, result.output
+
+    assert client.get('/changes', query_string={'since': token}).status_code == 410
+    legacy = base64.urlsafe_b64encode(b'2026-10-17T06:34:40.123456').decode().rstrip('=')
+    assert client.get('/changes', query_string={'since': legacy}).status_code == 410
+    assert client.get('/changes', query_string={'since': make_token('x')}).status_code == 400
+    assert keys(sync(client)[0], 'upsert') >= {('students', 4)}
+
+
+def test_synthetic_seed_is_not_logged_and_expires_tokens(client):
+    from seed import seed_synthetic
+    _, token = sync(client)
+    seed_synthetic(students=20, teachers=2, courses=4, assignments_per_course=2, courses_per_student=2,
+                   submission_rate=0.5, seed=1, chunk_size=10, workers=1)
+
+    assert db.session.scalar(select(func.count()).select_from(ChangeLogEntry)) == 0
+    assert client.get('/changes', query_string={'since': token}).status_code == 410
+    changes, token = sync(client)
+    assert len(keys(changes, 'upsert') & {('students', id) for id in range(1, 21)}) == 20
+    client.patch('/students/1', json={'grade_level': 12})
+    assert keys(sync(client, token)[0]) == {('students', 1)}
@@ -0,0 +1,66 @@
+from datetime import timedelta
+
+from config import db
+from models import Teacher
+from tests.test_grades import count_statements
+
+
+def test_list_etag(client, school):
+    response = client.get('/students')
+    etag = response.headers['ETag']
+    assert response.headers['Cache-Control'] == 'no-cache'
+
+    with count_statements() as statements:
+        response = client.get('/students', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+    # Checked with one aggregate query, without fetching the page
+    assert len(statements) == 1
+
+    client.patch('/students/2', json={'grade_level': 11})
+    response = client.get('/students', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_list_etag_covers_nested_rows(client, school):
+    etag = client.get('/courses').headers['ETag']
+    assert client.get('/courses', headers={'If-None-Match': etag}).status_code == 304
+
+    # Course.teacher is nested in each course, so editing a teacher changes the courses' ETag
+    db.session.get(Teacher, 1).department = 'Science'
+    db.session.commit()
+    assert client.get('/courses', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_encoded_representations_match(client, school):
+    etag, _ = client.get('/students').get_etag()
+    for tag in (f'W/"{etag}-gzip"', f'"{etag}-msgpack-gzip"', f'"other", "{etag}"', '*'):
+        assert client.get('/students', headers={'If-None-Match': tag}).status_code == 304, tag
+
+
+def test_row_last_modified(client, school):
+    response = client.get('/students/1')
+    etag, last_modified = response.headers['ETag'], response.last_modified
+    stamp = response.headers['Last-Modified']
+
+    response = client.get('/students/1', headers={'If-Modified-Since': stamp})
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+    earlier = (last_modified - timedelta(seconds=1)).strftime('%a, %d %b %Y %H:%M:%S GMT')
+    assert client.get('/students/1', headers={'If-Modified-Since': earlier}).status_code == 200
+    # If-None-Match wins over If-Modified-Since
+    response = client.get('/students/1', headers={'If-None-Match': '"stale"', 'If-Modified-Since': stamp})
+    assert response.status_code == 200
+    assert client.get('/students/1', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_content_hash_etag(client, school):
+    response = client.get('/courses/1/gradebook')
+    etag = response.headers['ETag']
+    assert client.get('/courses/1/gradebook', headers={'If-None-Match': etag}).status_code == 304
+
+    client.patch('/students/1', json={'name': 'Renamed Student'})
+    assert client.get('/courses/1/gradebook', headers={'If-None-Match': etag}).status_code == 200
+    assert 'ETag' not in client.get('/students?stream=1').headers
@@ -0,0 +1,89 @@
+import gzip
+import json
+
+import pytest
+
+from app import create_app
+from config import db
+from models import Student
+
+
+@pytest.fixture
+def app_with(app):
+    """Another app over the same database, with ``config`` on top of the test app's."""
+    def make(**config):
+        return create_app({'SQLALCHEMY_DATABASE_URI': app.config['SQLALCHEMY_DATABASE_URI'],
+                           'METRICS_ENABLED': False, **config})
+    return make
+
+
+def add_students(count):
+    db.session.execute(db.insert(Student), [{'name': f'Student {n}', 'email': f'enc{n}@example.org',
+                                             'grade_level': 10} for n in range(count)])
+    db.session.commit()
+
+
+def test_compact_json(client, school):
+    response = client.get('/students/1')
+    assert response.mimetype == 'application/json'
+    assert response.data.decode().rstrip('\n') == json.dumps(response.get_json(), separators=(',', ':'),
+                                                              sort_keys=True)
+
+
+def test_encoders_give_the_same_output(app_with, client, school):
+    pytest.importorskip('orjson')
+    for path in ('/students', '/courses?expand=enrollments', '/courses/1/gradebook'):
+        with app_with(JSON_ENCODER='json').test_client() as stdlib:
+            assert stdlib.get(path).data == client.get(path).data, path
+
+
+def test_gzip_negotiation(client):
+    add_students(50)
+    plain = client.get('/students')
+    assert 'Content-Encoding' not in plain.headers
+    assert 'Accept-Encoding' in plain.vary
+
+    response = client.get('/students', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.data) == plain.data
+    assert response.get_etag() == (plain.get_etag()[0] + '-gzip', False)
+    assert client.get('/students', headers={'Accept-Encoding': 'gzip',
+                                            'If-None-Match': response.headers['ETag']}).status_code == 304
+
+    # Below COMPRESS_MIN_SIZE bytes the body is sent as it is
+    response = client.get('/students?limit=1', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert client.get('/students', headers={'Accept-Encoding': 'gzip;q=0'}).data == plain.data
+
+
+def test_gzip_stream(client):
+    add_students(50)
+    plain = client.get('/students?stream=1')
+    response = client.get('/students?stream=1', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+    assert gzip.decompress(response.data) == plain.data
+
+
+def test_msgpack_negotiation(client, school):
+    msgpack = pytest.importorskip('msgpack')
+    add_students(50)
+    plain = client.get('/students')
+    response = client.get('/students', headers={'Accept': 'application/msgpack'})
+    assert response.mimetype == 'application/msgpack'
+    assert msgpack.unpackb(response.data) == plain.get_json()
+    assert 'Accept' in response.vary
+    assert response.get_etag() == (plain.get_etag()[0] + '-msgpack', False)
+
+    response = client.get('/students', headers={'Accept': 'application/x-msgpack', 'Accept-Encoding': 'gzip'})
+    assert msgpack.unpackb(gzip.decompress(response.data)) == plain.get_json()
+    assert response.get_etag()[0] == plain.get_etag()[0] + '-msgpack-gzip'
+    # JSON stays the default when the client takes either
+    assert client.get('/students', headers={'Accept': 'application/json, application/msgpack'}).is_json
+
+
+def test_msgpack_off_answers_json(app_with, school):
+    client = app_with(MSGPACK_ENABLED=False).test_client()
+    response = client.get('/students', headers={'Accept': 'application/msgpack'})
+    assert response.status_code == 200
+    assert response.mimetype == 'application/json'
@@ -0,0 +1,31 @@
+from sqlalchemy import delete
+
+from config import db
+from events import hub
+from models import Student
+
+
+def test_bulk_delete_publishes_cascaded_deletes(client, school):
+    subscriber = hub.subscribe(None)
+    try:
+        db.session.execute(delete(Student).where(Student.id == 1))
+        db.session.commit()
+        messages, dropped = subscriber.take(5)
+    finally:
+        hub.unsubscribe(subscriber)
+
+    [(_, changes, _)] = messages
+    assert {(change['entity'], change['op'], change['id']) for change in changes} == {
+        ('students', 'delete', None), ('enrollments', 'delete', None), ('assignment_submissions', 'delete', None)}
+
+
+def test_streams_beyond_the_cap_are_refused(client, monkeypatch):
+    monkeypatch.setattr(hub, 'max_subscribers', 1)
+    subscriber = hub.subscribe(None)
+    try:
+        response = client.get('/events')
+    finally:
+        hub.unsubscribe(subscriber)
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '3'
@@ -0,0 +1,75 @@
+import csv
+import io
+
+import pytest
+
+from config import db
+from models import Student
+
+
+def read_csv(text):
+    return list(csv.reader(io.StringIO(text)))
+
+
+def test_submissions_csv(app, client, school):
+    db.session.get(Student, 2).name = 'Doe, "Jane"'
+    db.session.commit()
+
+    response = client.get('/exports/submissions.csv')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    assert response.is_streamed
+    assert response.headers['Content-Disposition'] == 'attachment; filename="submissions.csv"'
+    rows = read_csv(response.data.decode())
+    assert rows[0] == ['submission_id', 'course_id', 'course_code', 'assignment_id', 'assignment_title',
+                       'max_points', 'student_id', 'student_name', 'student_email', 'points_earned',
+                       'submitted', 'submission_date']
+    assert [row[:10] for row in rows[1:]] == [
+        ['1', '1', 'SCI101', '1', 'Homework', '100', '1', 'Student 1', 's1@example.org', '51'],
+        ['2', '1', 'SCI101', '1', 'Homework', '100', '2', 'Doe, "Jane"', 's2@example.org', '52'],
+        ['3', '1', 'SCI101', '1', 'Homework', '100', '3', 'Student 3', 's3@example.org', '53'],
+    ]
+    assert rows[1][10] == 'True'
+    # Datetimes in ISO 8601, with microseconds
+    submitted_at = db.session.get(Student, 1).assignment_submissions[0].submission_date
+    assert rows[1][11] == submitted_at.isoformat(sep=' ')
+
+    # One chunk per batch gives the same file
+    app.config['EXPORT_BATCH_SIZE'] = 2
+    assert client.get('/exports/submissions.csv').data == response.data
+
+
+def test_export_filters(client, school):
+    client.post('/enrollments', json={'student_id': 1, 'course_id': 2, 'semester': 'Spring'})
+
+    rows = read_csv(client.get('/exports/enrollments.csv?semester=Spring').data.decode())
+    assert [row[:4] for row in rows[1:]] == [['4', '2', 'SCI102', 'Spring']]
+    assert len(read_csv(client.get('/exports/enrollments.csv?course_id=1').data.decode())) == 4
+    assert len(read_csv(client.get('/exports/submissions.csv?course_id=2').data.decode())) == 1
+    assert len(read_csv(client.get('/exports/submissions.csv?semester=Fall').data.decode())) == 4
+    assert len(read_csv(client.get('/exports/submissions.csv?semester=Spring').data.decode())) == 1
+
+    response = client.get('/exports/submissions.csv?course_id=one')
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'course_id must be an integer'}
+    assert client.get('/exports/grades.csv').status_code == 404
+
+
+def test_export_command_writes_the_same_csv(app, client, school, tmp_path):
+    path = tmp_path / 'submissions.csv'
+    result = app.test_cli_runner().invoke(args=['exports', 'write', 'submissions', str(path), '--format', 'csv',
+                                                '--batch-size', '2'])
+    assert result.exit_code == 0, result.output
+    assert result.output == f"Wrote 3 submissions rows to {path}\n"
+    with open(path, newline='') as f:
+        assert f.read() == client.get('/exports/submissions.csv').data.decode()
+
+
+def test_export_command_writes_parquet(app, client, school, tmp_path):
+    parquet = pytest.importorskip('pyarrow.parquet')
+    path = tmp_path / 'enrollments.parquet'
+    result = app.test_cli_runner().invoke(args=['exports', 'write', 'enrollments', str(path)])
+    assert result.exit_code == 0, result.output
+    table = parquet.read_table(path)
+    assert table.column_names == read_csv(client.get('/exports/enrollments.csv').data.decode())[0]
+    assert table.column('student_email').to_pylist() == ['s1@example.org', 's2@example.org', 's3@example.org']
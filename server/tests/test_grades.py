@@ -0,0 +1,88 @@
+from contextlib import contextmanager
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event, insert
+
+from bulk import grade_submissions
+from config import db
+from grades import grade_summary_drift
+from models import Assignment, AssignmentSubmission
+
+
+@contextmanager
+def count_statements():
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+
+def add_submissions(count):
+    """``count`` ungraded submissions spread over the school's three students."""
+    db.session.add(Assignment(title='Project', due_date=datetime(2026, 2, 1), max_points=10, course_id=2))
+    db.session.flush()
+    db.session.execute(insert(AssignmentSubmission), [
+        {'student_id': 1 + n % 3, 'assignment_id': 1 + n % 2, 'submitted': True} for n in range(count)])
+    db.session.commit()
+    return [id for id, in db.session.query(AssignmentSubmission.id).filter(AssignmentSubmission.points_earned.is_(None))]
+
+
+@pytest.mark.parametrize('size', [10, 1000])
+def test_grade_submissions_statement_count(client, school, size):
+    ids = add_submissions(size)
+    with count_statements() as statements:
+        results = grade_submissions([{'id': id, 'points_earned': 5} for id in ids])
+    db.session.commit()
+
+    assert all('error' not in result for result in results)
+    assert len(statements) == 4
+    assert grade_summary_drift() == (0, 0)
+
+
+def test_points_checked_against_max_points(client, school):
+    response = client.post('/assignment_submissions', json={'assignment_id': 1, 'student_id': 1,
+                                                            'points_earned': 101, 'submitted': True})
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Points earned cannot exceed assignment max points'}
+
+
+def test_points_validation_reads_only_max_points(client, school):
+    submission = db.session.get(AssignmentSubmission, 1)
+    with count_statements() as statements:
+        submission.points_earned = 99
+    assert len(statements) == 1
+    assert 'FROM assignments' in statements[0] and 'assignments.title' not in statements[0]
+
+
+def test_bulk_submission_create_statement_count(client, school):
+    for n in range(4, 204):
+        client.post('/students', json={'name': f'Student {n}', 'email': f's{n}@example.org', 'grade_level': 10})
+    items = [{'assignment_id': 1, 'student_id': n, 'points_earned': n % 100, 'submitted': True} for n in range(4, 204)]
+    with count_statements() as statements:
+        response = client.post('/assignment_submissions', json=items)
+
+    assert response.status_code == 201, response.get_json()
+    assert response.get_json()['created'] == 200
+    # max_points, students, the INSERT, two for the grade summaries, two for the change log
+    assert len(statements) == 7
+    assert sum('FROM assignments' in statement for statement in statements) == 1
+    assert grade_summary_drift() == (0, 0)
+
+
+def test_bulk_submission_points_checked_against_max_points(client, school):
+    response = client.post('/assignment_submissions', json=[
+        {'assignment_id': 1, 'student_id': 1, 'points_earned': 100},
+        {'assignment_id': 1, 'student_id': 2, 'points_earned': 101},
+        {'assignment_id': 99, 'student_id': 3, 'points_earned': 1},
+    ])
+
+    assert response.status_code == 207
+    assert [result.get('error') for result in response.get_json()['results']] == [
+        None, 'Points earned cannot exceed assignment max points', 'Assignment not found']
@@ -0,0 +1,80 @@
+import io
+import os
+
+import pytest
+
+from app import create_app
+from config import db
+from imports import MultipartField
+from tests.test_changes import sync
+
+CSV = 'name,email,grade_level\n' + ''.join(f'Student {n},import{n}@example.org,10\n' for n in range(200))
+
+
+def multipart(*fields):
+    body = b''
+    for name, filename, data in fields:
+        disposition = f'form-data; name="{name}"' + (f'; filename="{filename}"' if filename else '')
+        body += f'--BOUNDARY\r\nContent-Disposition: {disposition}\r\n\r\n'.encode() + data.encode() + b'\r\n'
+    return body + b'--BOUNDARY--\r\n'
+
+
+def test_multipart_field_is_read_in_chunks():
+    body = io.BytesIO(multipart(('note', None, 'skipped'), ('file', 'students.csv', CSV), ('after', None, 'x')))
+    field = io.BufferedReader(MultipartField(body, b'BOUNDARY', 'file', chunk_size=7))
+    assert field.read().decode() == CSV
+
+
+def test_multipart_import(client):
+    response = client.post('/imports?kind=students', data=multipart(('file', 'students.csv', CSV)),
+                           content_type='multipart/form-data; boundary=BOUNDARY')
+    assert response.status_code == 201, response.get_json()
+    assert response.get_json()['imported'] == 200
+
+
+def test_multipart_import_without_file(client):
+    response = client.post('/imports?kind=students', data=multipart(('note', None, CSV)),
+                           content_type='multipart/form-data; boundary=BOUNDARY')
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Missing multipart field: file'}
+
+
+def imported_students_in_changes(client):
+    _, token = sync(client)
+    response = client.post('/imports?kind=students', data=CSV, content_type='text/csv')
+    assert response.status_code == 201, response.get_json()
+    changes, _ = sync(client, token)
+    return {change['data']['email'] for change in changes if change['entity'] == 'students'}
+
+
+def test_imported_rows_reach_the_change_feed(client):
+    assert imported_students_in_changes(client) == {f'import{n}@example.org' for n in range(200)}
+
+
+@pytest.mark.skipif(not os.environ.get('TEST_POSTGRES_URL'), reason='TEST_POSTGRES_URL is not set')
+def test_copied_rows_reach_the_change_feed():
+    """The COPY path (psycopg2) bypasses the ORM hooks the test above relies on."""
+    app = create_app({'SQLALCHEMY_DATABASE_URI': os.environ['TEST_POSTGRES_URL'], 'METRICS_ENABLED': False})
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        try:
+            assert imported_students_in_changes(app.test_client()) == {
+                f'import{n}@example.org' for n in range(200)}
+        finally:
+            db.session.remove()
+            db.drop_all()
+
+
+def test_roster_command_batches_by_config(app, tmp_path, monkeypatch):
+    path = tmp_path / 'students.csv'
+    path.write_text(CSV)
+    batches = []
+    monkeypatch.setattr('imports.import_csv', lambda kind, f, batch_size: batches.append(batch_size) or (0, []))
+    app.config['IMPORT_BATCH_SIZE'] = 64
+
+    result = app.test_cli_runner().invoke(args=['imports', 'roster', 'students', str(path)])
+    assert result.exit_code == 0, result.output
+    result = app.test_cli_runner().invoke(args=['imports', 'roster', 'students', str(path), '--batch-size', '10'])
+    assert result.exit_code == 0, result.output
+    assert batches == [64, 10]
@@ -0,0 +1,197 @@
+import io
+import json
+import os
+import signal
+import threading
+import time
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import event, select, update
+
+from config import db
+from jobs import Worker
+from models import Job, Student, utcnow
+
+
+@pytest.fixture
+def jobs_app(app, tmp_path):
+    app.config.update(JOBS_OUTPUT_DIR=str(tmp_path / 'jobs'), JOBS_POLL_S=0.05, JOBS_RETRY_BACKOFF_S=0)
+    # Worker.run installs its own SIGINT/SIGTERM handlers and resets them to the defaults
+    handlers = {signum: signal.getsignal(signum) for signum in (signal.SIGINT, signal.SIGTERM)}
+    yield app
+    for signum, handler in handlers.items():
+        signal.signal(signum, handler)
+
+
+def queue_job(client, kind, params=None):
+    response = client.post('/jobs', json={'kind': kind, 'params': params or {}})
+    assert response.status_code == 202, response.get_json()
+    return response.get_json()['id']
+
+
+def job_status(client, id):
+    db.session.expire_all()
+    return client.get(f'/jobs/{id}').get_json()
+
+
+def add_students(count, grade_level=5):
+    db.session.execute(db.insert(Student), [{'name': f'Bulk {n}', 'email': f'bulk{n}@example.org',
+                                             'grade_level': grade_level} for n in range(count)])
+    db.session.commit()
+
+
+def test_jobs_succeed(jobs_app, client, school):
+    export = queue_job(client, 'export', {'name': 'submissions'})
+    delete = queue_job(client, 'delete', {'entity': 'students', 'filters': {'id': 3}})
+
+    Worker(jobs_app, 2).run(burst=True)
+
+    status = job_status(client, export)
+    assert (status['status'], status['attempts'], status['error']) == ('succeeded', 1, None)
+    assert status['result'] == {'rows': 3, 'filename': 'submissions.csv'}
+    assert status['progress'] == {'done': 3, 'total': 3}
+    response = client.get(f'/jobs/{export}/result')
+    assert response.status_code == 200
+    assert len(response.data.decode().splitlines()) == 4
+
+    status = job_status(client, delete)
+    assert (status['status'], status['result']) == ('succeeded', {'deleted': 1})
+    assert client.get('/students/3').status_code == 404
+
+
+def test_failing_job_is_retried_until_max_attempts(jobs_app, client):
+    response = client.post('/jobs', data={'kind': 'import', 'params': json.dumps({'roster': 'students'}),
+                                          'file': (io.BytesIO(b'name,email,grade_level\n'), 'students.csv')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 202, response.get_json()
+    id = response.get_json()['id']
+    # Without its upload the job raises FileNotFoundError, which is retried, unlike a ValueError
+    os.remove(json.loads(db.session.get(Job, id).params)['path'])
+
+    jobs_app.config['JOBS_RETRY_BACKOFF_S'] = 60
+    Worker(jobs_app, 1).run(burst=True)
+    status = job_status(client, id)
+    assert (status['status'], status['attempts']) == ('queued', 1)
+    assert status['error'].startswith('FileNotFoundError')
+    assert db.session.get(Job, id).run_after > utcnow() + timedelta(seconds=50)
+
+    jobs_app.config['JOBS_RETRY_BACKOFF_S'] = 0
+    db.session.execute(update(Job).values(run_after=utcnow()))
+    db.session.commit()
+    Worker(jobs_app, 1).run(burst=True)
+    status = job_status(client, id)
+    assert (status['status'], status['attempts'], status['max_attempts']) == ('failed', 3, 3)
+    assert status['finished_at'] is not None
+
+
+def test_cancel_queued_job(jobs_app, client, school):
+    id = queue_job(client, 'rebuild_grade_summaries')
+
+    response = client.post(f'/jobs/{id}/cancel')
+    assert response.status_code == 200
+    assert response.get_json()['status'] == 'cancelled'
+
+    Worker(jobs_app, 1).run(burst=True)
+    status = job_status(client, id)
+    assert (status['status'], status['attempts'], status['started_at']) == ('cancelled', 0, None)
+    assert client.post(f'/jobs/{id}/cancel').status_code == 200
+    assert client.post('/jobs/999/cancel').status_code == 404
+
+
+def test_cancel_running_job(jobs_app, client):
+    jobs_app.config['JOBS_DELETE_BATCH_SIZE'] = 1
+    add_students(5000)
+    id = queue_job(client, 'delete', {'entity': 'students', 'filters': {'grade_level': 5}})
+    responses = []
+
+    def cancel_once_started():
+        # In an app context of its own, so not on the worker's session
+        with jobs_app.app_context():
+            deadline = time.monotonic() + 60
+            while time.monotonic() < deadline:
+                if db.session.scalar(select(Job.progress_done).where(Job.id == id)):
+                    responses.append(jobs_app.test_client().post(f'/jobs/{id}/cancel'))
+                    return
+                db.session.rollback()
+                time.sleep(0.05)
+
+    canceller = threading.Thread(target=cancel_once_started)
+    canceller.start()
+    Worker(jobs_app, 1).run(burst=True)
+    canceller.join()
+
+    assert responses[0].status_code == 202
+    assert responses[0].get_json()['cancel_requested'] is True
+    status = job_status(client, id)
+    assert (status['status'], status['attempts']) == ('cancelled', 1)
+    # The batches deleted before the job noticed stay deleted
+    left = db.session.scalar(select(db.func.count()).select_from(Student))
+    assert 0 < left < 5000
+    assert 5000 - left <= status['progress']['done']
+    assert client.post(f'/jobs/{id}/cancel').status_code == 200
+
+
+def test_stale_jobs_are_recovered(jobs_app, client, school):
+    ids = [queue_job(client, 'rebuild_grade_summaries') for _ in range(3)]
+    requeued, cancelled, failed = ids
+    # Claimed by a worker that has since died
+    old = utcnow() - timedelta(seconds=jobs_app.config['JOBS_STALE_S'] + 1)
+    db.session.execute(update(Job).values(status='running', attempts=1, worker='gone:1',
+                                          started_at=old, heartbeat_at=old))
+    db.session.execute(update(Job).where(Job.id == failed).values(attempts=3))
+    db.session.commit()
+
+    response = client.post(f'/jobs/{cancelled}/cancel')
+    assert response.status_code == 202
+    assert response.get_json()['status'] == 'running'
+
+    Worker(jobs_app, 1).run(burst=True)
+
+    status = job_status(client, requeued)
+    assert (status['status'], status['attempts']) == ('succeeded', 2)
+    assert status['error'] is None
+    status = job_status(client, cancelled)
+    assert (status['status'], status['attempts']) == ('cancelled', 1)
+    status = job_status(client, failed)
+    assert (status['status'], status['error']) == ('failed', 'The worker running the job stopped responding')
+
+
+def test_claim_skips_a_job_another_worker_took(jobs_app, client):
+    id = queue_job(client, 'rebuild_grade_summaries')
+    worker = Worker(jobs_app, 1)
+    raced = []
+
+    def claim_first(conn, cursor, statement, parameters, context, executemany):
+        # Between this worker's SELECT of due jobs and its UPDATE, another worker claims the job
+        if statement.startswith('UPDATE jobs') and conn is not other and not raced:
+            raced.append(True)
+            other.execute(update(Job).where(Job.id == id, Job.status == 'queued')
+                          .values(status='running', attempts=Job.attempts + 1, worker='other:1'))
+            other.commit()
+
+    with db.engine.connect() as other:
+        event.listen(db.engine, 'before_cursor_execute', claim_first)
+        try:
+            assert worker.claim(1) == 0
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', claim_first)
+    assert raced and worker.running == {}
+    job = db.session.get(Job, id)
+    assert (job.status, job.attempts, job.worker) == ('running', 1, 'other:1')
+
+
+def test_shutdown_requeues_running_jobs(jobs_app, client):
+    jobs_app.config['JOBS_DELETE_BATCH_SIZE'] = 1
+    add_students(5000)
+    id = queue_job(client, 'delete', {'entity': 'students', 'filters': {'grade_level': 5}})
+    worker = Worker(jobs_app, 1)
+    worker.pool = worker.start_pool()
+    assert worker.claim(1) == 1
+    assert job_status(client, id)['status'] == 'running'
+
+    worker.shutdown()
+
+    status = job_status(client, id)
+    assert (status['status'], status['attempts']) == ('queued', 0)
+    assert db.session.get(Job, id).worker is None
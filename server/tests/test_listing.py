@@ -0,0 +1,178 @@
+import json
+from datetime import datetime
+
+from sqlalchemy import func, select
+
+from config import db
+from models import Assignment, AssignmentSubmission, Enrollment, Student
+from tests.test_grades import count_statements
+
+
+def add_students(count):
+    db.session.execute(db.insert(Student), [{'name': f'Student {n}', 'email': f'list{n}@example.org',
+                                             'grade_level': 9 + n % 2} for n in range(count)])
+    db.session.commit()
+
+
+def ndjson(response):
+    return [json.loads(line) for line in response.data.decode().splitlines()]
+
+
+def test_stream_returns_every_row_as_ndjson(app, client):
+    app.config['STREAM_BATCH_SIZE'] = 7
+    add_students(250)
+
+    response = client.get('/students?stream=1&limit=10')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.is_streamed
+    assert 'Link' not in response.headers
+    rows = ndjson(response)
+    assert [row['id'] for row in rows] == list(range(1, 251))
+    # Each line is one compact object, the same as on a page
+    assert rows[:100] == client.get('/students').get_json()
+    assert response.data.decode().splitlines()[0] == json.dumps(rows[0], separators=(',', ':'), sort_keys=True)
+
+
+def test_stream_by_accept_header_with_filters_and_cursor(client):
+    add_students(20)
+
+    response = client.get('/students?grade_level=10&cursor=10', headers={'Accept': 'application/x-ndjson'})
+    assert response.mimetype == 'application/x-ndjson'
+    assert [row['id'] for row in ndjson(response)] == [12, 14, 16, 18, 20]
+
+    assert client.get('/students', headers={'Accept': 'application/json'}).mimetype == 'application/json'
+    assert client.get('/students?stream=0', headers={'Accept': 'application/x-ndjson'}).mimetype == 'application/json'
+    assert client.get('/students?stream=maybe').status_code == 400
+
+
+def test_expand_runs_one_query_per_relationship(client, school):
+    with count_statements() as statements:
+        response = client.get('/enrollments?expand=student,course')
+    assert response.status_code == 200
+    enrollments = response.get_json()
+    assert [(e['student']['name'], e['course']['course_code']) for e in enrollments] == [
+        ('Student 1', 'SCI101'), ('Student 2', 'SCI101'), ('Student 3', 'SCI101')]
+    # The page, then one IN query per relationship
+    assert len(statements) == 3
+
+    add_students(30)
+    client.post('/enrollments', json=[{'student_id': n, 'course_id': 2, 'semester': 'Fall'} for n in range(4, 34)])
+    with count_statements() as statements:
+        response = client.get('/enrollments?expand=student,course')
+    assert len(response.get_json()) == 33
+    assert len(statements) == 3
+
+
+def test_expand_collections_and_nested(client, school):
+    students = client.get('/students?expand=enrollments,assignment_submissions').get_json()
+    assert [len(s['enrollments']) for s in students] == [1, 1, 1]
+    assert students[0]['assignment_submissions'][0]['points_earned'] == 51
+    client.post('/students', json={'name': 'New Student', 'email': 'new@example.org', 'grade_level': 9})
+    assert client.get('/students?expand=enrollments&cursor=3').get_json()[0]['enrollments'] == []
+
+    # Course.teacher is already nested, so expanding it adds no query
+    with count_statements() as statements:
+        courses = client.get('/courses?expand=teacher').get_json()
+    assert courses[0]['teacher']['name'] == 'Teacher 1'
+    assert len(statements) == 1
+
+    response = client.get('/students?expand=teacher')
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Cannot expand students by teacher'}
+
+
+def test_expand_when_streaming(app, client, school):
+    app.config['STREAM_BATCH_SIZE'] = 2
+    with count_statements() as statements:
+        response = client.get('/enrollments?stream=1&expand=student')
+        rows = ndjson(response)
+    assert [row['student']['id'] for row in rows] == [1, 2, 3]
+    # Two batches, with an IN query each
+    assert len([s for s in statements if 'FROM students' in s]) == 2
+
+
+def test_fields_narrow_the_select(client, school):
+    db.session.add(Assignment(title='Essay', description='Long ' * 1000, due_date=datetime(2026, 3, 1),
+                              max_points=20, course_id=1))
+    db.session.commit()
+    client.post('/assignment_submissions', json={'assignment_id': 2, 'student_id': 1, 'content': 'Text ' * 1000})
+
+    with count_statements() as statements:
+        submissions = client.get('/assignment_submissions?fields=points_earned,student_id').get_json()
+    assert submissions[0] == {'points_earned': 51, 'student_id': 1}
+    assert len(submissions) == 4
+    assert all('content' not in statement for statement in statements)
+
+    with count_statements() as statements:
+        assignments = client.get('/assignments?fields=title,max_points').get_json()
+    assert assignments == [{'max_points': 100, 'title': 'Homework'}, {'max_points': 20, 'title': 'Essay'}]
+    assert all('description' not in statement for statement in statements)
+
+    # Named fields come from the same row as without ?fields=
+    full = client.get('/assignments').get_json()
+    assert full[1]['description'].startswith('Long ')
+    assert client.get('/assignments?fields=description').get_json()[1] == {'description': full[1]['description']}
+
+
+def test_fields_join_only_named_relationships(client, school):
+    with count_statements() as statements:
+        courses = client.get('/courses?fields=course_code').get_json()
+    assert courses == [{'course_code': 'SCI101'}, {'course_code': 'SCI102'}]
+    assert all('teachers' not in statement for statement in statements)
+
+    courses = client.get('/courses?fields=course_code,teacher').get_json()
+    assert courses[0]['teacher']['name'] == 'Teacher 1'
+
+    students = client.get('/students?fields=name&expand=enrollments').get_json()
+    assert students[0] == {'name': 'Student 1', 'enrollments': students[0]['enrollments']}
+    assert students[0]['enrollments'][0]['course_id'] == 1
+    assert client.get('/students?fields=name,enrollments&expand=enrollments').status_code == 200
+
+
+def test_unknown_fields_are_rejected(client, school):
+    response = client.get('/students?fields=name,nickname,ssn')
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Unknown fields for students: nickname, ssn'}
+    # A collection needs ?expand=
+    assert client.get('/students?fields=enrollments').status_code == 400
+    assert client.get('/students/1?fields=nickname').status_code == 400
+
+    response = client.get('/students/1?fields=name')
+    assert response.get_json() == {'name': 'Student 1'}
+    assert response.headers['ETag'] != client.get('/students/1').headers['ETag']
+    assert client.get('/students?fields=name').headers['ETag'] != client.get('/students').headers['ETag']
+
+
+def test_bulk_delete_cascades_and_returns_the_count(client, school):
+    add_students(2)
+    with count_statements() as statements:
+        response = client.delete('/students?grade_level=10')
+    assert response.status_code == 200
+    assert response.get_json() == {'deleted': 4}
+    # One DELETE; the enrollments and submissions go through ON DELETE CASCADE
+    assert len([s for s in statements if s.startswith('DELETE')]) == 1
+    assert [s['name'] for s in client.get('/students').get_json()] == ['Student 0']
+    assert db.session.scalar(select(func.count()).select_from(Enrollment)) == 0
+    assert db.session.scalar(select(func.count()).select_from(AssignmentSubmission)) == 0
+
+    assert client.delete('/students?grade_level=10').get_json() == {'deleted': 0}
+
+
+def test_bulk_delete_filters(client, school):
+    client.post('/enrollments', json={'student_id': 1, 'course_id': 2, 'semester': 'Spring'})
+    response = client.delete('/enrollments?course_id=1&semester=Fall')
+    assert response.get_json() == {'deleted': 3}
+    assert [e['course_id'] for e in client.get('/enrollments').get_json()] == [2]
+    # Submissions belong to students and assignments, not enrollments
+    assert len(client.get('/assignment_submissions').get_json()) == 3
+
+    response = client.delete('/students')
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'At least one filter is required: grade_level'}
+    # Names that are not filters do not count
+    assert client.delete('/students?name=Student 1').status_code == 400
+    response = client.delete('/students?grade_level=ten')
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'grade_level must be an integer'}
+    assert len(client.get('/students').get_json()) == 3
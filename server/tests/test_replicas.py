@@ -0,0 +1,52 @@
+import shutil
+
+import pytest
+
+from app import create_app
+from config import db
+from models import Student
+from replicas import replicas
+
+
+@pytest.fixture
+def replica_app(tmp_path):
+    """Makes an app with the given replicas over a primary with two students."""
+    def make(*replica_urls):
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'primary.db'}",
+                          'DATABASE_REPLICA_URLS': list(replica_urls), 'METRICS_ENABLED': False})
+        with app.app_context():
+            db.create_all(bind_key=None)
+            if not db.session.get(Student, 1):
+                db.session.add_all([Student(name=f'Student {n}', email=f's{n}@example.org', grade_level=10)
+                                    for n in (1, 2)])
+                db.session.commit()
+            # Closing the connections checkpoints SQLite's WAL, so the file can be copied
+            for engine in db.engines.values():
+                engine.dispose()
+        return app
+
+    return make
+
+
+def test_reads_go_to_a_replica(replica_app, tmp_path):
+    replica_app()
+    shutil.copyfile(tmp_path / 'primary.db', tmp_path / 'replica.db')
+    app = replica_app(f"sqlite:///{tmp_path / 'replica.db'}")
+
+    response = app.test_client().get('/students')
+    assert response.status_code == 200
+    assert [student['id'] for student in response.get_json()] == [1, 2]
+    assert replicas.stats()['replicas'] == [{'bind': 'replica0', 'healthy': True, 'reads': 1, 'failures': 0}]
+
+
+@pytest.mark.parametrize('replica', ['missing/replica.db', 'empty.db'])
+def test_failed_replica_falls_back_to_the_primary(replica_app, tmp_path, replica):
+    # missing/: the connection fails; empty.db: connects, then every statement fails
+    app = replica_app(f"sqlite:///{tmp_path / replica}")
+
+    response = app.test_client().get('/students')
+    assert response.status_code == 200
+    assert [student['id'] for student in response.get_json()] == [1, 2]
+    assert replicas.stats()['replicas'][0]['healthy'] is False
+    assert replicas.stats()['replicas'][0]['failures'] == 1
+    assert app.test_client().get('/students/1').status_code == 200